@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+ANN Parameter Grid Evaluator
+
+Builds an IVF index (rag.ann.IVFIndex) for every `nlist` in a grid, searches
+it with every `nprobe`, and measures against exact search:
+- Build time (s) and index memory (MB) per nlist
+- QPS (single thread) and recall@k per (nlist, nprobe)
+- The Pareto frontier of recall vs QPS, as a Markdown report
+
+Corpora: `clustered` (synthetic Gaussian clusters, no model needed), `text`
+(the synthetic text corpus through an embedder), or a JSONL file of real
+documents. Recall is deterministic for a given corpus and seed, so it makes
+a tight regression gate:
+
+Usage:
+    python benchmarks/ann_grid.py
+    python benchmarks/ann_grid.py --corpus clustered,text --nlist 64,256 --nprobe 1,4,16
+    python benchmarks/ann_grid.py --corpus data/docs.jsonl --embedder sentence-transformers
+    python benchmarks/ann_grid.py --save-baseline        # then: exits 1 if recall drops
+    python benchmarks/ann_grid.py --gate 256:16 --min-recall 0.95
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from common import compare_to_baseline, metric, synthetic_corpus, synthetic_queries, write_results
+
+from rag.ann import IVFIndex, exact_top_k, recall_at_k
+from rag.embeddings import HashingEmbedder, SentenceTransformerEmbedder
+
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_OUTPUT = BENCH_DIR / "results" / "ann_grid.json"
+DEFAULT_BASELINE = BENCH_DIR / "results" / "ann_grid_baseline.json"
+RECALL_METRIC = "ann_recall"
+
+
+# ============================================================================
+# Corpora
+# ============================================================================
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    return (matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            ).astype(np.float32)
+
+
+def clustered_vectors(size: int, queries: int, dim: int, clusters: int = 1000,
+                      seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Unit vectors around random centres; queries come from the same mixture."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim))
+    points = centres[rng.integers(clusters, size=size + queries)]
+    points += 1.0 * rng.standard_normal(points.shape)
+    points = _normalize(points)
+    return points[:size], points[size:]
+
+
+def load_corpus(name: str, config: dict) -> Tuple[np.ndarray, np.ndarray]:
+    if name == "clustered":
+        return clustered_vectors(config["size"], config["queries"], config["dim"])
+
+    if config["embedder"] == "sentence-transformers":
+        embedder = SentenceTransformerEmbedder(config["model"])
+    else:
+        embedder = HashingEmbedder(dim=config["dim"])
+    if name == "text":
+        texts = [d["content"] for d in synthetic_corpus(config["size"])]
+        query_texts = synthetic_queries(config["queries"])
+    else:
+        with open(name) as f:
+            texts = [json.loads(line)["content"] for line in f if line.strip()]
+        rng = np.random.default_rng(1)
+        picks = rng.choice(len(texts), min(config["queries"], len(texts)), replace=False)
+        query_texts = [texts[i] for i in picks]
+    print(f"   embedding {len(texts)} documents for {name}...")
+    vectors = np.asarray(embedder.encode(texts), dtype=np.float32)
+    return vectors, np.asarray(embedder.encode(query_texts), dtype=np.float32)
+
+
+# ============================================================================
+# Grid
+# ============================================================================
+
+def best_qps(search, queries: np.ndarray, rounds: int) -> float:
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        search(queries)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(queries) / best
+
+
+def pareto_front(points: List[dict]) -> List[dict]:
+    """Configurations no other one beats on both recall and QPS."""
+    front = []
+    for p in points:
+        dominated = any(q["recall"] >= p["recall"] and q["qps"] >= p["qps"]
+                        and (q["recall"] > p["recall"] or q["qps"] > p["qps"])
+                        for q in points)
+        if not dominated:
+            front.append(p)
+    return sorted(front, key=lambda p: p["recall"])
+
+
+def run(config: dict) -> Tuple[List[dict], Dict[str, List[dict]]]:
+    k = config["top_k"]
+    metrics, grids = [], {}
+    for corpus in config["corpora"]:
+        label = Path(corpus).stem if corpus not in ("clustered", "text") else corpus
+        vectors, queries = load_corpus(corpus, config)
+        truth = exact_top_k(vectors, queries, k)
+        # One query at a time, like the index searches below
+        exact_qps = best_qps(lambda qs: [exact_top_k(vectors, q[None, :], k) for q in qs],
+                             queries, config["rounds"])
+        metrics.append(metric("exact_qps", exact_qps, "queries/s", True, corpus=label))
+        print(f"\n📊 {label}: {len(vectors)} vectors, dim {vectors.shape[1]}, "
+              f"exact search {exact_qps:,.0f} q/s")
+
+        points = []
+        for nlist in config["nlist"]:
+            index = IVFIndex(nlist=nlist, seed=config["seed"]).build(vectors)
+            memory_mb = index.memory_bytes() / 1e6
+            metrics.append(metric("ann_build_time", index.build_seconds, "s",
+                                  corpus=label, nlist=nlist))
+            metrics.append(metric("ann_index_memory", memory_mb, "MB", corpus=label, nlist=nlist))
+            for nprobe in config["nprobe"]:
+                if nprobe > nlist:
+                    continue
+                found = index.search_many(queries, k, nprobe)
+                recall = recall_at_k(found, truth)
+                qps = best_qps(lambda qs: index.search_many(qs, k, nprobe), queries,
+                               config["rounds"])
+                params = dict(corpus=label, nlist=nlist, nprobe=nprobe, k=k)
+                metrics.append(metric(RECALL_METRIC, recall, "ratio", True, **params))
+                metrics.append(metric("ann_qps", qps, "queries/s", True, **params))
+                points.append({"nlist": nlist, "nprobe": nprobe, "recall": recall, "qps": qps,
+                               "speedup": qps / exact_qps, "build_s": index.build_seconds,
+                               "memory_mb": memory_mb})
+                print(f"   nlist {nlist:>5}  nprobe {nprobe:>4}  recall@{k} {recall:.3f}  "
+                      f"{qps:>9,.0f} q/s  ({qps / exact_qps:.1f}x exact)")
+        grids[label] = points
+    return metrics, grids
+
+
+def pareto_report(grids: Dict[str, List[dict]], k: int) -> str:
+    lines = ["# ANN Grid: Pareto Report", ""]
+    for label, points in grids.items():
+        front = pareto_front(points)
+        lines += [f"## {label}", "",
+                  f"| nlist | nprobe | recall@{k} | QPS | vs exact | build (s) | memory (MB) | Pareto |",
+                  "|------:|-------:|---------:|----:|---------:|----------:|------------:|:------:|"]
+        for p in sorted(points, key=lambda p: (-p["recall"], -p["qps"])):
+            lines.append(f"| {p['nlist']} | {p['nprobe']} | {p['recall']:.3f} | {p['qps']:,.0f} "
+                         f"| {p['speedup']:.1f}x | {p['build_s']:.2f} | {p['memory_mb']:.1f} "
+                         f"| {'✅' if p in front else ''} |")
+        for target in (0.9, 0.95, 0.99):
+            best = max((p for p in front if p["recall"] >= target), key=lambda p: p["qps"],
+                       default=None)
+            if best:
+                lines.append(f"\nFastest with recall@{k} >= {target}: nlist={best['nlist']}, "
+                             f"nprobe={best['nprobe']} ({best['qps']:,.0f} q/s)")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def check_gates(grids: Dict[str, List[dict]], gates: List[Tuple[int, int]],
+                min_recall: float) -> List[str]:
+    failures = []
+    for label, points in grids.items():
+        for nlist, nprobe in gates:
+            for p in points:
+                if (p["nlist"], p["nprobe"]) == (nlist, nprobe) and p["recall"] < min_recall:
+                    failures.append(f"{label} nlist={nlist} nprobe={nprobe}: "
+                                    f"recall {p['recall']:.3f} < {min_recall}")
+    return failures
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--corpus", default="clustered",
+                        help="Comma-separated: clustered, text, or JSONL paths")
+    parser.add_argument("--size", type=int, default=50_000, help="Synthetic corpus size")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nlist", type=_int_list, default=[64, 256, 1024])
+    parser.add_argument("--nprobe", type=_int_list, default=[1, 4, 16, 64])
+    parser.add_argument("--rounds", type=int, default=3, help="Repeat QPS runs, keep the best")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embedder", choices=["hashing", "sentence-transformers"],
+                        default="hashing")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--gate", action="append", default=[],
+                        help="NLIST:NPROBE that must reach --min-recall (repeatable)")
+    parser.add_argument("--min-recall", type=float, default=0.9)
+    parser.add_argument("--tolerance", type=float, default=0.01,
+                        help="Allowed relative recall drop vs the baseline")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    parser.add_argument("--report", default=None,
+                        help="Markdown report path (default: next to --output)")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    config = {
+        "corpora": [c for c in args.corpus.split(",") if c],
+        "size": args.size,
+        "queries": args.queries,
+        "top_k": args.top_k,
+        "nlist": args.nlist,
+        "nprobe": args.nprobe,
+        "rounds": args.rounds,
+        "seed": args.seed,
+        "embedder": args.embedder,
+        "model": args.model,
+        "dim": args.dim,
+    }
+
+    print("=" * 70)
+    print("⏱️  ANN Parameter Grid")
+    print("=" * 70)
+    metrics, grids = run(config)
+
+    write_results(args.output, metrics, config)
+    report_path = Path(args.report or Path(args.output).with_suffix(".md"))
+    report_path.write_text(pareto_report(grids, args.top_k))
+    print(f"\n💾 Results written to {args.output}, Pareto report to {report_path}")
+
+    failures = check_gates(grids, [tuple(int(v) for v in g.split(":")) for g in args.gate],
+                           args.min_recall)
+    if args.save_baseline:
+        write_results(args.baseline, metrics, config)
+        print(f"💾 Baseline saved to {args.baseline}")
+    elif Path(args.baseline).exists():
+        baseline = json.loads(Path(args.baseline).read_text())
+        recall = [m for m in metrics if m["name"] == RECALL_METRIC]
+        for r in compare_to_baseline(recall, baseline, args.tolerance):
+            failures.append(f"{r['metric']}: {r['baseline']} -> {r['current']} "
+                            f"({r['change']:+.1%})")
+
+    if failures:
+        print(f"❌ {len(failures)} recall check(s) failed:")
+        for failure in failures:
+            print(f"   {failure}")
+        return 1
+    print("✅ Recall checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
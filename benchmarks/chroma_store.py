@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Chroma vs In-Process Store Benchmark
+
+Measures, for ChromaVectorStore (embedded, or a server with --host) and the
+in-process VectorStore:
+- Ingestion rate (docs/sec), for Chroma both batched and one upsert per doc
+- search() latency (p50/p95/mean ms)
+
+Both stores use the same embedder, so the difference is storage + index.
+
+Usage:
+    python benchmarks/chroma_store.py
+    python benchmarks/chroma_store.py --size 50000
+    python benchmarks/chroma_store.py --host localhost --port 8000   # docker compose up chromadb
+"""
+
+import argparse
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import List
+
+from common import (latency_metrics, metric, metric_key, synthetic_corpus, synthetic_queries,
+                    time_calls, write_results)
+
+from rag.chroma_store import ChromaVectorStore
+from rag.embeddings import HashingEmbedder
+from rag.vector_store import VectorStore
+
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_OUTPUT = BENCH_DIR / "results" / "chroma_store.json"
+
+
+def ingest(store, docs: List[dict]) -> float:
+    """Docs/sec to add and flush all documents."""
+    start = time.perf_counter()
+    store.add_documents(docs)
+    if hasattr(store, "flush"):
+        store.flush()
+    return len(docs) / (time.perf_counter() - start)
+
+
+def run(config: dict) -> List[dict]:
+    embedder = HashingEmbedder(dim=config["dim"])
+    docs = synthetic_corpus(config["size"])
+    queries = synthetic_queries(config["queries"])
+    k = config["top_k"]
+    metrics = []
+
+    def chroma(batch_size: int) -> ChromaVectorStore:
+        return ChromaVectorStore(embedder, f"bench-{uuid.uuid4().hex[:12]}",
+                                 host=config["host"], port=config["port"],
+                                 batch_size=batch_size)
+
+    unbatched_docs = docs[:config["unbatched_docs"]]
+    store = chroma(batch_size=1)
+    rate = ingest(store, unbatched_docs)
+    store.client.delete_collection(store.collection.name)
+    metrics.append(metric("ingestion_rate", rate, "docs/s", True, store="chroma", batch_size=1))
+    print(f"   chroma, one upsert per doc: {rate:>10.0f} docs/s")
+
+    stores = {"chroma": chroma(config["batch_size"]), "in_process": VectorStore(embedder)}
+    for name, store in stores.items():
+        rate = ingest(store, docs)
+        store.search(queries[0], top_k=k)  # warm-up
+        durations = [min(time_calls(lambda: store.search(query, top_k=k), config["rounds"]))
+                     for query in queries]
+        metrics.append(metric("ingestion_rate", rate, "docs/s", True, store=name,
+                              batch_size=config["batch_size"]))
+        metrics += latency_metrics("search_latency", durations, store=name, corpus_size=len(docs))
+        print(f"   {name:<10} ingest {rate:>10.0f} docs/s   search p50 "
+              f"{sorted(durations)[len(durations) // 2]:.2f} ms")
+    stores["chroma"].client.delete_collection(stores["chroma"].collection.name)
+    return metrics
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, default=10_000, help="Corpus size")
+    parser.add_argument("--unbatched-docs", type=int, default=500,
+                        help="Documents for the one-upsert-per-doc ingestion run")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="Repeat each query and keep the best time")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--host", default=None, help="Chroma server (default: embedded)")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    config = {
+        "size": args.size,
+        "unbatched_docs": args.unbatched_docs,
+        "queries": args.queries,
+        "top_k": args.top_k,
+        "batch_size": args.batch_size,
+        "rounds": args.rounds,
+        "dim": args.dim,
+        "host": args.host,
+        "port": args.port,
+    }
+
+    print("=" * 70)
+    print("⏱️  Chroma vs In-Process Store")
+    print("=" * 70)
+    metrics = run(config)
+
+    write_results(args.output, metrics, config)
+    print(f"\n💾 Results written to {args.output}")
+    for m in metrics:
+        print(f"  {metric_key(m)}: {m['value']:.3f} {m['unit']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Shared helpers for the benchmark scripts: synthetic corpora, timing, and
+JSON results with baseline comparison.
+
+Every benchmark produces a list of metric dicts:
+
+    {"name": "search_latency_p50", "params": {"corpus_size": 10000},
+     "value": 1.23, "unit": "ms", "higher_is_better": false}
+"""
+
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# Allow `python benchmarks/<script>.py` from anywhere in the repo
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+# ============================================================================
+# Synthetic Corpus
+# ============================================================================
+
+TOPICS = {
+    "refunds": ["refund", "return", "money", "credit", "receipt", "days", "policy"],
+    "shipping": ["shipping", "delivery", "express", "tracking", "courier", "package"],
+    "support": ["support", "phone", "email", "chat", "hours", "agent", "ticket"],
+    "payment": ["payment", "card", "paypal", "invoice", "billing", "secure"],
+    "account": ["account", "password", "login", "profile", "settings", "security"],
+    "products": ["warranty", "battery", "screen", "size", "color", "model"],
+}
+FILLER = ["the", "our", "customers", "can", "will", "within", "for", "and", "with",
+          "available", "please", "note", "all", "each", "order", "team", "standard"]
+
+
+def synthetic_corpus(size: int, words_per_doc: int = 60, seed: int = 42) -> List[dict]:
+    """
+    Generate `size` documents in the lesson 1 format.
+
+    Each document mixes words from one topic with filler, so topic queries
+    have a meaningful "right answer" and scores are not all identical.
+    """
+    rng = random.Random(seed)
+    topics = list(TOPICS)
+    docs = []
+    for i in range(size):
+        topic = topics[i % len(topics)]
+        words = [rng.choice(TOPICS[topic]) if rng.random() < 0.4 else rng.choice(FILLER)
+                 for _ in range(words_per_doc)]
+        docs.append({
+            "id": i,
+            "content": " ".join(words),
+            "metadata": {"category": topic, "topic": topic},
+        })
+    return docs
+
+
+def synthetic_queries(count: int, seed: int = 7) -> List[str]:
+    """Short topic queries matching `synthetic_corpus()`."""
+    rng = random.Random(seed)
+    topics = list(TOPICS)
+    return [" ".join(rng.sample(TOPICS[topics[i % len(topics)]], 3)) for i in range(count)]
+
+
+# ============================================================================
+# Timing
+# ============================================================================
+
+def time_calls(func: Callable[[], object], repeat: int) -> List[float]:
+    """Call `func` `repeat` times and return each duration in milliseconds."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile (pct in 0-100)."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def metric(name: str, value: float, unit: str, higher_is_better: bool = False,
+           **params) -> dict:
+    return {"name": name, "params": params, "value": round(float(value), 6),
+            "unit": unit, "higher_is_better": higher_is_better}
+
+
+def latency_metrics(name: str, durations_ms: List[float], **params) -> List[dict]:
+    """p50/p95/mean metrics for a list of latencies."""
+    return [
+        metric(f"{name}_p50", percentile(durations_ms, 50), "ms", **params),
+        metric(f"{name}_p95", percentile(durations_ms, 95), "ms", **params),
+        metric(f"{name}_mean", statistics.fmean(durations_ms), "ms", **params),
+    ]
+
+
+# ============================================================================
+# Results + Baseline
+# ============================================================================
+
+def metric_key(m: dict) -> str:
+    params = ",".join(f"{k}={v}" for k, v in sorted(m["params"].items()))
+    return f"{m['name']}[{params}]"
+
+
+def write_results(path, metrics: List[dict], config: Optional[dict] = None) -> dict:
+    """Write metrics (plus machine info) as JSON and return the document."""
+    document = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+        },
+        "config": config or {},
+        "metrics": metrics,
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(document, indent=2))
+    return document
+
+
+def compare_to_baseline(metrics: List[dict], baseline: dict,
+                        tolerance: float = 0.15) -> List[Dict]:
+    """
+    Find metrics that got worse than the baseline by more than `tolerance`.
+
+    Args:
+        metrics: Current metrics
+        baseline: A document written by `write_results()`
+        tolerance: Allowed relative change (0.15 = 15%)
+
+    Returns:
+        One dict per regression: name, baseline, current, change
+    """
+    previous = {metric_key(m): m for m in baseline.get("metrics", [])}
+    regressions = []
+    for m in metrics:
+        old = previous.get(metric_key(m))
+        if old is None or old["value"] == 0:
+            continue
+        change = (m["value"] - old["value"]) / abs(old["value"])
+        worse = -change if m["higher_is_better"] else change
+        if worse > tolerance:
+            regressions.append({"metric": metric_key(m), "baseline": old["value"],
+                                "current": m["value"], "change": round(change, 4)})
+    return regressions
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Ingestion-Time Deduplication Benchmark
+
+Builds a synthetic corpus shaped like scraped pages - shared header/footer
+boilerplate, plus a share of exact copies and lightly edited copies - and
+measures:
+- Filter throughput (docs/sec through NearDuplicateFilter)
+- How many documents and how much text it kept out of the embedder
+- End-to-end filter + embed time vs. embedding everything
+
+Usage:
+    python benchmarks/dedup.py
+    python benchmarks/dedup.py --size 20000 --duplicate-rate 0.4 --embedder sentence-transformers
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+from common import metric, metric_key, synthetic_corpus, write_results
+
+from rag.dedup import NearDuplicateFilter
+from rag.embeddings import HashingEmbedder, SentenceTransformerEmbedder
+
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_OUTPUT = BENCH_DIR / "results" / "dedup.json"
+
+HEADER = "Acme Corp knowledge base | Home | Products | Support | Contact us"
+FOOTER = "Copyright Acme Corp. All rights reserved. Privacy policy. Terms of use."
+
+
+def duplicated_corpus(size: int, duplicate_rate: float, seed: int = 3) -> List[dict]:
+    """Pages with boilerplate; `duplicate_rate` of them copy an earlier page (half edited)."""
+    rng = random.Random(seed)
+    bodies = [doc["content"] for doc in synthetic_corpus(size)]
+    docs = []
+    for i in range(size):
+        body = bodies[i]
+        if i and rng.random() < duplicate_rate:
+            body = docs[rng.randrange(i)]["body"]
+            if rng.random() < 0.5:
+                words = body.split()
+                words[rng.randrange(len(words))] = "edited"
+                body = " ".join(words)
+        docs.append({"id": i, "body": body, "content": f"{HEADER}\n{body}\n{FOOTER}"})
+    for doc in docs:
+        del doc["body"]
+    return docs
+
+
+def embed_seconds(embedder, docs: List[dict], batch_size: int) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(docs), batch_size):
+        embedder.encode([doc["content"] for doc in docs[i:i + batch_size]])
+    return time.perf_counter() - start
+
+
+def run(config: dict) -> List[dict]:
+    docs = duplicated_corpus(config["size"], config["duplicate_rate"])
+    embedder = (SentenceTransformerEmbedder() if config["embedder"] == "sentence-transformers"
+                else HashingEmbedder(dim=config["dim"]))
+
+    dedup = NearDuplicateFilter(threshold=config["threshold"])
+    start = time.perf_counter()
+    kept = list(dedup.filter(docs))
+    filter_seconds = time.perf_counter() - start
+    kept_embed = embed_seconds(embedder, kept, config["batch_size"])
+    all_embed = embed_seconds(embedder, docs, config["batch_size"])
+    stats = dedup.stats
+
+    print(f"   kept {stats.kept}/{stats.documents} docs "
+          f"({stats.exact_duplicates} exact, {stats.near_duplicates} near duplicates dropped)")
+    print(f"   filter {len(docs) / filter_seconds:>10.0f} docs/s")
+    print(f"   embed all {all_embed:.2f}s  vs  filter + embed kept "
+          f"{filter_seconds + kept_embed:.2f}s")
+    return [
+        metric("dedup_throughput", len(docs) / filter_seconds, "docs/s", True),
+        metric("dedup_dropped_fraction", stats.dropped / stats.documents, "ratio", True),
+        metric("dedup_text_saved_fraction", stats.saved_fraction, "ratio", True),
+        metric("embed_all_seconds", all_embed, "s", False, embedder=config["embedder"]),
+        metric("dedup_and_embed_seconds", filter_seconds + kept_embed, "s", False,
+               embedder=config["embedder"]),
+    ]
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, default=10_000, help="Corpus size")
+    parser.add_argument("--duplicate-rate", type=float, default=0.3,
+                        help="Share of pages that copy an earlier page")
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--embedder", choices=["hashing", "sentence-transformers"],
+                        default="hashing")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    config = {
+        "size": args.size,
+        "duplicate_rate": args.duplicate_rate,
+        "threshold": args.threshold,
+        "embedder": args.embedder,
+        "batch_size": args.batch_size,
+        "dim": args.dim,
+    }
+
+    print("=" * 70)
+    print("⏱️  Ingestion-Time Deduplication")
+    print("=" * 70)
+    metrics = run(config)
+
+    write_results(args.output, metrics, config)
+    print(f"\n💾 Results written to {args.output}")
+    for m in metrics:
+        print(f"  {metric_key(m)}: {m['value']:.3f} {m['unit']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
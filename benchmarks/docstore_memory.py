@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Document Store Memory Benchmark
+
+Compares the memory held by the documents themselves (not the embeddings):
+- list of dicts - what VectorStore keeps by default
+- DocumentColumns - what VectorStore(columnar=True) keeps
+
+Also times reading `content` + one metadata field back, since the columnar
+store decodes on access.
+
+Usage:
+    python benchmarks/docstore_memory.py
+    python benchmarks/docstore_memory.py --sizes 100000,1000000
+"""
+
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Iterator, List
+
+from common import metric, metric_key, synthetic_corpus, write_results
+
+from rag.docstore import DocumentColumns
+
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_OUTPUT = BENCH_DIR / "results" / "docstore_memory.json"
+
+
+def documents(size: int) -> Iterator[dict]:
+    """Fresh copies of the synthetic corpus, with a per-document source field."""
+    for doc in synthetic_corpus(size, words_per_doc=40):
+        doc["metadata"]["source"] = f"faq_{doc['id'] % 500}.md"
+        yield doc
+
+
+def measure(build) -> tuple:
+    """(store, bytes still allocated after building it)"""
+    gc.collect()
+    tracemalloc.start()
+    store = build()
+    gc.collect()
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return store, current
+
+
+def read_all(store) -> float:
+    """Seconds to read content and the category of every document."""
+    start = time.perf_counter()
+    for i in range(len(store)):
+        doc = store[i]
+        doc["content"]
+        doc["metadata"]["category"]
+    return time.perf_counter() - start
+
+
+def run(config: dict) -> List[dict]:
+    metrics = []
+    for size in config["sizes"]:
+        print(f"\n📏 {size} documents")
+        for layout, build in (("dicts", lambda: list(documents(size))),
+                              ("columnar", lambda: _columnar(size))):
+            store, used = measure(build)
+            seconds = read_all(store)
+            metrics.append(metric("docstore_memory", used / 1e6, "MB", layout=layout,
+                                  corpus_size=size))
+            metrics.append(metric("docstore_bytes_per_doc", used / size, "B", layout=layout,
+                                  corpus_size=size))
+            metrics.append(metric("docstore_read_rate", size / seconds, "docs/s", True,
+                                  layout=layout, corpus_size=size))
+            print(f"   {layout:<9} {used / 1e6:8.1f} MB  {used / size:7.0f} B/doc  "
+                  f"read {size / seconds:>10.0f} docs/s")
+            del store
+    return metrics
+
+
+def _columnar(size: int) -> DocumentColumns:
+    columns = DocumentColumns(size)
+    columns.extend(documents(size))
+    return columns
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="10000,100000",
+                        help="Comma-separated corpus sizes (default: 10000,100000)")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    config = {"sizes": [int(s) for s in args.sizes.split(",")]}
+
+    print("=" * 70)
+    print("⏱️  Document Store Memory")
+    print("=" * 70)
+    metrics = run(config)
+
+    write_results(args.output, metrics, config)
+    print(f"\n💾 Results written to {args.output}")
+    for m in metrics:
+        print(f"  {metric_key(m)}: {m['value']:.1f} {m['unit']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
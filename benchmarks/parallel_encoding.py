@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Parallel Encoding Scaling Benchmark
+
+Measures docs/sec of `rag.indexing.parallel_encode()` for a sweep of worker
+counts against plain in-process encoding, so you can see how throughput
+scales with cores on your machine (and where it stops scaling).
+
+Usage:
+    python benchmarks/parallel_encoding.py                       # hashing embedder
+    python benchmarks/parallel_encoding.py --workers 1,2,4,8 --docs 20000
+    python benchmarks/parallel_encoding.py --embedder sentence-transformers
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+from common import metric, metric_key, synthetic_corpus, write_results
+
+from rag.indexing import make_embedder_factory, parallel_encode
+
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_OUTPUT = BENCH_DIR / "results" / "parallel_encoding.json"
+
+
+def best_seconds(func, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(config: dict) -> List[dict]:
+    texts = [doc["content"] for doc in synthetic_corpus(config["docs"])]
+    factory = make_embedder_factory(config["embedder"], config["model"], config["dim"])
+    rounds = config["rounds"]
+
+    print(f"\n📦 {len(texts)} documents, {os.cpu_count()} cores visible")
+    embedder = factory()
+    embedder.encode(texts[:8])  # load the model outside the timed region
+    single = best_seconds(lambda: embedder.encode(texts), rounds)
+    metrics = [metric("encode_throughput", len(texts) / single, "docs/s", True, workers=0)]
+    print(f"   in-process: {len(texts) / single:>10.0f} docs/s")
+
+    for workers in config["workers"]:
+        seconds = best_seconds(lambda: parallel_encode(
+            texts, factory, workers=workers, threads_per_worker=config["threads_per_worker"],
+            batch_size=config["batch_size"]), rounds)
+        metrics.append(metric("encode_throughput", len(texts) / seconds, "docs/s", True,
+                              workers=workers))
+        metrics.append(metric("encode_speedup", single / seconds, "x", True, workers=workers))
+        print(f"   {workers:>2} workers: {len(texts) / seconds:>10.0f} docs/s "
+              f"({single / seconds:.2f}x)")
+    return metrics
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    cores = os.cpu_count() or 1
+    default_workers = sorted({1, 2, max(1, cores // 2), cores})
+    parser.add_argument("--workers", default=",".join(map(str, default_workers)),
+                        help="Comma-separated worker counts (default: 1,2,cores/2,cores)")
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--rounds", type=int, default=2,
+                        help="Repeat each measurement and keep the best")
+    parser.add_argument("--embedder", choices=["hashing", "sentence-transformers"],
+                        default="hashing")
+    parser.add_argument("--model", default=None,
+                        help="Model for --embedder sentence-transformers")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension for --embedder hashing")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    config = {
+        "workers": [int(w) for w in args.workers.split(",")],
+        "threads_per_worker": args.threads_per_worker,
+        "docs": args.docs,
+        "batch_size": args.batch_size,
+        "rounds": args.rounds,
+        "embedder": args.embedder,
+        "model": args.model,
+        "dim": args.dim,
+    }
+
+    print("=" * 70)
+    print("⏱️  Parallel Encoding Scaling")
+    print("=" * 70)
+    metrics = run(config)
+
+    write_results(args.output, metrics, config)
+    print(f"\n💾 Results written to {args.output}")
+    for m in metrics:
+        print(f"  {metric_key(m)}: {m['value']:.2f} {m['unit']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
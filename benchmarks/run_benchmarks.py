@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Retrieval Stack Benchmarks
+
+Measures, on synthetic corpora of configurable size:
+- Embedding throughput (docs/sec)
+- Ingestion rate into VectorStore (docs/sec)
+- Memory footprint of the store (MB)
+- search() latency vs corpus size (p50/p95/mean ms)
+- Peak memory allocated per search (KB)
+- End-to-end rag_query() latency (ms)
+
+Results are written as JSON and compared against a saved baseline; the
+script exits with status 1 if any metric regressed beyond the tolerance.
+
+Usage:
+    python benchmarks/run_benchmarks.py                          # quick run
+    python benchmarks/run_benchmarks.py --sizes 1000,10000,100000
+    python benchmarks/run_benchmarks.py --save-baseline          # record a baseline
+    python benchmarks/run_benchmarks.py --embedder sentence-transformers
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import List
+
+from common import (compare_to_baseline, latency_metrics, metric, metric_key,
+                    synthetic_corpus, synthetic_queries, time_calls, write_results)
+
+from rag.context import ContextBuilder
+from rag.embeddings import HashingEmbedder, SentenceTransformerEmbedder
+from rag.pipeline import rag_query
+from rag.tokenization import get_tokenizer_service
+from rag.vector_store import VectorStore
+
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_OUTPUT = BENCH_DIR / "results" / "latest.json"
+DEFAULT_BASELINE = BENCH_DIR / "results" / "baseline.json"
+
+
+def make_embedder(config: dict):
+    if config["embedder"] == "sentence-transformers":
+        return SentenceTransformerEmbedder(config["model"])
+    return HashingEmbedder(dim=config["dim"])
+
+
+def bench_embedding(embedder, docs: List[dict], batch_size: int, rounds: int) -> List[dict]:
+    texts = [d["content"] for d in docs]
+    elapsed = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for i in range(0, len(texts), batch_size):
+            embedder.encode(texts[i:i + batch_size])
+        elapsed = min(elapsed, time.perf_counter() - start)
+    return [metric("embedding_throughput", len(texts) / elapsed, "docs/s",
+                   higher_is_better=True, docs=len(texts), batch_size=batch_size)]
+
+
+def build_store(embedder, docs: List[dict], batch_size: int) -> VectorStore:
+    store = VectorStore(embedder, initial_capacity=len(docs))
+    for i in range(0, len(docs), batch_size):
+        store.add_documents(docs[i:i + batch_size])
+    return store
+
+
+def bench_ingestion(embedder, docs: List[dict], batch_size: int, rounds: int) -> List[dict]:
+    elapsed = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        build_store(embedder, docs, batch_size)
+        elapsed = min(elapsed, time.perf_counter() - start)
+    return [metric("ingestion_rate", len(docs) / elapsed, "docs/s",
+                   higher_is_better=True, corpus_size=len(docs))]
+
+
+def bench_memory(embedder, docs: List[dict], batch_size: int) -> List[dict]:
+    tracemalloc.start()
+    store = build_store(embedder, docs, batch_size)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+    mb = 1024 * 1024
+    return [
+        metric("store_memory", current / mb, "MB", corpus_size=len(docs)),
+        metric("ingest_peak_memory", peak / mb, "MB", corpus_size=len(docs)),
+    ]
+
+
+def bench_search(store: VectorStore, queries: List[str], top_k: int,
+                 rounds: int) -> List[dict]:
+    durations = [min(time_calls(lambda: store.search(query, top_k=top_k), rounds))
+                 for query in queries]
+    return latency_metrics("search_latency", durations, corpus_size=len(store), top_k=top_k)
+
+
+def bench_search_allocations(store: VectorStore, queries: List[str], top_k: int) -> List[dict]:
+    """Peak bytes allocated by one search, excluding query embedding."""
+    embeddings = store.embedder.encode(queries)
+    peaks = []
+    for embedding in embeddings:
+        tracemalloc.start()
+        store.search_by_vector(embedding, top_k)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return [metric("search_peak_alloc", max(peaks) / 1024, "KB",
+                   corpus_size=len(store), top_k=top_k)]
+
+
+def bench_rag_query(store: VectorStore, queries: List[str], builder: ContextBuilder,
+                    top_k: int, rounds: int) -> List[dict]:
+    durations = [min(time_calls(lambda: rag_query(query, store, builder, top_k=top_k), rounds))
+                 for query in queries]
+    return latency_metrics("rag_query_latency", durations, corpus_size=len(store), top_k=top_k)
+
+
+def run(config: dict) -> List[dict]:
+    """Run every benchmark for every corpus size and return the metrics."""
+    embedder = make_embedder(config)
+    queries = synthetic_queries(config["queries"])
+    if config["tokenizer"]:
+        count_tokens = get_tokenizer_service(config["tokenizer"])
+    else:
+        count_tokens = lambda text: len(text.split())  # noqa: E731
+    builder = ContextBuilder(max_tokens=config["context_tokens"], count_tokens=count_tokens)
+
+    metrics = []
+    largest = synthetic_corpus(max(config["sizes"]))
+    rounds = config["rounds"]
+    metrics += bench_embedding(embedder, largest[:config["embed_docs"]], config["batch_size"],
+                               rounds)
+
+    for size in config["sizes"]:
+        docs = largest[:size]
+        print(f"  📏 corpus_size={size}")
+        metrics += bench_ingestion(embedder, docs, config["batch_size"], rounds)
+        metrics += bench_memory(embedder, docs, config["batch_size"])
+        store = build_store(embedder, docs, config["batch_size"])
+        store.search(queries[0], top_k=config["top_k"])  # warm-up
+        metrics += bench_search(store, queries, config["top_k"], rounds)
+        metrics += bench_search_allocations(store, queries[:20], config["top_k"])
+        metrics += bench_rag_query(store, queries, builder, config["top_k"], rounds)
+    return metrics
+
+
+def print_table(metrics: List[dict]):
+    width = max(len(metric_key(m)) for m in metrics)
+    for m in metrics:
+        print(f"  {metric_key(m):<{width}}  {m['value']:>14.3f} {m['unit']}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="1000,10000",
+                        help="Comma-separated corpus sizes (default: 1000,10000)")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per size")
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="Repeat each measurement and keep the best, to damp noise")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--embed-docs", type=int, default=2000,
+                        help="Documents used for the embedding throughput test")
+    parser.add_argument("--embedder", choices=["hashing", "sentence-transformers"],
+                        default="hashing")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2",
+                        help="Model for --embedder sentence-transformers")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension for --embedder hashing")
+    parser.add_argument("--tokenizer", default=None,
+                        help="Hugging Face tokenizer for rag_query (default: word count)")
+    parser.add_argument("--context-tokens", type=int, default=512)
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Also write the results to --baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed relative regression (default: 0.15)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    config = {
+        "sizes": [int(s) for s in args.sizes.split(",")],
+        "queries": args.queries,
+        "rounds": args.rounds,
+        "top_k": args.top_k,
+        "batch_size": args.batch_size,
+        "embed_docs": args.embed_docs,
+        "embedder": args.embedder,
+        "model": args.model,
+        "dim": args.dim,
+        "tokenizer": args.tokenizer,
+        "context_tokens": args.context_tokens,
+    }
+
+    print("=" * 70)
+    print("⏱️  Retrieval Stack Benchmarks")
+    print("=" * 70)
+    metrics = run(config)
+    print()
+    print_table(metrics)
+
+    write_results(args.output, metrics, config)
+    print(f"\n💾 Results written to {args.output}")
+    if args.save_baseline:
+        write_results(args.baseline, metrics, config)
+        print(f"💾 Baseline saved to {args.baseline}")
+        return 0
+
+    baseline_path = Path(args.baseline)
+    if not baseline_path.exists():
+        print("ℹ️  No baseline yet - run with --save-baseline to record one")
+        return 0
+
+    regressions = compare_to_baseline(metrics, json.loads(baseline_path.read_text()),
+                                      args.tolerance)
+    if not regressions:
+        print(f"✅ No regressions beyond {args.tolerance:.0%} vs {baseline_path}")
+        return 0
+    print(f"❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+    for r in regressions:
+        print(f"   {r['metric']}: {r['baseline']} -> {r['current']} ({r['change']:+.1%})")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Storage Dtype Benchmark
+
+Compares VectorStore with float32, float16 and bfloat16 embedding storage:
+- Embedding memory (MB)
+- Search latency (p50/p95/mean ms)
+- Ranking agreement with float32: top-k overlap and identical top-k order
+
+Usage:
+    python benchmarks/storage_dtype.py
+    python benchmarks/storage_dtype.py --size 200000 --top-k 10
+    python benchmarks/storage_dtype.py --embedder sentence-transformers
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from common import (latency_metrics, metric, metric_key, synthetic_corpus, synthetic_queries,
+                    time_calls, write_results)
+
+from rag.embeddings import HashingEmbedder, SentenceTransformerEmbedder
+from rag.scoring import STORAGE_DTYPES
+from rag.vector_store import VectorStore
+
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_OUTPUT = BENCH_DIR / "results" / "storage_dtype.json"
+
+
+def ranking_agreement(reference: List[List[int]], results: List[List[int]], k: int):
+    """Mean top-k overlap and fraction of queries with an identical top-k list."""
+    overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(reference, results)])
+    exact = np.mean([a == b for a, b in zip(reference, results)])
+    return float(overlap), float(exact)
+
+
+def run(config: dict) -> List[dict]:
+    if config["embedder"] == "sentence-transformers":
+        embedder = SentenceTransformerEmbedder(config["model"])
+    else:
+        embedder = HashingEmbedder(dim=config["dim"])
+    docs = synthetic_corpus(config["size"])
+    queries = synthetic_queries(config["queries"])
+    k = config["top_k"]
+
+    print(f"\n📦 Embedding {len(docs)} documents and {len(queries)} queries...")
+    doc_embeddings = embedder.encode([d["content"] for d in docs])
+    query_embeddings = np.asarray(embedder.encode(queries), dtype=np.float32)
+
+    metrics, reference = [], None
+    for dtype in STORAGE_DTYPES:
+        store = VectorStore(embedder, initial_capacity=len(docs), dtype=dtype)
+        store.upsert_embedded(docs, doc_embeddings)
+        ids = [[doc["id"] for doc, _ in store.search_by_vector(q, k)] for q in query_embeddings]
+        reference = reference or ids
+
+        best = None
+        for _ in range(config["rounds"]):
+            it = iter(query_embeddings)
+            durations = time_calls(lambda: store.search_by_vector(next(it), k), len(queries))
+            best = durations if best is None or sum(durations) < sum(best) else best
+
+        overlap, exact = ranking_agreement(reference, ids, k)
+        memory_mb = store.stats()["embedding_bytes"] / 1e6
+        metrics.append(metric("embedding_memory", memory_mb, "MB", dtype=dtype))
+        metrics += latency_metrics("search_latency", best, dtype=dtype)
+        metrics.append(metric("topk_overlap", overlap, "ratio", True, dtype=dtype, k=k))
+        metrics.append(metric("topk_exact_order", exact, "ratio", True, dtype=dtype, k=k))
+        print(f"   {dtype:<9} {memory_mb:8.1f} MB  p50 {np.median(best):7.2f} ms  "
+              f"overlap@{k} {overlap:.4f}  same order {exact:.1%}")
+    return metrics
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, default=100_000, help="Corpus size")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="Repeat the latency measurement and keep the best")
+    parser.add_argument("--embedder", choices=["hashing", "sentence-transformers"],
+                        default="hashing")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2",
+                        help="Model for --embedder sentence-transformers")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension for --embedder hashing")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    config = {
+        "size": args.size,
+        "queries": args.queries,
+        "top_k": args.top_k,
+        "rounds": args.rounds,
+        "embedder": args.embedder,
+        "model": args.model,
+        "dim": args.dim,
+    }
+
+    print("=" * 70)
+    print("⏱️  Storage Dtype Benchmark")
+    print("=" * 70)
+    metrics = run(config)
+
+    write_results(args.output, metrics, config)
+    print(f"\n💾 Results written to {args.output}")
+    for m in metrics:
+        print(f"  {metric_key(m)}: {m['value']:.4f} {m['unit']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,16 @@
+"""
+rag - reusable building blocks for the RAG Learning lessons.
+
+The lesson scripts stay small and self-contained on purpose. This package
+holds the production-grade versions of the same ideas so the later lessons
+(and the services built from them) can import them.
+"""
+
+from rag.embeddings import HashingEmbedder, SentenceTransformerEmbedder
+from rag.vector_store import VectorStore
+
+__all__ = [
+    "HashingEmbedder",
+    "SentenceTransformerEmbedder",
+    "VectorStore",
+]
@@ -0,0 +1,151 @@
+"""
+Approximate Nearest Neighbours: IVF-Flat
+
+`VectorStore.search` scores every row. An inverted-file (IVF) index scores
+only a few clusters instead:
+
+    build:  k-means -> `nlist` centroids; every vector goes to the list of
+            its nearest centroid (lists stored contiguously)
+    search: score the centroids, scan the `nprobe` best lists, take top-k
+
+`nprobe / nlist` is roughly the fraction of the corpus scanned, so the two
+parameters trade speed for recall. Pick them with data, not by guesswork:
+`benchmarks/ann_grid.py` builds a grid of indexes and reports build time,
+memory, QPS and recall@k against exact search.
+
+Vectors are expected to be L2-normalized (as every embedder in
+`rag.embeddings` returns them); scores are dot products = cosine similarity.
+"""
+
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """
+    Brute-force top-k row indices for each query (the recall ground truth).
+
+    Returns:
+        Array of shape (len(queries), k), best first
+    """
+    k = min(k, len(vectors))
+    scores = queries @ vectors.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    """Mean fraction of the true top-k present in the returned top-k."""
+    k = truth.shape[1]
+    hits = sum(len(set(f[:k]) & set(t)) for f, t in zip(found, truth))
+    return hits / (len(truth) * k) if len(truth) else 1.0
+
+
+def _kmeans(vectors: np.ndarray, clusters: int, iterations: int,
+            rng: np.random.Generator) -> np.ndarray:
+    """Spherical k-means (cosine); returns unit-length centroids."""
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        counts = np.bincount(assignment, minlength=clusters)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters with random points so every list is used
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.maximum(norms, 1e-12)
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """
+    IVF-Flat index over a fixed set of vectors.
+
+    Args:
+        nlist: Number of clusters (inverted lists)
+        nprobe: Lists scanned per query (can be overridden per search)
+        train_size: Vectors sampled for k-means (None = all; never fewer than `nlist`)
+        iterations: k-means iterations
+        seed: Random seed for sampling and initialisation
+    """
+
+    def __init__(self, nlist: int = 256, nprobe: int = 8, train_size: Optional[int] = 50_000,
+                 iterations: int = 10, seed: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._rows = np.zeros(0, dtype=np.int64)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self.build_seconds = 0.0
+
+    def build(self, vectors: np.ndarray) -> "IVFIndex":
+        """Train the centroids and assign every vector to its list."""
+        started = time.perf_counter()
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        rng = np.random.default_rng(self.seed)
+        nlist = max(1, min(self.nlist, len(vectors)))
+        sample = vectors
+        train_size = max(self.train_size, nlist) if self.train_size else None
+        if train_size and len(vectors) > train_size:
+            sample = vectors[rng.choice(len(vectors), train_size, replace=False)]
+        self.centroids = _kmeans(sample, nlist, self.iterations, rng)
+
+        assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        self._vectors = vectors[order]
+        self._rows = order.astype(np.int64)
+        self._offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(assignment, minlength=nlist))]).astype(np.int64)
+        self.build_seconds = time.perf_counter() - started
+        return self
+
+    def search(self, query: np.ndarray, k: int = 10,
+               nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k for one query.
+
+        Returns:
+            (rows, scores): row indices into the vectors given to `build()`, best first
+        """
+        if self.centroids is None:
+            raise RuntimeError("Call build() before search()")
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ query
+        probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+        rows = np.concatenate([self._rows[self._offsets[p]:self._offsets[p + 1]]
+                               for p in probes])
+        vectors = np.concatenate([self._vectors[self._offsets[p]:self._offsets[p + 1]]
+                                  for p in probes])
+        if not len(rows):
+            return rows, np.zeros(0, dtype=np.float32)
+        scores = vectors @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return rows[top], scores[top]
+
+    def search_many(self, queries: np.ndarray, k: int = 10,
+                    nprobe: Optional[int] = None) -> np.ndarray:
+        """Row indices of shape (len(queries), k), padded with -1 if a probe comes up short."""
+        found = np.full((len(queries), k), -1, dtype=np.int64)
+        for i, query in enumerate(queries):
+            rows, _ = self.search(query, k, nprobe)
+            found[i, :len(rows)] = rows
+        return found
+
+    def memory_bytes(self) -> int:
+        centroids = self.centroids.nbytes if self.centroids is not None else 0
+        return self._vectors.nbytes + self._rows.nbytes + self._offsets.nbytes + centroids
+
+    def __len__(self) -> int:
+        return len(self._rows)
@@ -0,0 +1,198 @@
+"""
+Async RAG Pipeline
+
+`rag_query()` runs each step one after another and blocks its thread while
+waiting on the network. `AsyncRAGPipeline.query()` is a coroutine:
+
+    ┌─ cache lookup ───────────────┐
+    ├─ embed query ─> dense search ┤──> fuse ──> build context ──> generate
+    └─ lexical (BM25) search ──────┘
+
+- Independent stages (cache lookup, dense retrieval, lexical retrieval) run
+  concurrently; a cache hit cancels the rest.
+- CPU-bound work (local model encoding, matrix scoring, BM25, context
+  packing and prompt layout) runs in a bounded thread pool; numpy and torch
+  release the GIL for the heavy parts.
+- Network-bound work (Bedrock embeddings and generation) is awaited via the
+  components' `aencode()` / `agenerate()` methods, so it holds no thread.
+
+One event loop can therefore keep hundreds of questions in flight with only
+`max_workers` threads.
+"""
+
+import asyncio
+import contextvars
+import functools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from rag.context import ContextBuilder
+from rag.lexical import reciprocal_rank_fusion
+from rag.pipeline import RAGAnswer, build_prompt
+from rag.tracing import Tracer, get_tracer
+
+
+class AsyncLRUCache:
+    """
+    In-process answer cache with the async `get` / `set` interface a remote
+    cache (e.g. Redis) would have.
+    """
+
+    def __init__(self, maxsize: int = 10_000):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[object, object]" = OrderedDict()
+
+    async def get(self, key):
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    async def set(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+class AsyncRAGPipeline:
+    """
+    asyncio-native RAG pipeline.
+
+    Args:
+        store: Dense store (`search_by_vector` + `embedder`, or just `search`)
+        context_builder: Packs results into the token budget
+        lexical: Optional BM25 index searched concurrently with the dense store
+        generator: Optional LLM - an object with `agenerate(prompt)` or a plain
+                   `prompt -> str` callable (run in the thread pool)
+        cache: Optional async cache with `get(key)` / `set(key, value)`
+        executor: Thread pool for CPU-bound stages (created if not given)
+        max_workers: Size of the created thread pool
+        tracer: Tracer for per-stage spans (defaults to `get_tracer()`)
+        prompt_layout: Optional rag.prompt_cache.PromptLayout (cacheable prompt prefixes)
+    """
+
+    def __init__(self, store, context_builder: ContextBuilder, lexical=None, generator=None,
+                 cache=None, executor: Optional[ThreadPoolExecutor] = None,
+                 max_workers: int = 8, tracer: Optional[Tracer] = None, prompt_layout=None):
+        self.store = store
+        self.prompt_layout = prompt_layout
+        self.context_builder = context_builder
+        self.lexical = lexical
+        self.generator = generator
+        self.cache = cache
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers,
+                                                       thread_name_prefix="rag-cpu")
+        self.tracer = tracer
+
+    async def _run(self, func, *args, **kwargs):
+        """Run a blocking function in the CPU thread pool, in this task's context."""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()  # spans opened in the pool nest under ours
+        return await loop.run_in_executor(self.executor,
+                                          functools.partial(context.run, func, *args, **kwargs))
+
+    def _cache_key(self, question: str, top_k: int):
+        return (" ".join(question.lower().split()), top_k, getattr(self.store, "version", None))
+
+    async def _dense(self, question: str, top_k: int, tracer: Tracer):
+        store = self.store
+        if not (hasattr(store, "search_by_vector") and hasattr(store, "embedder")):
+            with tracer.span("search", top_k=top_k):
+                return await self._run(store.search, question, top_k=top_k)
+
+        with tracer.span("embed"):
+            if hasattr(store.embedder, "aencode"):
+                embedding = await store.embedder.aencode([question])
+            else:
+                embedding = await self._run(store.embedder.encode, [question])
+        with tracer.span("search", top_k=top_k):
+            query_embedding = np.asarray(embedding, dtype=np.float32)[0]
+            return await self._run(store.search_by_vector, query_embedding, top_k)
+
+    async def _lexical(self, question: str, top_k: int, tracer: Tracer):
+        with tracer.span("lexical_search", top_k=top_k):
+            return await self._run(self.lexical.search, question, top_k=top_k)
+
+    async def _generate(self, prompt: str, tracer: Tracer) -> Optional[str]:
+        if self.generator is None:
+            return None
+        with tracer.span("generate"):
+            if hasattr(self.generator, "agenerate"):
+                return await self.generator.agenerate(prompt)
+            return await self._run(self.generator, prompt)
+
+    @staticmethod
+    async def _cancel(tasks):
+        """Cancel tasks and wait for them, so none is left running unobserved."""
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def query(self, question: str, top_k: int = 5) -> RAGAnswer:
+        """
+        Answer a question.
+
+        Args:
+            question: User's question
+            top_k: Chunks to retrieve from each retriever
+
+        Returns:
+            RAGAnswer (served from the cache when possible)
+        """
+        tracer = self.tracer or get_tracer()
+        with tracer.span("rag_query", top_k=top_k):
+            key = self._cache_key(question, top_k)
+            retrievals = [asyncio.ensure_future(self._dense(question, top_k, tracer))]
+            if self.lexical is not None:
+                retrievals.append(asyncio.ensure_future(self._lexical(question, top_k, tracer)))
+
+            try:
+                cached = None
+                if self.cache is not None:
+                    with tracer.span("cache_lookup"):
+                        cached = await self.cache.get(key)
+                if cached is None:
+                    result_lists = await asyncio.gather(*retrievals)
+            except BaseException:
+                # A failed stage (or a cancelled query) must not leave the others running
+                await self._cancel(retrievals)
+                raise
+            if cached is not None:
+                await self._cancel(retrievals)
+                return cached
+
+            if len(result_lists) > 1:
+                with tracer.span("fuse"):
+                    results = reciprocal_rank_fusion(result_lists, top_k=top_k)
+            else:
+                results = result_lists[0]
+
+            # Tokenizing, MinHash and prompt layout are CPU work (and may load a
+            # tokenizer on first use): keep them off the event loop
+            with tracer.span("context_build") as span:
+                context = await self._run(self.context_builder.build, results)
+                span.set_attribute("tokens", context.tokens)
+            if self.prompt_layout is not None:
+                prompt = await self._run(self.prompt_layout.build, question, context)
+            else:
+                prompt = build_prompt(question, context.text)
+            answer = await self._generate(prompt, tracer)
+
+            rag_answer = RAGAnswer(question=question, context=context, prompt=prompt,
+                                   answer=answer)
+            if self.cache is not None:
+                await self.cache.set(key, rag_answer)
+            return rag_answer
+
+    async def aclose(self):
+        """Shut down the owned thread pool and any async HTTP clients."""
+        for component in (getattr(self.store, "embedder", None), self.generator):
+            if hasattr(component, "aclose"):
+                await component.aclose()
+        if self._owns_executor:
+            self.executor.shutdown(wait=False)
@@ -0,0 +1,367 @@
+"""
+AWS Bedrock Clients (Embeddings + Generation)
+
+Talks to the Bedrock runtime REST API with a Bedrock API key (bearer token),
+the same way tests/test_model_with_api_key.py does, but with both sync and
+async (`a...`) methods so the async pipeline never blocks the event loop.
+
+Configuration comes from the environment (see .env.example):
+    AWS_BEARER_TOKEN_BEDROCK, BEDROCK_RUNTIME_REGION / AWS_REGION,
+    MODEL_ID (generation), BEDROCK_EMBEDDING_MODEL (embeddings)
+
+HTTP connections are pooled: one `httpx.Client` / `httpx.AsyncClient` per
+object, created on first use.
+
+Every call goes through client-side back-pressure (see rag/resilience.py):
+an AIMD rate limiter that slows down on ThrottlingException / 429, retries
+with jittered exponential backoff, and a circuit breaker that fails fast
+while Bedrock is erroring and probes it before trusting it again. When the
+client sheds a call itself it raises `BedrockError` with error type
+`ClientThrottled` (429) or `CircuitOpen` (503), without touching the network.
+
+`BedrockEmbedder` never pays twice for the same text at once: duplicate
+requests in flight share one call (threads and coroutines alike), duplicates
+within a batch are sent once, and results are kept for `cache_ttl` seconds.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from collections import Counter
+from typing import List, Optional
+
+import numpy as np
+
+from rag.prompt_cache import CachedPrompt
+from rag.resilience import AdaptiveRateLimiter, CircuitBreaker
+from rag.singleflight import AsyncSingleFlight, SingleFlight, TTLCache
+
+
+DEFAULT_GENERATION_MODEL = "us.anthropic.claude-3-5-haiku-20241022-v1:0"
+DEFAULT_EMBEDDING_MODEL = "amazon.titan-embed-text-v2:0"
+
+THROTTLING_ERRORS = {"ThrottlingException", "TooManyRequestsException",
+                     "ServiceQuotaExceededException"}
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class BedrockError(Exception):
+    """A Bedrock call returned a non-200 response."""
+
+    def __init__(self, status_code: int, error_type: str, message: str):
+        super().__init__(f"HTTP {status_code} {error_type}: {message}")
+        self.status_code = status_code
+        self.error_type = error_type
+        self.message = message
+
+
+class BedrockHTTPClient:
+    """
+    Shared plumbing: endpoint, auth header, pooled sync/async HTTP clients.
+
+    Args:
+        region: AWS region (defaults to BEDROCK_RUNTIME_REGION / AWS_REGION)
+        api_key: Bedrock API key (defaults to AWS_BEARER_TOKEN_BEDROCK)
+        endpoint_url: Override the endpoint (e.g. a local fake in tests)
+        timeout: Request timeout in seconds
+        max_connections: Connection pool size
+        rate_limiter: AdaptiveRateLimiter (pass one instance to several clients
+                      to share it; default: one per client)
+        circuit_breaker: CircuitBreaker (default: one per client)
+        max_retries: Retries after throttling, 5xx or connection errors
+        backoff: Base delay in seconds for exponential backoff (full jitter)
+        max_queue_wait: Longest a call may wait for the rate limiter before it is
+                        shed with `ClientThrottled` instead
+    """
+
+    def __init__(self, region: Optional[str] = None, api_key: Optional[str] = None,
+                 endpoint_url: Optional[str] = None, timeout: float = 30.0,
+                 max_connections: int = 100,
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 max_retries: int = 3, backoff: float = 0.2, max_queue_wait: float = 10.0):
+        region = region or os.getenv("BEDROCK_RUNTIME_REGION") or os.getenv("AWS_REGION", "us-east-1")
+        self.endpoint_url = (endpoint_url or f"https://bedrock-runtime.{region}.amazonaws.com").rstrip("/")
+        self.api_key = api_key or os.getenv("AWS_BEARER_TOKEN_BEDROCK")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_queue_wait = max_queue_wait
+        self.retries = 0
+        self._client = None
+        self._async_client = None
+
+    @property
+    def headers(self) -> dict:
+        headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def _limits(self):
+        import httpx
+        return httpx.Limits(max_connections=self.max_connections,
+                            max_keepalive_connections=self.max_connections)
+
+    @property
+    def client(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.Client(base_url=self.endpoint_url, headers=self.headers,
+                                        timeout=self.timeout, limits=self._limits())
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            import httpx
+            self._async_client = httpx.AsyncClient(base_url=self.endpoint_url,
+                                                   headers=self.headers,
+                                                   timeout=self.timeout, limits=self._limits())
+        return self._async_client
+
+    @staticmethod
+    def _parse(response) -> dict:
+        try:
+            data = response.json()
+        except ValueError:
+            data = {"message": response.text}
+        if response.status_code != 200:
+            error_type = (response.headers.get("x-amzn-ErrorType", "").split(":")[0]
+                          or data.get("__type", "") or "UnknownError")
+            raise BedrockError(response.status_code, error_type, data.get("message", ""))
+        return data
+
+    # ------------------------------------------------------------------
+    # Back-pressure: rate limit, circuit breaker, retries
+    # ------------------------------------------------------------------
+
+    def _admit(self) -> float:
+        """
+        Circuit breaker first, then a rate-limiter slot: a call the breaker
+        rejects must not spend a token or wait in the queue.
+
+        Returns:
+            Seconds to wait before sending (BedrockError if the call is shed)
+        """
+        if not self.circuit_breaker.allow():
+            retry_after = self.circuit_breaker.retry_after()
+            raise BedrockError(503, "CircuitOpen", f"{self.endpoint_url} is failing"
+                               + (f"; next probe in {retry_after:.1f}s" if retry_after else ""))
+        wait = self.rate_limiter.reserve(self.max_queue_wait)
+        if wait is None:
+            self.circuit_breaker.release()
+            raise BedrockError(429, "ClientThrottled",
+                               f"rate limited to {self.rate_limiter.rate:.1f} req/s; "
+                               f"queue wait over {self.max_queue_wait}s")
+        return wait
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Record a failed attempt; the backoff before retrying it, or None to give up."""
+        import httpx
+
+        if isinstance(error, BedrockError):
+            throttled = error.status_code == 429 or error.error_type in THROTTLING_ERRORS
+            retryable = throttled or error.status_code in RETRYABLE_STATUS
+        else:
+            throttled = False
+            retryable = isinstance(error, httpx.TransportError)  # timeouts, resets, ...
+        if throttled:
+            self.rate_limiter.on_throttle()
+        if retryable and not throttled:
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.record_success()  # it answered: throttling is the limiter's job
+        if not retryable or attempt >= self.max_retries:
+            return None
+        self.retries += 1
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    def _succeeded(self):
+        self.rate_limiter.on_success()
+        self.circuit_breaker.record_success()
+
+    def post(self, path: str, body: dict) -> dict:
+        content = json.dumps(body)
+        for attempt in range(self.max_retries + 1):
+            time.sleep(self._admit())
+            try:
+                data = self._parse(self.client.post(path, content=content))
+            except Exception as error:
+                delay = self._retry_delay(error, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self._succeeded()
+            return data
+
+    async def apost(self, path: str, body: dict) -> dict:
+        content = json.dumps(body)
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(self._admit())
+            try:
+                data = self._parse(await self.async_client.post(path, content=content))
+            except Exception as error:
+                delay = self._retry_delay(error, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self._succeeded()
+            return data
+
+    def resilience_stats(self) -> dict:
+        return {"retries": self.retries, "rate_limiter": self.rate_limiter.stats(),
+                "circuit_breaker": self.circuit_breaker.stats()}
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+class BedrockEmbedder(BedrockHTTPClient):
+    """
+    Titan text embeddings, usable anywhere an embedder is expected.
+
+    Titan embeds one text per request, so `aencode()` sends a batch as
+    concurrent requests instead of one after another.
+
+    Args:
+        model_id: Titan model (defaults to BEDROCK_EMBEDDING_MODEL)
+        dimensions: Output size for Titan v2 (256, 512 or 1024)
+        cache_ttl: Seconds an embedding is reused without a new call (0 = no cache;
+                   in-flight duplicates are still coalesced)
+        cache_size: Embeddings kept at most
+        **kwargs: Passed to BedrockHTTPClient (region, api_key, endpoint_url, ...)
+    """
+
+    def __init__(self, model_id: Optional[str] = None, dimensions: Optional[int] = None,
+                 cache_ttl: float = 60.0, cache_size: int = 10_000, **kwargs):
+        super().__init__(**kwargs)
+        self.model_id = model_id or os.getenv("BEDROCK_EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL)
+        self.dimensions = dimensions
+        self.cache = TTLCache(cache_size, cache_ttl) if cache_ttl > 0 else None
+        self._flight = SingleFlight()
+        self._async_flight = AsyncSingleFlight()
+
+    def _body(self, text: str) -> dict:
+        body = {"inputText": text}
+        if "v2" in self.model_id:
+            body["normalize"] = True
+            if self.dimensions:
+                body["dimensions"] = self.dimensions
+        return body
+
+    @property
+    def _path(self) -> str:
+        return f"/model/{self.model_id}/invoke"
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def _vector(self, key: bytes, data: dict) -> np.ndarray:
+        vector = np.asarray(data["embedding"], dtype=np.float32)
+        vector.flags.writeable = False  # shared by every caller that asked for this text
+        if self.cache is not None:
+            self.cache.set(key, vector)
+        return vector
+
+    def embed_one(self, text: str) -> np.ndarray:
+        key = self._key(text)
+        vector = self.cache.get(key) if self.cache is not None else None
+        if vector is None:
+            vector = self._flight.do(
+                key, lambda: self._vector(key, self.post(self._path, self._body(text))))
+        return vector
+
+    async def aembed_one(self, text: str) -> np.ndarray:
+        key = self._key(text)
+        vector = self.cache.get(key) if self.cache is not None else None
+        if vector is None:
+            async def call():
+                return self._vector(key, await self.apost(self._path, self._body(text)))
+            vector = await self._async_flight.do(key, call)
+        return vector
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts (one request per distinct text)."""
+        vectors = {t: self.embed_one(t) for t in dict.fromkeys(texts)}
+        return np.vstack([vectors[t] for t in texts])
+
+    async def aencode(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts with concurrent requests (one per distinct text)."""
+        unique = list(dict.fromkeys(texts))
+        vectors = dict(zip(unique, await asyncio.gather(*(self.aembed_one(t) for t in unique))))
+        return np.vstack([vectors[t] for t in texts])
+
+    def stats(self) -> dict:
+        """Upstream calls made vs requests served from the cache or a shared call."""
+        return {
+            "calls": self._flight.calls + self._async_flight.calls,
+            "coalesced": self._flight.coalesced + self._async_flight.coalesced,
+            "cache_hits": self.cache.hits if self.cache is not None else 0,
+            "cached": len(self.cache) if self.cache is not None else 0,
+        }
+
+
+class BedrockGenerator(BedrockHTTPClient):
+    """
+    Text generation through the Converse API.
+
+    Callable, so it can be passed straight to `rag_query(generate=...)`.
+
+    A `rag.prompt_cache.CachedPrompt` is sent as a system prompt plus content
+    blocks with `cachePoint` markers (`prompt_caching=False` sends the same
+    text without them, for models that do not support prompt caching).
+    `usage` adds up the token usage Bedrock reports, cache reads/writes included.
+    """
+
+    def __init__(self, model_id: Optional[str] = None, max_tokens: int = 512,
+                 temperature: float = 0.2, prompt_caching: bool = True, **kwargs):
+        super().__init__(**kwargs)
+        self.model_id = model_id or os.getenv("MODEL_ID", DEFAULT_GENERATION_MODEL)
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.prompt_caching = prompt_caching
+        self.usage: Counter = Counter()
+
+    def _body(self, prompt: str) -> dict:
+        if isinstance(prompt, CachedPrompt):
+            body = prompt.converse(cache_points=self.prompt_caching)
+        else:
+            body = {"messages": [{"role": "user", "content": [{"text": prompt}]}]}
+        body["inferenceConfig"] = {"maxTokens": self.max_tokens, "temperature": self.temperature}
+        return body
+
+    @property
+    def _path(self) -> str:
+        return f"/model/{self.model_id}/converse"
+
+    def _text(self, data: dict) -> str:
+        # inputTokens, outputTokens, cacheReadInputTokens, cacheWriteInputTokens
+        self.usage.update({key: value for key, value in data.get("usage", {}).items()
+                           if isinstance(value, int)})
+        return data["output"]["message"]["content"][0]["text"]
+
+    def generate(self, prompt: str) -> str:
+        return self._text(self.post(self._path, self._body(prompt)))
+
+    async def agenerate(self, prompt: str) -> str:
+        return self._text(await self.apost(self._path, self._body(prompt)))
+
+    def __call__(self, prompt: str) -> str:
+        return self.generate(prompt)
@@ -0,0 +1,229 @@
+"""
+ChromaDB-Backed Store
+
+`docker-compose.yml` runs a `chromadb` service; `ChromaVectorStore` puts the
+same `add_document()` / `search()` interface as `VectorStore` in front of it:
+
+    store = ChromaVectorStore(embedder, "faq", host="chromadb")   # Docker service
+    store = ChromaVectorStore(embedder, "faq")                    # embedded, in-process
+    store.add_documents(docs)
+    store.search("how do I get a refund?", top_k=2)
+
+- Writes are buffered and sent as large upserts (one embedding call and one
+  round trip per `batch_size` documents, capped at the server's max batch
+  size). `search()` flushes first, so reads always see earlier writes.
+- HTTP clients are pooled per (host, port): every store talking to the same
+  server shares one keep-alive connection pool.
+- We embed with our own embedder and give Chroma the vectors, so results are
+  comparable with the in-process store. Scores are cosine similarities.
+
+Configuration defaults come from the environment: CHROMA_HOST, CHROMA_PORT.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+DEFAULT_BATCH_SIZE = 1024
+
+_clients: Dict[Tuple, object] = {}
+_clients_lock = threading.Lock()
+
+
+def chroma_client(host: Optional[str] = None, port: Optional[int] = None, path=None,
+                  max_connections: int = 32):
+    """
+    Shared Chroma client.
+
+    Args:
+        host: Chroma server host (default: CHROMA_HOST); None = embedded mode
+        port: Server port (default: CHROMA_PORT or 8000)
+        path: Directory for an embedded persistent client (embedded mode only)
+        max_connections: HTTP connection pool size (server mode)
+
+    Returns:
+        One client per (host, port) or path, reused across calls
+    """
+    import chromadb
+    from chromadb.config import Settings
+
+    host = host or os.getenv("CHROMA_HOST")
+    port = int(port or os.getenv("CHROMA_PORT", 8000))
+    key = ("http", host, port) if host else ("embedded", str(path) if path else None)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            if host:
+                settings = Settings(anonymized_telemetry=False,
+                                    chroma_http_max_connections=max_connections,
+                                    chroma_http_max_keepalive_connections=max_connections)
+                client = chromadb.HttpClient(host=host, port=port, settings=settings)
+            elif path:
+                client = chromadb.PersistentClient(path=str(path),
+                                                   settings=Settings(anonymized_telemetry=False))
+            else:
+                client = chromadb.EphemeralClient(Settings(anonymized_telemetry=False))
+            _clients[key] = client
+        return client
+
+
+def _check_metadata(metadata: Optional[dict]) -> Optional[dict]:
+    if not metadata:
+        return None  # Chroma rejects empty metadata dicts
+    for key, value in metadata.items():
+        if not isinstance(value, (str, int, float, bool)):
+            raise ValueError(f"Chroma metadata values must be str, int, float or bool; "
+                             f"{key!r} is {type(value).__name__}")
+    return metadata
+
+
+class ChromaVectorStore:
+    """
+    Vector store backed by a Chroma collection.
+
+    Documents use the lesson 1 format:
+        {"id": 1, "content": "...", "metadata": {...}}
+
+    Args:
+        embedder: Object with `encode(texts) -> np.ndarray` (see rag.embeddings)
+        collection: Chroma collection name (3-512 chars of [a-zA-Z0-9._-])
+        client: Chroma client; by default `chroma_client(host, port, path)`
+        host: Chroma server host (None and no CHROMA_HOST = embedded)
+        port: Chroma server port
+        path: Persist directory for embedded mode (None = in memory)
+        batch_size: Documents per upsert
+    """
+
+    def __init__(self, embedder, collection: str = "rag-documents", client=None,
+                 host: Optional[str] = None, port: Optional[int] = None, path=None,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        self.embedder = embedder
+        self.client = client or chroma_client(host, port, path)
+        self.collection = self.client.get_or_create_collection(
+            collection, metadata={"hnsw:space": "cosine"}, embedding_function=None)
+        self.batch_size = max(1, min(batch_size, self.client.get_max_batch_size()))
+        self._pending: List[dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # batches reach Chroma in queue order
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def add_document(self, doc: dict):
+        """Queue a document; it is sent with the next full batch or `flush()`."""
+        self.add_documents([doc])
+
+    def add_documents(self, docs: Iterable[dict]):
+        """Queue documents, sending every full batch as one upsert."""
+        for doc in docs:
+            if "id" not in doc or "content" not in doc:
+                raise ValueError("Documents need an 'id' and a 'content' field")
+            _check_metadata(doc.get("metadata"))
+            with self._lock:
+                self._pending.append(doc)
+                full = len(self._pending) >= self.batch_size
+            if full:
+                self._flush(only_full=True)
+
+    upsert = add_document
+    upsert_many = add_documents
+
+    def flush(self):
+        """Send all queued documents."""
+        self._flush(only_full=False)
+
+    def _flush(self, only_full: bool):
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    if not self._pending or (only_full
+                                             and len(self._pending) < self.batch_size):
+                        return
+                    batch = self._pending[:self.batch_size]
+                    del self._pending[:self.batch_size]
+                self._send(batch)
+
+    def _send(self, batch: List[dict]):
+        # Later duplicates of an id win, as with repeated VectorStore upserts
+        batch = list({json.dumps(doc["id"]): doc for doc in batch}.values())
+        embeddings = np.asarray(self.embedder.encode([d["content"] for d in batch]),
+                                dtype=np.float32)
+        self.collection.upsert(
+            ids=[json.dumps(doc["id"]) for doc in batch],
+            embeddings=embeddings,
+            documents=[doc["content"] for doc in batch],
+            metadatas=[_check_metadata(doc.get("metadata")) for doc in batch],
+        )
+
+    def delete(self, doc_id) -> bool:
+        """
+        Delete a document by id.
+
+        Returns:
+            True if the document existed
+        """
+        self.flush()
+        key = json.dumps(doc_id)
+        if not self.collection.get(ids=[key], include=[])["ids"]:
+            return False
+        self.collection.delete(ids=[key])
+        return True
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def search(self, query: str, top_k: int = 2) -> List[Tuple[dict, float]]:
+        """
+        Search for documents similar to the query.
+
+        Args:
+            query: Search query
+            top_k: Number of results to return
+
+        Returns:
+            List of (document, similarity_score) tuples, best first
+        """
+        query_embedding = np.asarray(self.embedder.encode([query]), dtype=np.float32)[0]
+        return self.search_by_vector(query_embedding, top_k)
+
+    def search_by_vector(self, query_embedding: np.ndarray,
+                         top_k: int = 2) -> List[Tuple[dict, float]]:
+        """Same as `search()` but with an already-computed query embedding."""
+        self.flush()
+        if top_k <= 0:
+            return []
+        result = self.collection.query(query_embeddings=[np.asarray(query_embedding)],
+                                       n_results=top_k,
+                                       include=["documents", "metadatas", "distances"])
+        return [(self._document(doc_id, content, metadata), 1.0 - float(distance))
+                for doc_id, content, metadata, distance in zip(
+                    result["ids"][0], result["documents"][0],
+                    result["metadatas"][0], result["distances"][0])]
+
+    def get(self, doc_id) -> Optional[dict]:
+        """Return the stored document with this id, or None."""
+        self.flush()
+        result = self.collection.get(ids=[json.dumps(doc_id)], include=["documents", "metadatas"])
+        if not result["ids"]:
+            return None
+        return self._document(result["ids"][0], result["documents"][0], result["metadatas"][0])
+
+    @staticmethod
+    def _document(doc_id: str, content: str, metadata: Optional[dict]) -> dict:
+        doc = {"id": json.loads(doc_id), "content": content}
+        if metadata:
+            doc["metadata"] = metadata
+        return doc
+
+    def __contains__(self, doc_id) -> bool:
+        return self.get(doc_id) is not None
+
+    def __len__(self) -> int:
+        self.flush()
+        return self.collection.count()
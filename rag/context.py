@@ -0,0 +1,167 @@
+"""
+Context Assembly: Token Budget + Deduplication
+
+Lesson 1 builds the prompt context with `"\\n\\n".join(context_parts)` - every
+retrieved document, whole, no matter how long. More context means more
+prompt tokens, which means more latency and more cost.
+
+ContextBuilder instead:
+1. Walks the retrieved chunks from highest to lowest score
+2. Skips chunks that are near-duplicates of one already picked (MinHash)
+3. Adds a chunk only if it still fits in the token budget
+
+Token counts come from a real tokenizer and, together with the MinHash
+signature, are cached per chunk text. Popular chunks are retrieved over and
+over, so after warm-up packing is a few dictionary lookups per request.
+
+By default the tokenizer is the shared `rag.tokenization.TokenizerService`:
+chunks not seen before are tokenized together in one parallel batch, and
+chunks already tokenized while chunking or indexing are not tokenized again.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from rag.dedup import MinHasher
+from rag.tokenization import DEFAULT_TOKENIZER, get_tokenizer_service
+
+
+def text_key(text: str) -> bytes:
+    """Stable 16-byte key for caching per-text results."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class HuggingFaceTokenCounter:
+    """
+    Count tokens with a `transformers` tokenizer (loaded on first use).
+
+    Kept for code that needs `AutoTokenizer` specifically; the default is the
+    faster, cached `rag.tokenization.TokenizerService`.
+
+    Args:
+        model_name: Any tokenizer on the Hugging Face Hub
+    """
+
+    def __init__(self, model_name: str = DEFAULT_TOKENIZER):
+        self.model_name = model_name
+        self._tokenizer = None
+
+    def __call__(self, text: str) -> int:
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+            self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        return len(self._tokenizer.encode(text, add_special_tokens=False))
+
+
+@dataclass
+class PackedContext:
+    """Result of `ContextBuilder.build()`."""
+
+    text: str
+    chunks: List[Tuple[dict, float]] = field(default_factory=list)
+    tokens: int = 0
+    dropped_duplicates: int = 0
+    dropped_over_budget: int = 0
+
+
+class ContextBuilder:
+    """
+    Pack the best retrieved chunks into a token budget.
+
+    Args:
+        max_tokens: Token budget for the whole context (separators included)
+        count_tokens: `text -> int`; defaults to the shared TokenizerService
+        dedup_threshold: Estimated Jaccard similarity at or above which a
+                         chunk counts as a duplicate (None disables dedup)
+        separator: String placed between chunks
+        cache_size: Number of chunk texts whose stats are kept (LRU)
+    """
+
+    def __init__(self, max_tokens: int = 1024,
+                 count_tokens: Optional[Callable[[str], int]] = None,
+                 dedup_threshold: Optional[float] = 0.8, separator: str = "\n\n",
+                 cache_size: int = 100_000, minhasher: Optional[MinHasher] = None):
+        self.max_tokens = max_tokens
+        self.count_tokens = count_tokens or get_tokenizer_service()
+        self.dedup_threshold = dedup_threshold
+        self.separator = separator
+        self.cache_size = cache_size
+        self.minhasher = minhasher or MinHasher()
+
+        self._cache: "OrderedDict[bytes, Tuple[int, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._separator_tokens: Optional[int] = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def chunk_stats(self, text: str) -> Tuple[int, np.ndarray]:
+        """Token count and MinHash signature of a chunk (cached)."""
+        key = text_key(text)
+        with self._lock:
+            stats = self._cache.get(key)
+            if stats is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return stats
+
+        stats = (self.count_tokens(text), self.minhasher.signature(text))
+        with self._lock:
+            self.cache_misses += 1
+            self._cache[key] = stats
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return stats
+
+    def build(self, results: List[Tuple[dict, float]]) -> PackedContext:
+        """
+        Pack search results into a context string.
+
+        Args:
+            results: (document, score) tuples, as returned by `search()`
+
+        Returns:
+            PackedContext with the text and what was kept or dropped
+        """
+        if self._separator_tokens is None:
+            self._separator_tokens = self.count_tokens(self.separator) if self.separator else 0
+
+        if hasattr(self.count_tokens, "count_batch"):
+            # Tokenize every chunk not seen before in one batch, not one by one
+            with self._lock:
+                unseen = [doc["content"] for doc, _ in results
+                          if text_key(doc["content"]) not in self._cache]
+            if unseen:
+                self.count_tokens.count_batch(unseen)
+
+        packed = PackedContext(text="")
+        picked_signatures = []
+        parts = []
+
+        for doc, score in sorted(results, key=lambda r: r[1], reverse=True):
+            tokens, signature = self.chunk_stats(doc["content"])
+
+            if self.dedup_threshold is not None and any(
+                MinHasher.similarity(signature, other) >= self.dedup_threshold
+                for other in picked_signatures
+            ):
+                packed.dropped_duplicates += 1
+                continue
+
+            cost = tokens + (self._separator_tokens if parts else 0)
+            if packed.tokens + cost > self.max_tokens:
+                # A shorter, lower-scored chunk may still fit
+                packed.dropped_over_budget += 1
+                continue
+
+            parts.append(doc["content"])
+            picked_signatures.append(signature)
+            packed.chunks.append((doc, score))
+            packed.tokens += cost
+
+        packed.text = self.separator.join(parts)
+        return packed
@@ -0,0 +1,246 @@
+"""
+Near-Duplicate Detection with MinHash
+
+Two chunks are near-duplicates when most of their word 3-grams ("shingles")
+are shared, i.e. their Jaccard similarity is high:
+
+    J(A, B) = |A ∩ B| / |A ∪ B|
+
+Comparing shingle sets directly is slow for long texts. MinHash compresses
+each set into a short signature: for each of `num_perm` random hash
+functions keep the minimum hash over the set. The fraction of positions
+where two signatures agree is an unbiased estimate of J(A, B).
+
+At ingestion time every new document has to be checked against everything
+seen so far. `LSHIndex` avoids the all-pairs comparison by banding: the
+signature is cut into `bands` slices of `rows` values, and two documents
+become candidates only if at least one whole slice matches. Documents with
+similarity s collide with probability 1 - (1 - s^rows)^bands - an S-curve
+that is steep around (1/bands)^(1/rows).
+
+`NearDuplicateFilter` puts both together as a streaming ingestion stage:
+exact duplicates (by content hash) and near-duplicates (by MinHash/LSH) are
+dropped before they reach the embedder, and `stats` reports how much
+embedding work that saved.
+"""
+
+import hashlib
+import re
+import zlib
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+_WORD_PATTERN = re.compile(r"\w+")
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def shingles(text: str, size: int = 3) -> List[str]:
+    """Lowercase word n-grams of `text` (the whole text if it is shorter)."""
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+class MinHasher:
+    """
+    Compute MinHash signatures.
+
+    Args:
+        num_perm: Signature length; the Jaccard estimate's error shrinks
+                  as 1/sqrt(num_perm)
+        shingle_size: Words per shingle
+        seed: Seed for the random hash functions (same seed = comparable signatures)
+    """
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_MERSENNE_PRIME), num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_MERSENNE_PRIME), num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of `text` as a uint32 vector of length `num_perm`."""
+        return self._from_shingles(shingles(text, self.shingle_size))
+
+    def _from_shingles(self, grams: List[str]) -> np.ndarray:
+        if not grams:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams),
+                             dtype=np.uint64, count=len(grams))
+        # (a * h + b) mod p for every (permutation, shingle) pair, then min per permutation
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME
+        return (permuted & _MAX_HASH).min(axis=1).astype(np.uint32)
+
+    @staticmethod
+    def similarity(sig1: np.ndarray, sig2: np.ndarray) -> float:
+        """Estimated Jaccard similarity of the texts behind two signatures."""
+        return float(np.mean(sig1 == sig2))
+
+
+# ============================================================================
+# LSH Banding
+# ============================================================================
+
+class LSHIndex:
+    """
+    Banded LSH over MinHash signatures.
+
+    Args:
+        num_perm: Signature length (must match the MinHasher)
+        bands: Number of bands; `num_perm` must be divisible by it
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets: List[Dict[bytes, List[object]]] = [{} for _ in range(bands)]
+        self._signatures: Dict[object, np.ndarray] = {}
+
+    @property
+    def threshold(self) -> float:
+        """Similarity at which the collision probability curve is steepest."""
+        return (1.0 / self.bands) ** (1.0 / self.rows)
+
+    def _band_keys(self, signature: np.ndarray) -> Iterator[bytes]:
+        for band in range(self.bands):
+            yield signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def insert(self, key, signature: np.ndarray):
+        self._signatures[key] = signature
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(band_key, []).append(key)
+
+    def candidates(self, signature: np.ndarray) -> Set[object]:
+        """Keys sharing at least one band with `signature`."""
+        found: Set[object] = set()
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            found.update(buckets.get(band_key, ()))
+        return found
+
+    def query(self, signature: np.ndarray, threshold: float) -> Optional[Tuple[object, float]]:
+        """Most similar indexed key with estimated similarity >= threshold, or None."""
+        best = None
+        for key in self.candidates(signature):
+            similarity = MinHasher.similarity(signature, self._signatures[key])
+            if similarity >= threshold and (best is None or similarity > best[1]):
+                best = (key, similarity)
+        return best
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+
+# ============================================================================
+# Ingestion-Time Deduplication
+# ============================================================================
+
+@dataclass
+class DedupStats:
+    """What the filter saw and what it kept out of the embedder."""
+
+    documents: int = 0
+    kept: int = 0
+    exact_duplicates: int = 0
+    near_duplicates: int = 0
+    chars_seen: int = 0
+    chars_skipped: int = 0
+
+    @property
+    def dropped(self) -> int:
+        return self.exact_duplicates + self.near_duplicates
+
+    @property
+    def saved_fraction(self) -> float:
+        """Share of the input text that was never embedded."""
+        return self.chars_skipped / self.chars_seen if self.chars_seen else 0.0
+
+    def as_dict(self) -> dict:
+        return dict(asdict(self), dropped=self.dropped,
+                    saved_fraction=round(self.saved_fraction, 4))
+
+
+class NearDuplicateFilter:
+    """
+    Streaming filter that drops exact and near-duplicate documents.
+
+    The first document of a group is kept (the canonical one); later ones are
+    dropped and recorded in `duplicates` as `{duplicate_id: canonical_id}`,
+    so lookups by a dropped id can be redirected.
+
+    Args:
+        threshold: Estimated Jaccard similarity at or above which a document
+                   is a near-duplicate
+        num_perm: MinHash signature length
+        bands: LSH bands (see LSHIndex); the default 16 x 8 rows catches
+               ~95% of pairs at similarity 0.8
+        shingle_size: Words per shingle
+        seed: MinHash seed
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, bands: int = 16,
+                 shingle_size: int = 3, seed: int = 1):
+        self.threshold = threshold
+        self.minhasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size, seed=seed)
+        self.index = LSHIndex(num_perm=num_perm, bands=bands)
+        self._exact: Dict[bytes, object] = {}
+        self.duplicates: Dict[object, object] = {}
+        self.stats = DedupStats()
+
+    @staticmethod
+    def _content_hash(text: str) -> bytes:
+        normalized = " ".join(text.lower().split())
+        return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+
+    def check(self, doc: dict) -> Optional[object]:
+        """
+        Register a document.
+
+        Returns:
+            The canonical document's id if `doc` is a duplicate, else None
+        """
+        content = doc["content"]
+        self.stats.documents += 1
+        self.stats.chars_seen += len(content)
+
+        digest = self._content_hash(content)
+        canonical = self._exact.get(digest)
+        if canonical is not None:
+            self.stats.exact_duplicates += 1
+        else:
+            # Texts without words all share one signature: compare them exactly only
+            grams = shingles(content, self.minhasher.shingle_size)
+            signature = match = None
+            if grams:
+                signature = self.minhasher._from_shingles(grams)
+                match = self.index.query(signature, self.threshold)
+            if match is not None:
+                canonical = match[0]
+                self.stats.near_duplicates += 1
+            else:
+                self._exact[digest] = doc["id"]
+                if signature is not None:
+                    self.index.insert(doc["id"], signature)
+                self.stats.kept += 1
+                return None
+
+        self.stats.chars_skipped += len(content)
+        self.duplicates[doc["id"]] = canonical
+        return canonical
+
+    def filter(self, docs: Iterable[dict]) -> Iterator[dict]:
+        """Yield only the documents that are not duplicates of earlier ones."""
+        for doc in docs:
+            if self.check(doc) is None:
+                yield doc
+
+    def canonical(self, doc_id):
+        """Id of the document kept in place of `doc_id` (itself if it was kept)."""
+        return self.duplicates.get(doc_id, doc_id)
@@ -0,0 +1,285 @@
+"""
+Columnar Document Store
+
+A list of document dicts costs a dict, a content string, a metadata dict and
+one object per metadata value for every chunk - several hundred bytes of
+object overhead before counting the text itself. `DocumentColumns` stores the
+same documents column by column:
+
+    ids:       int64 array                  [  1,   2,   3, ...]
+    text:      one UTF-8 buffer + offsets   "Refunds...Shipping...Support..."
+                                            [0, 29, 61, 90, ...]
+    metadata:  one dictionary-encoded column per key
+               category: codes [0, 1, 0, ...]  values ["refunds", "shipping"]
+
+Indexing returns a `DocumentView`: a two-slot object that decodes fields on
+access and otherwise behaves like the document dict (`doc["content"]`,
+`doc.get("metadata", {})`, `dict(doc)`), so search results work unchanged
+with the rest of the package. Views are read-only snapshots of one row;
+`to_dict()` gives a plain, mutable copy.
+"""
+
+import json
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+
+_CORE_FIELDS = ("id", "content", "metadata")
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _grow(array: np.ndarray, size: int, fill=0) -> np.ndarray:
+    """Return `array` or a copy with room for `size` entries."""
+    if size <= len(array):
+        return array
+    grown = np.full(max(size, 2 * len(array)), fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def _value_key(value):
+    """Dictionary key for a metadata value (unhashable values by their JSON)."""
+    try:
+        hash(value)
+        return (type(value), value)
+    except TypeError:
+        return (type(value), json.dumps(value, sort_keys=True, default=str))
+
+
+class _DictColumn:
+    """One metadata key: a code per row (-1 = key absent) plus the distinct values."""
+
+    __slots__ = ("codes", "values", "lookup", "value_bytes")
+
+    def __init__(self, capacity: int):
+        self.codes = np.full(capacity, -1, dtype=np.int32)
+        self.values: list = []
+        self.lookup: dict = {}
+        self.value_bytes = 0  # running estimate, so nbytes stays O(columns)
+
+    def encode(self, value) -> int:
+        key = _value_key(value)
+        code = self.lookup.get(key)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.lookup[key] = code
+            self.value_bytes += len(str(value))
+        return code
+
+    def copy_rows(self, rows: np.ndarray, capacity: int) -> "_DictColumn":
+        codes = self.codes
+        if len(rows) and rows.max() >= len(codes):
+            codes = _grow(codes, int(rows.max()) + 1, -1)  # rows never given this key
+        column = _DictColumn(0)
+        column.codes = np.full(capacity, -1, dtype=np.int32)
+        column.codes[:len(rows)] = codes[rows]
+        column.values = list(self.values)
+        column.lookup = dict(self.lookup)
+        column.value_bytes = self.value_bytes
+        return column
+
+
+class DocumentView(Mapping):
+    """
+    Read-only view of one stored document.
+
+    Behaves like the `{"id", "content", "metadata"}` dict it was built from;
+    fields are decoded from the columns on access.
+    """
+
+    __slots__ = ("_columns", "_row")
+
+    def __init__(self, columns: "DocumentColumns", row: int):
+        self._columns = columns
+        self._row = row
+
+    @property
+    def id(self):
+        return self._columns.id(self._row)
+
+    @property
+    def content(self) -> str:
+        return self._columns.content(self._row)
+
+    @property
+    def metadata(self) -> dict:
+        return self._columns.metadata(self._row)
+
+    def __getitem__(self, key):
+        return self._columns.field(self._row, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._columns.keys(self._row))
+
+    def __len__(self) -> int:
+        return len(self._columns.keys(self._row))
+
+    def __contains__(self, key) -> bool:
+        return key in self._columns.keys(self._row)
+
+    def to_dict(self) -> dict:
+        return self._columns.to_dict(self._row)
+
+    def __repr__(self) -> str:
+        return f"DocumentView({self.to_dict()!r})"
+
+
+class DocumentColumns:
+    """
+    Append-only columnar storage for documents in the lesson 1 format.
+
+    Args:
+        capacity: Rows to pre-allocate in the fixed-width columns
+    """
+
+    def __init__(self, capacity: int = 1024):
+        capacity = max(1, capacity)
+        self._size = 0
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._object_ids: Optional[list] = None  # used once a non-integer id shows up
+        self._text = bytearray()
+        self._offsets = np.zeros(capacity + 1, dtype=np.int64)
+        self._has_metadata = np.zeros(capacity, dtype=bool)
+        self._columns: Dict[str, _DictColumn] = {}
+        self._extra: Dict[int, dict] = {}  # rare top-level fields beyond id/content/metadata
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def append(self, doc: dict) -> int:
+        """Append a document and return its row number."""
+        row = self._size
+        capacity = row + 1
+        self._ids = _grow(self._ids, capacity)
+        self._offsets = _grow(self._offsets, capacity + 1)
+        self._has_metadata = _grow(self._has_metadata, capacity, False)
+
+        doc_id = doc["id"]
+        if self._object_ids is None and not (type(doc_id) is int
+                                             and _INT64_MIN <= doc_id <= _INT64_MAX):
+            self._object_ids = self._ids[:row].tolist()
+        if self._object_ids is not None:
+            self._object_ids.append(doc_id)
+        else:
+            self._ids[row] = doc_id
+
+        self._text += doc["content"].encode("utf-8")
+        self._offsets[row + 1] = len(self._text)
+
+        metadata = doc.get("metadata")
+        if metadata is not None:
+            self._has_metadata[row] = True
+            for key, value in metadata.items():
+                column = self._columns.get(key)
+                if column is None:
+                    column = self._columns[key] = _DictColumn(len(self._ids))
+                column.codes = _grow(column.codes, capacity, -1)
+                column.codes[row] = column.encode(value)
+
+        extra = {k: v for k, v in doc.items() if k not in _CORE_FIELDS}
+        if extra:
+            self._extra[row] = extra
+
+        # Publish the row last: readers only look below _size
+        self._size = row + 1
+        return row
+
+    def extend(self, docs: Iterable[dict]):
+        for doc in docs:
+            self.append(doc)
+
+    def take(self, rows) -> "DocumentColumns":
+        """New columns holding only `rows`, in that order (used by compaction)."""
+        rows = np.asarray(rows, dtype=np.int64)
+        taken = DocumentColumns(len(rows))
+        taken._size = len(rows)
+        if self._object_ids is not None:
+            taken._object_ids = [self._object_ids[i] for i in rows]
+        else:
+            taken._ids[:len(rows)] = self._ids[rows]
+
+        starts, ends = self._offsets[rows], self._offsets[rows + 1]
+        text = self._text
+        taken._text = bytearray(b"".join(text[s:e] for s, e in zip(starts.tolist(),
+                                                                    ends.tolist())))
+        taken._offsets[1:len(rows) + 1] = np.cumsum(ends - starts)
+        taken._has_metadata[:len(rows)] = self._has_metadata[rows]
+        taken._columns = {key: column.copy_rows(rows, len(taken._ids))
+                          for key, column in self._columns.items()}
+        if self._extra:
+            positions = {row: i for i, row in enumerate(rows.tolist())}
+            taken._extra = {positions[row]: extra for row, extra in self._extra.items()
+                            if row in positions}
+        return taken
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, row: int) -> DocumentView:
+        if not 0 <= row < self._size:
+            raise IndexError(row)
+        return DocumentView(self, row)
+
+    def __iter__(self) -> Iterator[DocumentView]:
+        return (DocumentView(self, row) for row in range(self._size))
+
+    def id(self, row: int):
+        if self._object_ids is not None:
+            return self._object_ids[row]
+        return int(self._ids[row])
+
+    def content(self, row: int) -> str:
+        return self._text[self._offsets[row]:self._offsets[row + 1]].decode("utf-8")
+
+    def metadata(self, row: int) -> Optional[dict]:
+        if not self._has_metadata[row]:
+            return None
+        metadata = {}
+        for key, column in self._columns.items():
+            if row < len(column.codes) and column.codes[row] >= 0:
+                metadata[key] = column.values[column.codes[row]]
+        return metadata
+
+    def keys(self, row: int) -> List[str]:
+        keys = ["id", "content"]
+        if self._has_metadata[row]:
+            keys.append("metadata")
+        if row in self._extra:
+            keys.extend(self._extra[row])
+        return keys
+
+    def field(self, row: int, key: str):
+        if key == "id":
+            return self.id(row)
+        if key == "content":
+            return self.content(row)
+        if key == "metadata" and self._has_metadata[row]:
+            return self.metadata(row)
+        extra = self._extra.get(row)
+        if extra is not None and key in extra:
+            return extra[key]
+        raise KeyError(key)
+
+    def to_dict(self, row: int) -> dict:
+        """Plain dict copy of one row."""
+        return {key: self.field(row, key) for key in self.keys(row)}
+
+    def to_dicts(self, rows: Iterable[int]) -> List[dict]:
+        return [self.to_dict(row) for row in rows]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate bytes held by the columns (arrays, text and value dictionaries)."""
+        total = self._ids.nbytes + self._offsets.nbytes + self._has_metadata.nbytes
+        total += len(self._text)
+        for column in self._columns.values():
+            total += column.codes.nbytes + column.value_bytes
+        return total
@@ -0,0 +1,95 @@
+"""
+Embedders - turn a batch of texts into a matrix of unit-length vectors.
+
+Every store in this package talks to an embedder through one method:
+
+    encode(texts: List[str]) -> np.ndarray   # shape (len(texts), dim), float32
+
+so the lesson models (Sentence Transformers, Bedrock Titan) and the
+dependency-free HashingEmbedder used in tests and benchmarks are
+interchangeable.
+"""
+
+import re
+import zlib
+from typing import List, Optional
+
+import numpy as np
+
+
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length (zero rows are left as zeros)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class HashingEmbedder:
+    """
+    Bag-of-words embedder using the "hashing trick".
+
+    Each lowercase word is hashed into one of `dim` buckets, exactly like
+    `simple_embedding()` in lesson 1 but without a hand-picked keyword list.
+    It needs nothing beyond numpy, so tests and benchmarks can run without
+    downloading a model.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch of texts.
+
+        Args:
+            texts: Input texts
+
+        Returns:
+            float32 matrix of shape (len(texts), dim), rows normalized
+        """
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in _TOKEN_PATTERN.findall(text.lower()):
+                matrix[row, zlib.crc32(token.encode("utf-8")) % self.dim] += 1.0
+        return normalize_rows(matrix)
+
+
+class SentenceTransformerEmbedder:
+    """
+    Hugging Face Sentence Transformers model (see real_embeddings_example.py).
+
+    The model is loaded on first use so importing this module stays cheap.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, batch_size: int = 64,
+                 device: Optional[str] = None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.device = device
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    @property
+    def dim(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts with the Sentence Transformers model."""
+        embeddings = self.model.encode(
+            list(texts),
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+        return np.asarray(embeddings, dtype=np.float32)
@@ -0,0 +1,328 @@
+"""
+Retrieval Evaluation: Quality and Latency Together
+
+Lesson 1 hand-checks that the headphones rank first for a music question.
+This harness does it for a whole labeled query set, for any retriever, so
+every speed optimization can be judged by what it costs in quality:
+
+    queries = load_labeled_queries("eval/queries.jsonl")
+    report = evaluate(store, queries, k=10, workers=8)
+    report.summary()   # recall@k, MRR, nDCG@k, latency p50/p95/mean
+
+Labeled queries are JSONL, with relevant ids as a list (all grade 1) or a
+mapping to graded relevance:
+
+    {"query": "noise cancelling headphones", "relevant": [3]}
+    {"query": "return policy", "relevant": {"12": 2, "40": 1}}
+
+A retriever is anything with `search(query, top_k) -> [(doc, score), ...]`
+(VectorStore, BM25Index, QueryWarmCache, ChromaVectorStore, ...) or a plain
+callable `(query, top_k) -> [(doc, score), ...]`.
+
+`CachedEmbedder` wraps an embedder and keeps every embedding it computed in
+an .npz file, so re-running the evaluation (or re-indexing the same corpus)
+after a change does not re-embed anything.
+"""
+
+import argparse
+import hashlib
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+# ============================================================================
+# Labeled Queries
+# ============================================================================
+
+@dataclass
+class LabeledQuery:
+    """A query and the graded relevance of the documents that answer it."""
+
+    query: str
+    relevant: Dict[str, float]
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LabeledQuery":
+        relevant = data["relevant"]
+        if not isinstance(relevant, dict):
+            relevant = {doc_id: 1.0 for doc_id in relevant}
+        # Ids are compared as strings: JSON object keys always are
+        return cls(data["query"], {str(doc_id): float(grade) for doc_id, grade in relevant.items()
+                                   if grade > 0})
+
+
+def load_labeled_queries(path) -> List[LabeledQuery]:
+    with open(path) as f:
+        return [LabeledQuery.from_dict(json.loads(line)) for line in f if line.strip()]
+
+
+# ============================================================================
+# Metrics
+# ============================================================================
+
+def recall_at_k(ranked: List[str], relevant: Dict[str, float], k: int) -> float:
+    """Share of the relevant documents found in the top k."""
+    if not relevant:
+        return 0.0
+    return len(set(ranked[:k]) & relevant.keys()) / len(relevant)
+
+
+def reciprocal_rank(ranked: List[str], relevant: Dict[str, float], k: int) -> float:
+    """1 / rank of the first relevant document in the top k (0 if none)."""
+    for rank, doc_id in enumerate(ranked[:k], start=1):
+        if doc_id in relevant:
+            return 1.0 / rank
+    return 0.0
+
+
+def ndcg_at_k(ranked: List[str], relevant: Dict[str, float], k: int) -> float:
+    """Normalized discounted cumulative gain with graded relevance."""
+    gains = [relevant.get(doc_id, 0.0) for doc_id in ranked[:k]]
+    dcg = sum(gain / np.log2(rank + 1) for rank, gain in enumerate(gains, start=1))
+    ideal = sorted(relevant.values(), reverse=True)[:k]
+    idcg = sum(gain / np.log2(rank + 1) for rank, gain in enumerate(ideal, start=1))
+    return float(dcg / idcg) if idcg else 0.0
+
+
+# ============================================================================
+# Harness
+# ============================================================================
+
+@dataclass
+class QueryResult:
+    query: str
+    ranked: List[str]
+    latency_ms: float
+    recall: float
+    reciprocal_rank: float
+    ndcg: float
+
+
+@dataclass
+class EvaluationReport:
+    k: int
+    results: List[QueryResult] = field(default_factory=list)
+    seconds: float = 0.0
+
+    def summary(self) -> dict:
+        latencies = sorted(r.latency_ms for r in self.results)
+
+        def pct(p: float) -> float:  # nearest rank
+            rank = round(p / 100 * len(latencies))
+            return latencies[min(len(latencies) - 1, max(0, rank - 1))]
+
+        if not self.results:
+            return {"queries": 0}
+        return {
+            "queries": len(self.results),
+            f"recall@{self.k}": statistics.fmean(r.recall for r in self.results),
+            "mrr": statistics.fmean(r.reciprocal_rank for r in self.results),
+            f"ndcg@{self.k}": statistics.fmean(r.ndcg for r in self.results),
+            "latency_p50_ms": pct(50),
+            "latency_p95_ms": pct(95),
+            "latency_mean_ms": statistics.fmean(latencies),
+            "queries_per_sec": len(self.results) / self.seconds if self.seconds else None,
+        }
+
+    def worst(self, count: int = 5) -> List[QueryResult]:
+        """Queries with the lowest nDCG - the first place to look after a regression."""
+        return sorted(self.results, key=lambda r: r.ndcg)[:count]
+
+
+def _search_function(retriever) -> Callable:
+    if hasattr(retriever, "search"):
+        return retriever.search
+    if callable(retriever):
+        return retriever
+    raise TypeError("retriever needs a search(query, top_k) method or must be callable")
+
+
+def evaluate(retriever, queries: Iterable[LabeledQuery], k: int = 10,
+             workers: int = 1) -> EvaluationReport:
+    """
+    Run labeled queries through a retriever and score the rankings.
+
+    Args:
+        retriever: Object with `search(query, top_k)` or a callable (query, top_k)
+        queries: Labeled queries
+        k: Cutoff for recall@k, MRR and nDCG@k
+        workers: Queries run concurrently (latency then includes contention,
+                 as it would under real traffic)
+
+    Returns:
+        EvaluationReport, with per-query results in input order
+    """
+    search = _search_function(retriever)
+    queries = list(queries)
+
+    def run_one(labeled: LabeledQuery) -> QueryResult:
+        start = time.perf_counter()
+        hits = search(labeled.query, top_k=k)
+        latency = (time.perf_counter() - start) * 1000
+        ranked = [str(doc["id"]) for doc, _ in hits]
+        return QueryResult(labeled.query, ranked, latency,
+                           recall_at_k(ranked, labeled.relevant, k),
+                           reciprocal_rank(ranked, labeled.relevant, k),
+                           ndcg_at_k(ranked, labeled.relevant, k))
+
+    started = time.perf_counter()
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_one, queries))
+    else:
+        results = [run_one(q) for q in queries]
+    return EvaluationReport(k, results, time.perf_counter() - started)
+
+
+# ============================================================================
+# Embedding Cache
+# ============================================================================
+
+class CachedEmbedder:
+    """
+    Embedder wrapper that remembers every embedding, optionally on disk.
+
+    Args:
+        embedder: Any object with `encode(texts)`
+        path: .npz file to load from and `save()` to (None = memory only)
+        namespace: Identifies the model; a file written by another model is ignored
+    """
+
+    def __init__(self, embedder, path=None, namespace: Optional[str] = None):
+        self.embedder = embedder
+        self.path = Path(path) if path else None
+        self.namespace = namespace or getattr(embedder, "model_name", None) or \
+            f"{type(embedder).__name__}-{getattr(embedder, 'dim', '')}"
+        self._vectors: Dict[bytes, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.path is not None and self.path.exists():
+            self._load()
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        keys = [self._key(text) for text in texts]
+        with self._lock:
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in self._vectors:
+                    missing.setdefault(key, text)
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        if missing:
+            fresh = np.asarray(self.embedder.encode(list(missing.values())), dtype=np.float32)
+            with self._lock:
+                self._vectors.update(zip(missing.keys(), fresh))
+        with self._lock:
+            return np.stack([self._vectors[key] for key in keys]) if keys else \
+                np.zeros((0, 0), dtype=np.float32)
+
+    def __getattr__(self, name):
+        if name == "embedder":
+            raise AttributeError(name)
+        return getattr(self.embedder, name)  # dim, model_name, ...
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    def _load(self):
+        with np.load(self.path, allow_pickle=False) as data:
+            if str(data["namespace"]) != self.namespace:
+                return
+            keys = data["keys"]
+            self._vectors = {bytes(key): row for key, row in zip(keys, data["vectors"])}
+
+    def save(self):
+        """Write the cache to `path` (atomically)."""
+        if self.path is None:
+            return
+        with self._lock:
+            keys = np.array(list(self._vectors.keys()), dtype="S16")
+            vectors = (np.stack(list(self._vectors.values())) if self._vectors
+                       else np.zeros((0, 0), dtype=np.float32))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, namespace=self.namespace, keys=keys, vectors=vectors)
+        tmp.replace(self.path)
+
+
+# ============================================================================
+# Command Line
+# ============================================================================
+
+def _build_retriever(name: str, docs: List[dict], embedder):
+    from rag.lexical import BM25Index, reciprocal_rank_fusion
+    from rag.vector_store import VectorStore
+
+    store = VectorStore(embedder, initial_capacity=max(len(docs), 1))
+    bm25 = BM25Index()
+    if name in ("dense", "hybrid"):
+        store.add_documents(docs)
+    if name in ("bm25", "hybrid"):
+        bm25.add_documents(docs)
+    if name == "dense":
+        return store
+    if name == "bm25":
+        return bm25
+
+    def hybrid(query: str, top_k: int = 10):
+        return reciprocal_rank_fusion([store.search(query, top_k=2 * top_k),
+                                       bm25.search(query, top_k=2 * top_k)], top_k)
+    return hybrid
+
+
+def main(argv=None) -> int:
+    from rag.indexing import make_embedder_factory, read_jsonl
+
+    parser = argparse.ArgumentParser(description="Score a retriever on labeled queries: "
+                                                 "recall@k, MRR, nDCG@k and latency.")
+    parser.add_argument("--queries", required=True, help="Labeled queries (JSONL)")
+    parser.add_argument("--corpus", required=True, help="Documents (JSONL)")
+    parser.add_argument("--retriever", choices=["dense", "bm25", "hybrid"], default="dense")
+    parser.add_argument("--embedder", choices=["hashing", "sentence-transformers"],
+                        default="sentence-transformers")
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--cache", default="data/eval-embeddings.npz",
+                        help="Embedding cache file ('' to disable)")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--output", default=None, help="Write the summary as JSON")
+    args = parser.parse_args(argv)
+
+    embedder = CachedEmbedder(make_embedder_factory(args.embedder, args.model, args.dim)(),
+                              args.cache or None)
+    docs = read_jsonl(args.corpus)
+    queries = load_labeled_queries(args.queries)
+    retriever = _build_retriever(args.retriever, docs, embedder)
+    report = evaluate(retriever, queries, k=args.top_k, workers=args.workers)
+    embedder.save()
+
+    summary = dict(report.summary(), retriever=args.retriever,
+                   embedding_cache_hits=embedder.hits, embedding_cache_misses=embedder.misses)
+    print(f"📊 {args.retriever} on {len(queries)} queries:")
+    for key, value in summary.items():
+        print(f"   {key:<24} {value:.4f}" if isinstance(value, float) else f"   {key:<24} {value}")
+    print("\n🔍 Lowest nDCG:")
+    for result in report.worst(3):
+        print(f"   {result.ndcg:.3f}  {result.query}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""
+Streaming Text Extraction for Ingestion
+
+`aws/scripts/upload_documents.py` uploads files of any type; the store only
+understands text. The extractors here turn files into lesson 1 documents,
+one per page or section, with where it came from in `metadata`:
+
+    extract("manual.pdf")  ->  {"id": "manual.pdf#0", "content": "...",
+                                "metadata": {"source": "manual.pdf", "format": "pdf", "page": 1}}
+
+| Format | Split at | Position metadata |
+|--------|----------|-------------------|
+| PDF (`.pdf`, needs `pypdf`) | pages | `page`, `pages` |
+| HTML (`.html`, `.htm`) | `<h1>`-`<h6>` | `heading`, `line` |
+| Markdown (`.md`, `.markdown`) | `#` headings (not inside code fences) | `heading`, `line` |
+| Text (anything else) | paragraphs | `line` |
+
+Every extractor is a generator that reads its input incrementally (PDF
+pages are parsed one at a time; HTML is fed to the parser in 64 KB blocks;
+text and Markdown are read line by line), and sections longer than
+`max_chars` are split at paragraph boundaries.
+
+`extract_files()` runs the extractors in a process pool so CPU-heavy
+parsing (PDF especially) uses every core during bulk ingestion.
+"""
+
+import functools
+import io
+import multiprocessing
+import os
+import queue
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+DEFAULT_MAX_CHARS = 4000
+_READ_BLOCK = 64 * 1024
+
+Source = Union[str, Path, Tuple[str, bytes]]
+
+
+# ============================================================================
+# Shared Helpers
+# ============================================================================
+
+class _Chunker:
+    """Collects lines into chunks of at most ~max_chars, cut at blank lines."""
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self._lines: List[str] = []
+        self._size = 0
+        self._first_line = 0
+
+    def add(self, line: str, line_number: int) -> Optional[Tuple[str, int]]:
+        """Add a line; returns a finished chunk when one is full."""
+        done = None
+        if not line.strip() and self._size >= self.max_chars:
+            done = self.flush()
+        elif self._size + len(line) > 2 * self.max_chars:
+            done = self.flush()  # no paragraph break in sight; cut here
+        if not line.strip() and (not self._lines or not self._lines[-1].strip()):
+            return done  # no leading or repeated blank lines
+        if not self._lines:
+            self._first_line = line_number
+        self._lines.append(line)
+        self._size += len(line) + 1
+        return done
+
+    def flush(self) -> Optional[Tuple[str, int]]:
+        text = "\n".join(self._lines).strip()
+        first_line = self._first_line
+        self._lines = []
+        self._size = 0
+        return (text, first_line) if text else None
+
+
+def _name_of(source) -> str:
+    if isinstance(source, tuple):
+        return source[0]
+    return getattr(source, "name", None) or str(source)
+
+
+def _open_binary(source):
+    """File object for a path, a (name, bytes) pair or an open binary file."""
+    if isinstance(source, tuple):
+        return io.BytesIO(source[1])
+    if isinstance(source, (str, Path)):
+        return open(source, "rb")
+    return source
+
+
+def _open_text(source):
+    return io.TextIOWrapper(_open_binary(source), encoding="utf-8", errors="replace",
+                            newline=None)
+
+
+def _documents(chunks: Iterable[Tuple[str, dict]], name: str, fmt: str) -> Iterator[dict]:
+    for number, (text, position) in enumerate(chunks):
+        yield {"id": f"{name}#{number}", "content": text,
+               "metadata": dict(position, source=name, format=fmt)}
+
+
+# ============================================================================
+# Extractors
+# ============================================================================
+
+def extract_text(source, max_chars: int = DEFAULT_MAX_CHARS) -> Iterator[dict]:
+    """Plain text, grouped into paragraph chunks of about `max_chars`."""
+    def chunks():
+        chunker = _Chunker(max_chars)
+        with _open_text(source) as f:
+            for line_number, line in enumerate(f, start=1):
+                done = chunker.add(line.rstrip("\n"), line_number)
+                if done:
+                    yield done[0], {"line": done[1]}
+        done = chunker.flush()
+        if done:
+            yield done[0], {"line": done[1]}
+
+    return _documents(chunks(), _name_of(source), "text")
+
+
+_MD_HEADING = re.compile(r"^ {0,3}(#{1,6})\s+(.*?)\s*#*\s*$")
+_MD_FENCE = re.compile(r"^ {0,3}(```|~~~)")
+
+
+def extract_markdown(source, max_chars: int = DEFAULT_MAX_CHARS) -> Iterator[dict]:
+    """Markdown, one document per heading section ("Guide > Returns" in `heading`)."""
+    def chunks():
+        chunker = _Chunker(max_chars)
+        headings: List[str] = []
+        in_fence = None
+        with _open_text(source) as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.rstrip("\n")
+                fence = _MD_FENCE.match(line)
+                if fence and (in_fence is None or fence.group(1) == in_fence):
+                    in_fence = None if in_fence else fence.group(1)
+                heading = None if in_fence or fence else _MD_HEADING.match(line)
+                if heading:
+                    done = chunker.flush()
+                    if done:
+                        yield done[0], {"heading": " > ".join(headings), "line": done[1]}
+                    level = len(heading.group(1))
+                    headings = headings[:level - 1] + [heading.group(2)]
+                done = chunker.add(line, line_number)
+                if done:
+                    yield done[0], {"heading": " > ".join(headings), "line": done[1]}
+        done = chunker.flush()
+        if done:
+            yield done[0], {"heading": " > ".join(headings), "line": done[1]}
+
+    return _documents(chunks(), _name_of(source), "markdown")
+
+
+class _HTMLSections(HTMLParser):
+    """Turns HTML into lines of text, starting a new section at each heading."""
+
+    SKIP = {"script", "style", "noscript", "template", "svg", "head", "nav"}
+    BLOCKS = {"p", "div", "li", "tr", "br", "section", "article", "main", "pre", "table",
+              "ul", "ol", "dl", "dt", "dd", "blockquote", "h1", "h2", "h3", "h4", "h5", "h6",
+              "hr", "figcaption", "header", "footer", "aside"}
+    HEADINGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
+    def __init__(self, max_chars: int):
+        super().__init__(convert_charrefs=True)
+        self.chunker = _Chunker(max_chars)
+        self.ready: List[Tuple[str, dict]] = []
+        self.headings: List[str] = []
+        self._skip = 0
+        self._pre = 0
+        self._line: List[str] = []
+        self._heading: Optional[List[str]] = None
+        self._heading_level = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip += 1
+        elif tag in self.HEADINGS and not self._skip:
+            self._end_line()
+            self._emit(self.chunker.flush())
+            self._heading = []
+            self._heading_level = int(tag[1])
+        elif tag in self.BLOCKS:
+            self._end_line()
+        if tag == "pre":
+            self._pre += 1
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in self.BLOCKS:
+            self._end_line()
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skip = max(0, self._skip - 1)
+        elif tag in self.HEADINGS and self._heading is not None:
+            title = " ".join("".join(self._heading).split())
+            self.headings = self.headings[:self._heading_level - 1] + [title]
+            self._heading = None
+            self._end_line()
+        elif tag in self.BLOCKS:
+            self._end_line()
+        if tag == "pre":
+            self._pre = max(0, self._pre - 1)
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        if self._heading is not None:
+            self._heading.append(data)
+        if self._pre:
+            lines = data.split("\n")
+            for line in lines[:-1]:
+                self._line.append(line)
+                self._end_line(paragraph=False)
+            self._line.append(lines[-1])
+        else:
+            self._line.append(data)  # whitespace is collapsed per line in _end_line
+
+    def _end_line(self, paragraph: bool = True):
+        """Finish the current line; block elements also end the paragraph."""
+        text = "".join(self._line) if self._pre else " ".join("".join(self._line).split())
+        self._line = []
+        if text or not paragraph:
+            self._emit(self.chunker.add(text, self.getpos()[0]))
+        if paragraph:
+            self._emit(self.chunker.add("", self.getpos()[0]))
+
+    def _emit(self, done):
+        if done:
+            self.ready.append((done[0], {"heading": " > ".join(self.headings), "line": done[1]}))
+
+    def finish(self):
+        self.close()
+        self._end_line()
+        self._emit(self.chunker.flush())
+
+
+def extract_html(source, max_chars: int = DEFAULT_MAX_CHARS) -> Iterator[dict]:
+    """HTML, one document per heading section; scripts, styles and navigation are dropped."""
+    def chunks():
+        parser = _HTMLSections(max_chars)
+        with _open_text(source) as f:
+            while True:
+                block = f.read(_READ_BLOCK)
+                if not block:
+                    break
+                parser.feed(block)
+                yield from parser.ready
+                parser.ready.clear()
+        parser.finish()
+        yield from parser.ready
+
+    return _documents(chunks(), _name_of(source), "html")
+
+
+def extract_pdf(source, max_chars: int = DEFAULT_MAX_CHARS) -> Iterator[dict]:
+    """PDF, one document per page (long pages split), parsed page by page."""
+    from pypdf import PdfReader
+
+    def chunks():
+        # Hand pypdf an open file: given a path it would read it all into memory
+        with _open_binary(source) as f:
+            reader = PdfReader(f)
+            pages = len(reader.pages)
+            for number, page in enumerate(reader.pages, start=1):
+                chunker = _Chunker(max_chars)
+                lines = (page.extract_text() or "").splitlines()
+                for line_number, line in enumerate(lines, start=1):
+                    done = chunker.add(line, line_number)
+                    if done:
+                        yield done[0], {"page": number, "pages": pages}
+                done = chunker.flush()
+                if done:
+                    yield done[0], {"page": number, "pages": pages}
+
+    return _documents(chunks(), _name_of(source), "pdf")
+
+
+EXTRACTORS = {
+    ".pdf": extract_pdf,
+    ".html": extract_html,
+    ".htm": extract_html,
+    ".md": extract_markdown,
+    ".markdown": extract_markdown,
+}
+
+
+def extract(source: Source, max_chars: int = DEFAULT_MAX_CHARS) -> Iterator[dict]:
+    """
+    Extract documents from a file, picking the extractor by file extension.
+
+    Args:
+        source: A path, or a (name, bytes) pair (e.g. an object read from S3)
+        max_chars: Rough upper bound on characters per document
+
+    Yields:
+        Lesson 1 documents, one per page/section
+    """
+    suffix = os.path.splitext(_name_of(source))[1].lower()
+    return EXTRACTORS.get(suffix, extract_text)(source, max_chars)
+
+
+# ============================================================================
+# Process Pool
+# ============================================================================
+
+def _extract_all(source: Source, max_chars: int) -> List[dict]:
+    return list(extract(source, max_chars))
+
+
+def extract_files(sources: Iterable[Source], workers: int = 0,
+                  max_chars: int = DEFAULT_MAX_CHARS,
+                  start_method: str = "spawn", max_pending: int = 0) -> Iterator[dict]:
+    """
+    Extract many files in worker processes.
+
+    Each worker extracts one whole file at a time and sends its documents
+    back; files are yielded as they finish (not in input order). Sources are
+    read lazily: at most `max_pending` files are submitted but not yet
+    yielded, so a streaming source (e.g. S3DocumentReader) keeps its own
+    read-ahead bound.
+
+    Args:
+        sources: Paths or (name, bytes) pairs
+        workers: Worker processes (0 = one per core, 1 = in this process)
+        max_pending: Files in flight (0 = two per worker)
+
+    Yields:
+        Documents from every file
+    """
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        for source in sources:
+            yield from extract(source, max_chars)
+        return
+
+    context = multiprocessing.get_context(start_method)
+    window = max_pending or 2 * workers
+    sources = iter(sources)
+    finished: "queue.Queue" = queue.Queue()
+    pending = 0
+    with context.Pool(workers) as pool:
+        task = functools.partial(_extract_all, max_chars=max_chars)
+        exhausted = False
+        while True:
+            while not exhausted and pending < window:
+                source = next(sources, None)
+                if source is None:
+                    exhausted = True
+                    break
+                pool.apply_async(task, (source,), callback=finished.put,
+                                 error_callback=finished.put)
+                pending += 1
+            if not pending:
+                return
+            docs = finished.get()
+            pending -= 1
+            if isinstance(docs, BaseException):
+                raise docs
+            yield from docs
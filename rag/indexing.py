@@ -0,0 +1,382 @@
+"""
+Offline Indexing with a Process Pool
+
+One SentenceTransformer instance only uses the threads torch gives it, so a
+big reindex leaves cores idle. `parallel_encode()` shards the corpus across
+worker processes instead:
+
+    parent ──batch──> worker 0 (own model, pinned to cores 0-1) ─┐
+           ──batch──> worker 1 (own model, pinned to cores 2-3) ─┼─> shared buffer ring
+           ──batch──> worker N ...                              ─┘
+
+- Each worker loads its own embedder once and limits torch/BLAS to
+  `threads_per_worker` threads, pinned to its own cores where the OS allows,
+  so workers do not fight over the same CPUs.
+- Embeddings are written straight into shared-memory batch buffers; only
+  the buffer slot and row offset travel back through the pool, never the
+  vectors. A fixed ring of buffers is recycled as soon as each finished batch
+  has been consumed, so memory stays bounded by the ring, not the corpus.
+- Texts are read lazily: `parallel_encode_batches()` takes any iterable and
+  only pulls the next batch when a buffer is free. `build_index()` streams
+  finished batches into a DurableVectorStore and snapshots it at the end.
+  With `dedup=NearDuplicateFilter(...)` exact and near-duplicate documents
+  are dropped before anything is embedded.
+- With `chunk_tokens=N` documents longer than N tokens are split first
+  (rag.tokenization), so nothing is silently truncated by the model's input
+  window; the chunks' token ids stay cached for context packing.
+
+Command line:
+
+    python -m rag.indexing --input corpus.jsonl --output data/index --workers 4
+    python -m rag.indexing --input s3://my-bucket/documents/raw/ --output data/index
+    python -m rag.indexing --input docs/ --output data/index      # PDF/HTML/Markdown/text
+"""
+
+import argparse
+import functools
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import time
+from collections import deque
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from rag.embeddings import HashingEmbedder, SentenceTransformerEmbedder
+
+
+# ============================================================================
+# Worker side
+# ============================================================================
+
+_worker_embedder = None
+_worker_buffers = {}
+
+
+def _limit_threads(threads: int):
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def _pin_to_cores(worker_index: int, threads: int):
+    """Pin this process to its own slice of the available cores (Linux only)."""
+    if not hasattr(os, "sched_setaffinity"):
+        return
+    cores = sorted(os.sched_getaffinity(0))
+    start = (worker_index * threads) % len(cores)
+    mine = {cores[(start + i) % len(cores)] for i in range(threads)}
+    os.sched_setaffinity(0, mine)
+
+
+def _init_worker(embedder_factory: Callable, threads: int, counter, pin: bool):
+    global _worker_embedder
+    _limit_threads(threads)
+    if pin:
+        with counter.get_lock():
+            index = counter.value
+            counter.value += 1
+        _pin_to_cores(index, threads)
+    _worker_embedder = embedder_factory()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    shm = _worker_buffers.get(name)
+    if shm is None:
+        # Workers share the parent's resource tracker, so the block is
+        # unlinked exactly once, by the parent
+        shm = shared_memory.SharedMemory(name=name)
+        _worker_buffers[name] = shm
+    return shm
+
+
+def _probe_dim(text: str) -> int:
+    return int(np.asarray(_worker_embedder.encode([text])).shape[1])
+
+
+def _encode_into(task: Tuple[str, Tuple[int, int], int, int, List[str]]) -> Tuple[int, int, int]:
+    name, shape, slot, start, texts = task
+    shm = _attach(name)
+    buffer = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+    buffer[:len(texts)] = _worker_embedder.encode(texts)
+    return slot, start, len(texts)
+
+
+# ============================================================================
+# Parent side
+# ============================================================================
+
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def parallel_encode_batches(texts: Iterable[str], embedder_factory: Callable, workers: int = 0,
+                            threads_per_worker: int = 1, batch_size: int = 256,
+                            pin_cores: bool = True, start_method: str = "spawn",
+                            ring_size: int = 0) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Encode texts in worker processes, yielding batches as they finish.
+
+    Texts are pulled from the iterable one batch at a time, only when a
+    shared buffer is free, so a corpus of any size streams through a fixed
+    amount of memory.
+
+    Args:
+        texts: Texts to embed (any iterable; consumed lazily)
+        embedder_factory: Picklable zero-argument callable returning an
+                          embedder, e.g. functools.partial(HashingEmbedder, dim=384)
+        workers: Worker processes (0 = one per `threads_per_worker` cores)
+        threads_per_worker: Torch/BLAS threads (and pinned cores) per worker
+        batch_size: Texts per task
+        pin_cores: Pin each worker to its own cores (Linux)
+        start_method: multiprocessing start method ("spawn" is safe with torch)
+        ring_size: Shared batch buffers, i.e. batches in flight (0 = 2 per worker)
+
+    Yields:
+        (start_row, embeddings) in completion order. `embeddings` is a view
+        of a shared buffer that is recycled when the next batch is requested:
+        use or copy it before advancing the iterator.
+    """
+    batches = _batched(texts, batch_size)
+    first = next(batches, None)
+    if first is None:
+        return
+    if workers <= 0:
+        workers = max(1, (os.cpu_count() or 1) // threads_per_worker)
+    ring_size = ring_size or 2 * workers
+
+    context = multiprocessing.get_context(start_method)
+    counter = context.Value("i", 0)
+    initializer = functools.partial(_init_worker, embedder_factory, threads_per_worker,
+                                    counter, pin_cores)
+    with context.Pool(workers, initializer=initializer) as pool:
+        dim = pool.apply(_probe_dim, (first[0],))
+        shape = (batch_size, dim)
+        ring = [shared_memory.SharedMemory(create=True, size=batch_size * dim * 4)
+                for _ in range(ring_size)]
+        views = [np.ndarray(shape, dtype=np.float32, buffer=shm.buf) for shm in ring]
+        free = deque(range(ring_size))
+        done: "queue.Queue" = queue.Queue()
+        pending = 0
+        start = 0
+        batches = itertools.chain([first], batches)
+        try:
+            while True:
+                # Keep every free buffer busy, reading only as many texts as fit
+                while free:
+                    batch = next(batches, None)
+                    if batch is None:
+                        break
+                    slot = free.popleft()
+                    pool.apply_async(_encode_into, ((ring[slot].name, shape, slot, start, batch),),
+                                     callback=done.put, error_callback=done.put)
+                    start += len(batch)
+                    pending += 1
+                if not pending:
+                    return
+                result = done.get()
+                pending -= 1
+                if isinstance(result, BaseException):
+                    raise result
+                slot, row, count = result
+                yield row, views[slot][:count]
+                free.append(slot)  # the consumer is done with it
+        finally:
+            if pending:
+                pool.terminate()  # stop workers still writing into the ring
+            views = None  # release the buffer exports before closing
+            for shm in ring:
+                shm.close()
+                shm.unlink()
+
+
+def parallel_encode(texts: List[str], embedder_factory: Callable, **kwargs) -> np.ndarray:
+    """Encode all texts with a process pool and return the full matrix (a copy)."""
+    result: Optional[np.ndarray] = None
+    for start, batch in parallel_encode_batches(texts, embedder_factory, **kwargs):
+        if result is None:
+            result = np.empty((len(texts), batch.shape[1]), dtype=np.float32)
+        result[start:start + len(batch)] = batch
+    return result if result is not None else np.zeros((0, 0), dtype=np.float32)
+
+
+def build_index(docs: Iterable[dict], directory, embedder_factory: Callable,
+                dedup=None, chunk_tokens: Optional[int] = None, tokenizer=None,
+                **kwargs) -> dict:
+    """
+    Embed documents with a process pool and write them to an on-disk store.
+
+    Batches are upserted into a DurableVectorStore as they finish; the store
+    is snapshotted at the end (which also drops the WAL). `docs` may be any
+    iterable: documents flow through chunking, dedup and encoding lazily, so
+    only the batches in flight are held in memory.
+
+    Args:
+        dedup: Optional rag.dedup.NearDuplicateFilter; duplicates are dropped
+               before encoding
+        chunk_tokens: Split documents longer than this many tokens
+        tokenizer: rag.tokenization.TokenizerService for chunking
+                   (default: the shared one)
+
+    Returns:
+        Stats: documents, seconds, docs_per_sec, encode_seconds (the encode
+        loop alone); with `dedup` also its counts and `estimated_seconds_saved`
+        (dropped documents at the measured encoding rate);
+        with `chunk_tokens` also `tokens` and `chunks` (chunks added by
+        splitting), both counted before dedup
+    """
+    from rag.persistence import DurableVectorStore
+
+    started = time.perf_counter()
+    chunking: dict = {}
+    if chunk_tokens is not None:
+        from rag.tokenization import chunk_documents, get_tokenizer_service
+        tokenizer = tokenizer or get_tokenizer_service()
+        docs = chunk_documents(docs, chunk_tokens, tokenizer, stats=chunking)
+    if dedup is not None:
+        docs = dedup.filter(docs)
+    store = DurableVectorStore(embedder_factory(), directory, snapshot_every=None, fsync="never")
+    try:
+        # Only the documents of batches in flight are held here
+        in_flight: dict = {}
+        rows = 0
+
+        def texts():
+            nonlocal rows
+            for row, doc in enumerate(docs):
+                in_flight[row] = doc
+                rows = row + 1
+                yield doc["content"]
+
+        encode_started = time.perf_counter()
+        for start, batch in parallel_encode_batches(texts(), embedder_factory, **kwargs):
+            # Copied into the store (and WAL) before the buffer is recycled
+            store.upsert_embedded([in_flight.pop(row) for row in range(start, start + len(batch))],
+                                  batch)
+        encode_seconds = time.perf_counter() - encode_started
+        store.snapshot()
+    finally:
+        store.close()
+    seconds = time.perf_counter() - started
+    stats = {"documents": rows, "seconds": round(seconds, 3),
+             "docs_per_sec": round(rows / seconds, 1) if seconds else None,
+             "encode_seconds": round(encode_seconds, 3)}
+    if chunk_tokens is not None:
+        # Counted while chunking, i.e. before dedup dropped anything
+        stats["chunks"] = chunking["chunks"] - chunking["documents"]  # added by splitting
+        stats["tokens"] = chunking["tokens"]
+    if dedup is not None:
+        stats["dedup"] = dedup.stats.as_dict()
+        # At the embedding rate alone: chunking, dedup and store setup would
+        # not have got slower with the duplicates in
+        stats["estimated_seconds_saved"] = (
+            round(dedup.stats.dropped * encode_seconds / rows, 3) if rows else 0.0)
+    return stats
+
+
+def make_embedder_factory(name: str, model: Optional[str] = None, dim: int = 384) -> Callable:
+    """Picklable factory for the embedders selectable on the command line."""
+    if name == "sentence-transformers":
+        return functools.partial(SentenceTransformerEmbedder, model) if model else \
+            SentenceTransformerEmbedder
+    return functools.partial(HashingEmbedder, dim=dim)
+
+
+def iter_jsonl(path) -> Iterator[dict]:
+    """Documents from a JSONL file, one line at a time."""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_jsonl(path) -> List[dict]:
+    return list(iter_jsonl(path))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Embed a JSONL corpus with a process pool "
+                                                 "and write it to an on-disk vector store.")
+    parser.add_argument("--input", required=True,
+                        help="JSONL file (one document per line), a directory of files, "
+                             "or s3://bucket/prefix")
+    parser.add_argument("--output", required=True, help="Store directory")
+    parser.add_argument("--workers", type=int, default=0, help="0 = cores / threads-per-worker")
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--embedder", choices=["hashing", "sentence-transformers"],
+                        default="sentence-transformers")
+    parser.add_argument("--model", default=None, help="Sentence Transformers model name")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension for --embedder hashing")
+    parser.add_argument("--no-pin", action="store_true", help="Do not pin workers to cores")
+    parser.add_argument("--s3-max-in-flight", type=int, default=16,
+                        help="Concurrent GETs when --input is an S3 prefix")
+    parser.add_argument("--extract-workers", type=int, default=0,
+                        help="Processes extracting text from files (0 = one per core)")
+    parser.add_argument("--dedup-threshold", type=float, default=None,
+                        help="Drop documents at least this similar (0-1) to an earlier one")
+    parser.add_argument("--chunk-tokens", type=int, default=None,
+                        help="Split documents longer than this many tokens "
+                             "(e.g. 256 for all-MiniLM-L6-v2)")
+    parser.add_argument("--tokenizer", default=None,
+                        help="Tokenizer for --chunk-tokens (Hub name or tokenizer.json)")
+    args = parser.parse_args(argv)
+
+    if args.input.startswith("s3://"):
+        from rag.extract import extract_files
+        from rag.s3_reader import S3DocumentReader
+        bucket, _, prefix = args.input[len("s3://"):].partition("/")
+        reader = S3DocumentReader(bucket=bucket, prefix=prefix,
+                                  max_in_flight=args.s3_max_in_flight)
+        # Lazy all the way: the reader's read-ahead and extract_files' window
+        # bound what is downloaded and extracted ahead of the encoder
+        docs = extract_files(((obj.key, obj.body) for obj in reader),
+                             workers=args.extract_workers)
+    elif os.path.isdir(args.input):
+        from rag.extract import extract_files
+        paths = sorted(str(p) for p in Path(args.input).rglob("*") if p.is_file())
+        docs = extract_files(paths, workers=args.extract_workers)
+    else:
+        docs = iter_jsonl(args.input)
+    print(f"📥 Streaming documents from {args.input}")
+    factory = make_embedder_factory(args.embedder, args.model, args.dim)
+    dedup = None
+    if args.dedup_threshold is not None:
+        from rag.dedup import NearDuplicateFilter
+        dedup = NearDuplicateFilter(threshold=args.dedup_threshold)
+    tokenizer = None
+    if args.tokenizer:
+        from rag.tokenization import get_tokenizer_service
+        tokenizer = get_tokenizer_service(args.tokenizer)
+    stats = build_index(docs, args.output, factory, dedup=dedup,
+                        chunk_tokens=args.chunk_tokens, tokenizer=tokenizer,
+                        workers=args.workers, threads_per_worker=args.threads_per_worker,
+                        batch_size=args.batch_size, pin_cores=not args.no_pin)
+    print(f"✅ Indexed {stats['documents']} documents in {stats['seconds']}s "
+          f"({stats['docs_per_sec']} docs/sec) -> {args.output}")
+    if args.chunk_tokens is not None:
+        print(f"✂️  {stats['chunks']} extra chunks from splitting, {stats['tokens']:,} tokens")
+    if dedup is not None:
+        d = stats["dedup"]
+        print(f"🧹 Skipped {d['dropped']} duplicates ({d['exact_duplicates']} exact, "
+              f"{d['near_duplicates']} near), {d['saved_fraction']:.1%} of the text, "
+              f"~{stats['estimated_seconds_saved']}s of embedding")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Lexical (Keyword) Retrieval with BM25
+
+Embeddings find documents with the same *meaning*; BM25 finds documents
+with the same *words* - product codes, names, error messages. Hybrid search
+runs both and fuses the rankings.
+
+BM25 score of a document D for query terms q:
+
+    sum over q of  IDF(q) * tf(q, D) * (k1 + 1) / (tf(q, D) + k1 * (1 - b + b * |D| / avgdl))
+"""
+
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    In-memory inverted index with BM25 scoring and the store's
+    `add_documents()` / `delete()` / `search()` interface.
+
+    Args:
+        k1: Term-frequency saturation
+        b: Document-length normalization
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[object, int]] = {}
+        self._lengths: Dict[object, int] = {}
+        self._documents: Dict[object, dict] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def add_document(self, doc: dict):
+        self.add_documents([doc])
+
+    def add_documents(self, docs: Iterable[dict]):
+        """Index documents (an existing `id` is replaced)."""
+        for doc in docs:
+            counts = Counter(tokenize(doc["content"]))
+            with self._lock:
+                self._remove(doc["id"])
+                for term, tf in counts.items():
+                    self._postings.setdefault(term, {})[doc["id"]] = tf
+                length = sum(counts.values())
+                self._lengths[doc["id"]] = length
+                self._total_length += length
+                self._documents[doc["id"]] = doc
+
+    def delete(self, doc_id) -> bool:
+        with self._lock:
+            return self._remove(doc_id)
+
+    def _remove(self, doc_id) -> bool:
+        doc = self._documents.pop(doc_id, None)
+        if doc is None:
+            return False
+        for term in set(tokenize(doc["content"])):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths.pop(doc_id)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def search(self, query: str, top_k: int = 2) -> List[Tuple[dict, float]]:
+        """Return the `top_k` documents by BM25 score (only documents sharing a term)."""
+        with self._lock:
+            n = len(self._documents)
+            if n == 0:
+                return []
+            avgdl = self._total_length / n
+            scores: Dict[object, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avgdl)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+            return [(self._documents[doc_id], score) for doc_id, score in best]
+
+
+def reciprocal_rank_fusion(result_lists: Iterable[List[Tuple[dict, float]]], top_k: int,
+                           k: int = 60) -> List[Tuple[dict, float]]:
+    """
+    Merge rankings from different retrievers.
+
+    Scores from BM25 and cosine similarity are on different scales, so RRF
+    ignores them and only uses ranks: score(d) = sum of 1 / (k + rank).
+    """
+    fused: Dict[object, float] = {}
+    documents: Dict[object, dict] = {}
+    for results in result_lists:
+        for rank, (doc, _) in enumerate(results, start=1):
+            fused[doc["id"]] = fused.get(doc["id"], 0.0) + 1.0 / (k + rank)
+            documents.setdefault(doc["id"], doc)
+    best = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [(documents[doc_id], score) for doc_id, score in best]
@@ -0,0 +1,443 @@
+"""
+Embedding Model Registry: Several Models, One Memory Budget
+
+Lesson 1 hard-codes `all-MiniLM-L6-v2`; the Bedrock test uses Titan. Real
+deployments want both: a small fast model for most collections and a larger,
+more accurate one where quality matters. The registry keeps every model
+behind a name and decides which ones are resident:
+
+    registry = EmbeddingModelRegistry(memory_budget=1024**3, idle_timeout=600)
+    fast = registry.embedder("minilm")       # cheap handle, nothing loaded yet
+    accurate = registry.embedder("mpnet")
+    VectorStore(fast).add_documents(docs)    # loads MiniLM on first encode
+
+- Models are loaded on first use. When the resident models would exceed
+  `memory_budget`, the least recently used idle ones are evicted (dropped
+  from memory; the next request loads them again from the local model
+  cache). Models not used for `idle_timeout` seconds are evicted too, by a
+  background sweeper, so memory is freed even when no requests arrive.
+  Models with requests in flight are never evicted.
+- Every model has one batching queue shared by all its users: requests that
+  arrive while a batch is encoding are merged into the next `encode()` call
+  (up to `max_batch` texts), so many small concurrent requests make a few
+  large, efficient batches.
+- Handles from `embedder(name)` are ordinary embedders (`encode`, `aencode`,
+  `dim`) and stay valid across evictions, so stores can hold them forever.
+
+Collections pick their model by name (see `CollectionManager(models=...)` in
+rag/tenants.py).
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from rag.embeddings import DEFAULT_MODEL_NAME, HashingEmbedder, SentenceTransformerEmbedder
+
+
+# ============================================================================
+# Model Specs
+# ============================================================================
+
+@dataclass
+class ModelSpec:
+    """
+    How to create one model, and roughly how much memory it needs.
+
+    Args:
+        name: Registry name (what collections refer to)
+        factory: Returns a new embedder; may load lazily
+        memory_bytes: Estimate used to make room before loading (the real size
+                      is measured after loading when possible)
+    """
+
+    name: str
+    factory: Callable[[], object]
+    memory_bytes: int = 0
+
+
+def _bedrock_titan():
+    from rag.bedrock import BedrockEmbedder
+    return BedrockEmbedder()
+
+
+DEFAULT_MODELS = [
+    ModelSpec("minilm", lambda: SentenceTransformerEmbedder(DEFAULT_MODEL_NAME), 90 * 1024 ** 2),
+    ModelSpec("mpnet", lambda: SentenceTransformerEmbedder("all-mpnet-base-v2"), 440 * 1024 ** 2),
+    ModelSpec("titan", _bedrock_titan, 0),          # remote: nothing resident but a client
+    ModelSpec("hashing", lambda: HashingEmbedder(dim=256), 0),
+]
+
+
+def model_memory_bytes(embedder) -> int:
+    """Measured size of a loaded model (0 if it cannot be measured)."""
+    if hasattr(embedder, "memory_bytes"):
+        return int(embedder.memory_bytes())
+    model = getattr(embedder, "_model", None)   # SentenceTransformerEmbedder, once loaded
+    if model is not None and hasattr(model, "parameters"):
+        tensors = list(model.parameters()) + list(getattr(model, "buffers", list)())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    return 0
+
+
+# ============================================================================
+# Batching Queue
+# ============================================================================
+
+class _BatchQueue:
+    """One worker thread that merges queued requests into shared encode() calls."""
+
+    def __init__(self, name: str, embedder, max_batch: int, max_wait: float):
+        self.embedder = embedder
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.requests = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"embed-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future
+
+    def stop(self):
+        self._queue.put(None)
+
+    def _collect(self, first) -> tuple:
+        """Gather what is queued behind `first` (waiting up to max_wait for more)."""
+        batch, size, stop = [first], len(first[0]), False
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic())) \
+                    if self.max_wait else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch, stop
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stop = self._collect(first)
+            batch = [(texts, future) for texts, future in batch
+                     if future.set_running_or_notify_cancel()]
+            texts = [text for request, _ in batch for text in request]
+            try:
+                vectors = np.asarray(self.embedder.encode(texts), dtype=np.float32) \
+                    if texts else None
+            except BaseException as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+            else:
+                start = 0
+                for request, future in batch:
+                    future.set_result(vectors[start:start + len(request)] if request
+                                      else np.zeros((0, 0), dtype=np.float32))
+                    start += len(request)
+            self.batches += 1
+            self.requests += len(batch)
+            if stop:
+                return
+
+
+# ============================================================================
+# Registry
+# ============================================================================
+
+class _LoadedModel:
+    def __init__(self, name: str, embedder, memory_bytes: int, batches: _BatchQueue):
+        self.name = name
+        self.embedder = embedder
+        self.memory_bytes = memory_bytes
+        self.batches = batches
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        self.retired = False  # replaced by register(): stopped once the last user releases
+
+
+class EmbeddingModelRegistry:
+    """
+    Named embedding models, loaded on demand and kept under a memory budget.
+
+    Args:
+        models: Specs to register (default: DEFAULT_MODELS)
+        memory_budget: Bytes of resident models before idle ones are evicted
+        idle_timeout: Seconds unused after which a model is evicted (None = never)
+        sweep_interval: Seconds between background idle sweeps (default:
+                        idle_timeout / 2, at most 60)
+        max_batch: Texts per merged encode() call
+        max_wait: Seconds a batch waits for more requests (0 = only merge what is
+                  already queued, which adds no latency)
+    """
+
+    def __init__(self, models: Optional[List[ModelSpec]] = None,
+                 memory_budget: int = 2 * 1024 ** 3, idle_timeout: Optional[float] = 600.0,
+                 max_batch: int = 256, max_wait: float = 0.0,
+                 sweep_interval: Optional[float] = None):
+        self.memory_budget = memory_budget
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval if sweep_interval is not None else \
+            None if idle_timeout is None else min(idle_timeout / 2, 60.0)
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._specs: Dict[str, ModelSpec] = {}
+        self._resident: "OrderedDict[str, _LoadedModel]" = OrderedDict()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._handles: Dict[str, "RegisteredEmbedder"] = {}
+        self._retired: List[_LoadedModel] = []
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+        self._sweeper_stop: Optional[threading.Event] = None
+        self.loads = 0
+        self.evictions = 0
+        for spec in DEFAULT_MODELS if models is None else models:
+            self.register(spec)
+
+    def register(self, spec: ModelSpec):
+        """
+        Add (or replace) a model.
+
+        A resident copy of a replaced model stops serving new requests at once;
+        it is freed now if idle, otherwise when its last request releases it.
+        """
+        with self._lock:
+            self._specs[spec.name] = spec
+            old = self._resident.pop(spec.name, None)
+            if old is not None:
+                self.evictions += 1
+                old.retired = True
+                if old.in_use:
+                    self._retired.append(old)
+                    old = None
+        if old is not None:
+            old.batches.stop()
+
+    def names(self) -> List[str]:
+        return sorted(self._specs)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._specs
+
+    def embedder(self, name: str) -> "RegisteredEmbedder":
+        """
+        Handle for a registered model (one shared handle per name).
+
+        Raises:
+            KeyError: No model registered under `name`
+        """
+        with self._lock:
+            if name not in self._specs:
+                raise KeyError(f"No embedding model named {name!r} (have: {sorted(self._specs)})")
+            handle = self._handles.get(name)
+            if handle is None:
+                handle = self._handles[name] = RegisteredEmbedder(self, name)
+            return handle
+
+    # ------------------------------------------------------------------
+    # Loading and eviction
+    # ------------------------------------------------------------------
+
+    def _pin(self, name: str) -> Optional[_LoadedModel]:
+        """Mark a resident model in use and most recent (caller holds the lock)."""
+        model = self._resident.get(name)
+        if model is not None:
+            self._resident.move_to_end(name)
+            model.in_use += 1
+            model.last_used = time.monotonic()
+        return model
+
+    def acquire(self, name: str) -> _LoadedModel:
+        """Pin a model, loading it first if needed; pair with `release()`."""
+        self.evict_idle()
+        with self._lock:
+            self._start_sweeper()
+            model = self._pin(name)
+            if model is not None:
+                return model
+            spec = self._specs[name]
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # Load outside the registry lock: other models keep serving meanwhile
+        with load_lock:
+            with self._lock:
+                model = self._pin(name)
+                if model is not None:
+                    return model
+            self._make_room(spec.memory_bytes)
+            embedder = spec.factory()
+            getattr(embedder, "model", None)  # lazy loaders (Sentence Transformers) load now
+            size = model_memory_bytes(embedder) or spec.memory_bytes
+            model = _LoadedModel(name, embedder, size,
+                                 _BatchQueue(name, embedder, self.max_batch, self.max_wait))
+            with self._lock:
+                model.in_use += 1
+                self.loads += 1
+                if self._specs.get(name) is spec:
+                    self._resident[name] = model
+                else:  # replaced while loading: serve this request, then free it
+                    model.retired = True
+                    self._retired.append(model)
+        self._make_room(0)
+        return model
+
+    def release(self, model: _LoadedModel):
+        with self._lock:
+            model.in_use -= 1
+            model.last_used = time.monotonic()
+            stop = model.retired and not model.in_use
+            if stop:
+                self._retired.remove(model)
+        if stop:
+            model.batches.stop()
+
+    def _make_room(self, incoming: int):
+        """Evict idle models, least recently used first, until `incoming` more bytes fit."""
+        while True:
+            with self._lock:
+                usage = self._usage()
+                if usage + incoming <= self.memory_budget:
+                    return
+                victim = next((name for name, m in self._resident.items() if not m.in_use),
+                              None)
+            if victim is None or not self.evict(victim):
+                return  # everything left is in use: go over budget rather than fail
+
+    def evict(self, name: str) -> bool:
+        """
+        Drop a resident model from memory.
+
+        Returns:
+            False if it was not resident or is in use
+        """
+        with self._lock:
+            model = self._resident.get(name)
+            if model is None or model.in_use:
+                return False
+            del self._resident[name]
+            self.evictions += 1
+        model.batches.stop()
+        return True
+
+    def evict_idle(self) -> List[str]:
+        """Evict models unused for `idle_timeout` seconds; returns their names."""
+        if self.idle_timeout is None:
+            return []
+        now = time.monotonic()
+        with self._lock:
+            idle = [name for name, m in self._resident.items()
+                    if not m.in_use and now - m.last_used >= self.idle_timeout]
+        return [name for name in idle if self.evict(name)]
+
+    def _start_sweeper(self):
+        """Start the idle sweeper thread if it is not running (caller holds the lock)."""
+        if self.sweep_interval is None or self._sweeper is not None:
+            return
+        stop = self._sweeper_stop = threading.Event()
+        self._sweeper = threading.Thread(target=self._sweep, args=(stop,),
+                                         name="model-registry-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def _sweep(self, stop: threading.Event):
+        while not stop.wait(self.sweep_interval):
+            self.evict_idle()
+
+    def _usage(self) -> int:
+        """Bytes of loaded models, retired ones included (caller holds the lock)."""
+        return sum(m.memory_bytes for m in self._resident.values()) + \
+            sum(m.memory_bytes for m in self._retired)
+
+    def resident(self) -> List[str]:
+        """Loaded models, least recently used first."""
+        with self._lock:
+            return list(self._resident)
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return self._usage()
+
+    def close(self):
+        """Stop the idle sweeper and evict every idle model."""
+        with self._lock:
+            sweeper, stop = self._sweeper, self._sweeper_stop
+            self._sweeper = self._sweeper_stop = None
+        if sweeper is not None:
+            stop.set()
+            sweeper.join()
+        for name in self.resident():
+            self.evict(name)
+
+    def stats(self) -> dict:
+        with self._lock:
+            models = {name: {"memory_bytes": m.memory_bytes, "in_use": m.in_use,
+                             "batches": m.batches.batches, "requests": m.batches.requests}
+                      for name, m in self._resident.items()}
+            usage = self._usage()
+        return {
+            "registered": self.names(),
+            "resident": models,
+            "memory_bytes": usage,
+            "memory_budget": self.memory_budget,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+
+class RegisteredEmbedder:
+    """
+    Embedder handle for one registry model; requests go through its batching queue.
+
+    Get one with `EmbeddingModelRegistry.embedder(name)`.
+    """
+
+    def __init__(self, registry: EmbeddingModelRegistry, name: str):
+        self.registry = registry
+        self.name = name
+        self._dim: Optional[int] = None
+
+    @property
+    def model_name(self) -> str:
+        return self.name
+
+    @property
+    def dim(self) -> int:
+        if self._dim is None:
+            model = self.registry.acquire(self.name)
+            try:
+                self._dim = getattr(model.embedder, "dim", None)
+            finally:
+                self.registry.release(model)
+            if self._dim is None:  # e.g. Bedrock: the size is only known from a response
+                self._dim = int(self.encode(["dimension probe"]).shape[1])
+        return self._dim
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts (merged with other callers' requests)."""
+        model = self.registry.acquire(self.name)
+        try:
+            return model.batches.submit(texts).result()
+        finally:
+            self.registry.release(model)
+
+    async def aencode(self, texts: List[str]) -> np.ndarray:
+        """Like `encode()`, without holding a thread while the batch runs."""
+        model = await asyncio.to_thread(self.registry.acquire, self.name)  # may load
+        try:
+            return await asyncio.wrap_future(model.batches.submit(texts))
+        finally:
+            self.registry.release(model)
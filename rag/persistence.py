@@ -0,0 +1,399 @@
+"""
+Crash-Safe Persistence: Write-Ahead Log + Snapshots
+
+`VectorStore` lives in memory, so a crash loses everything. This module adds
+the classic database recipe:
+
+1. WRITE-AHEAD LOG (WAL): every upsert/delete is appended to a log file
+   *before* it is applied in memory.
+2. SNAPSHOTS: every so often the live rows (embedding matrix + document
+   table) are written to disk, and WAL files they cover are deleted.
+3. RECOVERY: on startup, load the newest snapshot and replay the WAL
+   written after it.
+
+Directory layout:
+
+    data/
+    ├── snapshot-00000003/       # everything logged before wal-00000003
+    │   ├── embeddings.npy
+    │   └── documents.json
+    ├── wal-00000003.log         # replayed on top of the snapshot
+    └── wal-00000004.log
+
+A snapshot is written into `snapshot-N.tmp/` and renamed when complete, so a
+crash mid-snapshot leaves the previous one intact. Each WAL record carries a
+CRC32; a torn record at the end of a file (crash mid-write) is ignored.
+
+Throughput: a whole `upsert_many()` batch is one WAL record (JSON documents +
+raw float32 embeddings), and by default the log is fsync'd on an interval
+(group commit) rather than per write. Every write is still flushed to the OS,
+so a *process* crash loses nothing; use fsync="always" to also survive power
+loss at the cost of one fsync per batch.
+"""
+
+import json
+import os
+import shutil
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from rag.vector_store import VectorStore
+
+
+_RECORD_HEADER = struct.Struct("<II")   # payload length, crc32 of payload
+_UPSERT_HEADER = struct.Struct("<BIII")  # op, doc count, dim, json length
+_OP_UPSERT = 1
+_OP_DELETE = 2
+
+FSYNC_MODES = ("always", "interval", "never")
+
+
+def _wal_path(directory: Path, generation: int) -> Path:
+    return directory / f"wal-{generation:08d}.log"
+
+
+def _snapshot_path(directory: Path, generation: int) -> Path:
+    return directory / f"snapshot-{generation:08d}"
+
+
+def _generations(directory: Path, prefix: str, suffix: str = "") -> List[int]:
+    """Sorted generation numbers of files/dirs named `<prefix>NNNNNNNN<suffix>`."""
+    generations = []
+    for path in directory.glob(f"{prefix}*{suffix}"):
+        number = path.name[len(prefix):len(path.name) - len(suffix)]
+        if number.isdigit():
+            generations.append(int(number))
+    return sorted(generations)
+
+
+def _fsync_dir(directory: Path):
+    """Make a rename/creation inside `directory` durable (no-op where unsupported)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+# ============================================================================
+# Write-Ahead Log
+# ============================================================================
+
+class WriteAheadLog:
+    """
+    Append-only log of upserts and deletes, split into numbered files.
+
+    Args:
+        directory: Where the `wal-N.log` files live
+        generation: Number of the file to append to
+        fsync: "always" (fsync every record), "interval" (background fsync
+               every `fsync_interval` seconds) or "never" (leave it to the OS)
+        fsync_interval: Seconds between background fsyncs
+    """
+
+    def __init__(self, directory, generation: int, fsync: str = "interval",
+                 fsync_interval: float = 1.0):
+        if fsync not in FSYNC_MODES:
+            raise ValueError(f"fsync must be one of {FSYNC_MODES}, got {fsync!r}")
+        self.directory = Path(directory)
+        self.generation = generation
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._file = open(_wal_path(self.directory, generation), "ab")
+        self._dirty = False
+
+        self._stop = threading.Event()
+        self._syncer = None
+        if fsync == "interval":
+            self._syncer = threading.Thread(target=self._sync_loop, args=(fsync_interval,),
+                                            name="wal-fsync", daemon=True)
+            self._syncer.start()
+
+    def append_upserts(self, docs: List[dict], embeddings: np.ndarray):
+        """Log a batch of upserts with their (already computed) embeddings."""
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        doc_json = json.dumps(docs, separators=(",", ":")).encode("utf-8")
+        header = _UPSERT_HEADER.pack(_OP_UPSERT, len(docs), embeddings.shape[1], len(doc_json))
+        self._append(header + doc_json + embeddings.tobytes())
+
+    def append_delete(self, doc_id):
+        """Log a delete."""
+        self._append(bytes([_OP_DELETE]) + json.dumps(doc_id).encode("utf-8"))
+
+    def _append(self, payload: bytes):
+        record = _RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            self._file.write(record)
+            self._file.flush()
+            if self.fsync == "always":
+                os.fsync(self._file.fileno())
+            else:
+                self._dirty = True
+
+    def sync(self):
+        """Flush and fsync the current file."""
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._dirty = False
+
+    def _sync_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            if self._dirty:
+                self.sync()
+
+    def rotate(self) -> int:
+        """
+        Close the current file and start the next generation.
+
+        Returns:
+            The new generation number
+        """
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self.generation += 1
+            self._file = open(_wal_path(self.directory, self.generation), "ab")
+            self._dirty = False
+            _fsync_dir(self.directory)
+            return self.generation
+
+    def close(self):
+        """Stop the background fsync and close the file (fsyncing it first)."""
+        self._stop.set()
+        if self._syncer is not None:
+            self._syncer.join()
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    @staticmethod
+    def read(path) -> Iterator[Tuple[int, object, Optional[np.ndarray]]]:
+        """
+        Yield the records of one WAL file, stopping at the first torn record.
+
+        Yields:
+            (_OP_UPSERT, docs, embeddings) or (_OP_DELETE, doc_id, None)
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+
+        offset = 0
+        while offset + _RECORD_HEADER.size <= len(data):
+            length, crc = _RECORD_HEADER.unpack_from(data, offset)
+            start = offset + _RECORD_HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                return
+            offset = start + length
+
+            if payload[0] == _OP_UPSERT:
+                _, count, dim, json_len = _UPSERT_HEADER.unpack_from(payload)
+                body = _UPSERT_HEADER.size
+                docs = json.loads(payload[body:body + json_len])
+                embeddings = np.frombuffer(payload[body + json_len:],
+                                           dtype=np.float32).reshape(count, dim)
+                yield _OP_UPSERT, docs, embeddings
+            elif payload[0] == _OP_DELETE:
+                yield _OP_DELETE, json.loads(payload[1:]), None
+
+
+# ============================================================================
+# Snapshots
+# ============================================================================
+
+def write_snapshot(directory, generation: int, embeddings: np.ndarray,
+                   documents: List[dict]) -> Path:
+    """
+    Atomically write a snapshot directory.
+
+    Args:
+        directory: Store directory
+        generation: Snapshot number (covers WAL files below this number)
+        embeddings: Matrix of live embeddings, one row per document
+        documents: Live documents, same order as `embeddings`
+
+    Returns:
+        Path of the finished snapshot
+    """
+    directory = Path(directory)
+    final = _snapshot_path(directory, generation)
+    tmp = final.with_name(final.name + ".tmp")
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir()
+
+    with open(tmp / "embeddings.npy", "wb") as f:
+        np.save(f, np.ascontiguousarray(embeddings, dtype=np.float32))
+        f.flush()
+        os.fsync(f.fileno())
+    with open(tmp / "documents.json", "w") as f:
+        json.dump(documents, f)
+        f.flush()
+        os.fsync(f.fileno())
+    _fsync_dir(tmp)
+
+    os.rename(tmp, final)
+    _fsync_dir(directory)
+    return final
+
+
+def load_snapshot(path) -> Tuple[np.ndarray, List[dict]]:
+    """Read a snapshot written by `write_snapshot()`."""
+    path = Path(path)
+    embeddings = np.load(path / "embeddings.npy")
+    with open(path / "documents.json") as f:
+        documents = json.load(f)
+    return embeddings, documents
+
+
+# ============================================================================
+# Durable Vector Store
+# ============================================================================
+
+class DurableVectorStore(VectorStore):
+    """
+    `VectorStore` that survives crashes.
+
+    Opening a directory recovers its contents (newest snapshot + WAL replay).
+    A snapshot is taken in a background thread every `snapshot_every`
+    operations, or on demand with `snapshot()`.
+
+    Args:
+        embedder: Object with `encode(texts) -> np.ndarray`
+        directory: Where snapshots and WAL files are kept
+        snapshot_every: Operations between automatic snapshots (None = never)
+        fsync: WAL fsync policy, see `WriteAheadLog`
+        fsync_interval: Seconds between WAL fsyncs in "interval" mode
+        **kwargs: Passed to `VectorStore`
+    """
+
+    def __init__(self, embedder, directory, snapshot_every: Optional[int] = 100_000,
+                 fsync: str = "interval", fsync_interval: float = 1.0, **kwargs):
+        super().__init__(embedder, **kwargs)
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.snapshot_every = snapshot_every
+
+        self._wal: Optional[WriteAheadLog] = None
+        self._ops_since_snapshot = 0
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_thread: Optional[threading.Thread] = None
+
+        generation = self._recover()
+        self._wal = WriteAheadLog(self.directory, generation, fsync=fsync,
+                                  fsync_interval=fsync_interval)
+
+    def _recover(self) -> int:
+        """Load the newest snapshot, replay later WAL files, return the next WAL generation."""
+        snapshots = _generations(self.directory, "snapshot-")
+        base = snapshots[-1] if snapshots else 0
+        if snapshots:
+            embeddings, documents = load_snapshot(_snapshot_path(self.directory, base))
+            if documents:
+                self._apply_upserts(documents, embeddings)
+
+        wal_generations = [g for g in _generations(self.directory, "wal-", ".log") if g >= base]
+        for generation in wal_generations:
+            for op, value, embeddings in WriteAheadLog.read(_wal_path(self.directory, generation)):
+                if op == _OP_UPSERT:
+                    self._apply_upserts(value, embeddings)
+                else:
+                    self.delete(value)
+
+        # Never append after a possibly torn tail: start a fresh file
+        return max(wal_generations[-1] + 1 if wal_generations else 0, base)
+
+    @property
+    def pending_ops(self) -> int:
+        """Writes logged since the last snapshot (what recovery would replay)."""
+        return self._ops_since_snapshot
+
+    def _log_upserts(self, docs: List[dict], embeddings: np.ndarray):
+        if self._wal is not None:
+            self._wal.append_upserts(docs, embeddings)
+            self._ops_since_snapshot += len(docs)
+
+    def _log_delete(self, doc_id):
+        if self._wal is not None:
+            self._wal.append_delete(doc_id)
+            self._ops_since_snapshot += 1
+
+    def _apply_upserts(self, docs: List[dict], embeddings: np.ndarray):
+        super()._apply_upserts(docs, embeddings)
+        self._maybe_start_snapshot()
+
+    def delete(self, doc_id) -> bool:
+        deleted = super().delete(doc_id)
+        if deleted:
+            self._maybe_start_snapshot()
+        return deleted
+
+    def _maybe_start_snapshot(self):
+        if (self._wal is None or self.snapshot_every is None
+                or self._ops_since_snapshot < self.snapshot_every):
+            return
+        if self._snapshot_thread is not None and self._snapshot_thread.is_alive():
+            return
+        self._snapshot_thread = threading.Thread(target=self.snapshot,
+                                                 name="vector-store-snapshot", daemon=True)
+        self._snapshot_thread.start()
+
+    def snapshot(self) -> int:
+        """
+        Write a snapshot of the live rows and drop the WAL files it covers.
+
+        Writers are paused only while the WAL is rotated and the tombstone
+        bitmap is copied; the rows themselves are copied afterwards (rows are
+        immutable once written).
+
+        Returns:
+            The snapshot's generation number
+        """
+        with self._snapshot_lock:
+            with self._write_lock:
+                generation = self._wal.rotate()
+                self._ops_since_snapshot = 0
+                seg, live_rows = self._live_rows()
+
+            if seg is not None:
+                embeddings = self._rows_float32(seg, live_rows)
+                documents = self._plain_documents(seg, live_rows)
+            else:
+                embeddings = np.zeros((0, self.dim or 0), dtype=np.float32)
+                documents = []
+            write_snapshot(self.directory, generation, embeddings, documents)
+
+            for old in _generations(self.directory, "wal-", ".log"):
+                if old < generation:
+                    _wal_path(self.directory, old).unlink()
+            for old in _generations(self.directory, "snapshot-"):
+                if old < generation:
+                    shutil.rmtree(_snapshot_path(self.directory, old))
+            return generation
+
+    def close(self):
+        """Wait for a running snapshot and close the WAL."""
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        self.stop_compactor()
+        if self._wal is not None:
+            self._wal.close()
+            self._wal = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,93 @@
+"""
+RAG Pipeline: embed -> search -> filter -> rerank -> build context -> generate
+
+The package version of `simple_rag()` / `rag_query()` from lesson 1, without
+the print statements, with a token-budgeted context, and with every stage
+wrapped in a tracing span (see rag.tracing).
+"""
+
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from rag.context import ContextBuilder, PackedContext
+from rag.tracing import Tracer, get_tracer
+
+
+PROMPT_TEMPLATE = "Context:\n{context}\n\nQuestion: {question}\n\nAnswer:"
+
+
+@dataclass
+class RAGAnswer:
+    """Everything `rag_query()` produced for one question."""
+
+    question: str
+    context: PackedContext
+    prompt: str
+    answer: Optional[str] = None
+
+
+def build_prompt(question: str, context: str) -> str:
+    """Fill the lesson 1 prompt layout."""
+    return PROMPT_TEMPLATE.format(context=context, question=question)
+
+
+def rag_query(question: str, store, context_builder: ContextBuilder, top_k: int = 5,
+              generate: Optional[Callable[[str], str]] = None,
+              where: Optional[Callable[[dict], bool]] = None,
+              rerank: Optional[Callable[[str, List[Tuple[dict, float]]],
+                                        List[Tuple[dict, float]]]] = None,
+              tracer: Optional[Tracer] = None, prompt_layout=None) -> RAGAnswer:
+    """
+    Answer a question using RAG.
+
+    Args:
+        question: User's question
+        store: Anything with `search(query, top_k)` (e.g. rag.VectorStore)
+        context_builder: Packs the results into the token budget
+        top_k: Number of chunks to retrieve before packing
+        generate: Optional `prompt -> answer` LLM call
+        where: Optional metadata filter, `document -> keep?`
+        rerank: Optional `(question, results) -> results` re-ranker
+        tracer: Tracer for per-stage spans (defaults to `get_tracer()`)
+        prompt_layout: Optional rag.prompt_cache.PromptLayout, for prompts with a
+                       stable, provider-cacheable prefix
+
+    Returns:
+        RAGAnswer with the packed context, the prompt and (if generated) the answer
+    """
+    tracer = tracer or get_tracer()
+    with tracer.span("rag_query", top_k=top_k):
+        if hasattr(store, "search_by_vector") and hasattr(store, "embedder"):
+            with tracer.span("embed"):
+                query_embedding = np.asarray(store.embedder.encode([question]),
+                                             dtype=np.float32)[0]
+            with tracer.span("search", top_k=top_k):
+                results = store.search_by_vector(query_embedding, top_k)
+        else:
+            with tracer.span("search", top_k=top_k):
+                results = store.search(question, top_k=top_k)
+
+        if where is not None:
+            with tracer.span("filter"):
+                results = [(doc, score) for doc, score in results if where(doc)]
+
+        if rerank is not None:
+            with tracer.span("rerank"):
+                results = rerank(question, results)
+
+        with tracer.span("context_build") as span:
+            context = context_builder.build(results)
+            span.set_attribute("tokens", context.tokens)
+        if prompt_layout is not None:
+            prompt = prompt_layout.build(question, context)
+        else:
+            prompt = build_prompt(question, context.text)
+
+        answer = None
+        if generate is not None:
+            with tracer.span("generate"):
+                answer = generate(prompt)
+
+    return RAGAnswer(question=question, context=context, prompt=prompt, answer=answer)
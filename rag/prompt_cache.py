@@ -0,0 +1,304 @@
+"""
+Prompt Prefix Caching: Stable Prefixes for Provider-Side Caches
+
+Bedrock (like other providers) can cache a prompt prefix: the tokens before
+a `cachePoint` are processed once, and later requests that start with the
+exact same bytes read them from the cache - faster time-to-first-token and
+cheaper input tokens. The lesson 1 layout never repeats a prefix:
+
+    Context:\\n{top chunks, by score}\\n\\nQuestion: {question}\\n\\nAnswer:
+
+`PromptLayout` reorders the prompt so the stable part comes first and is
+byte-identical from one request to the next:
+
+    system prompt                          ─┐ cache point 1
+    Context:\\n{pinned popular documents}   ─┘ cache point 2  (canonical id order)
+    {other retrieved chunks}\\n\\nQuestion: {question}\\n\\nAnswer:
+
+- Documents retrieved most often are *pinned*: every prompt carries all of
+  them, sorted by id, whether or not this question retrieved them. A pinned
+  document retrieved again is not repeated in the per-request part.
+- The pinned set is recomputed only every `refresh_every` requests (or when
+  a pinned document's text changes), so the prefix stays stable in between.
+  With `store=` given, every change of the store's `version` re-checks the
+  pinned documents, so an updated or deleted one leaves the prefix on the
+  next request instead of being served stale.
+- Cache points are only placed once the prefix reaches `min_cache_tokens`
+  (providers do not cache shorter prefixes).
+- `stats()` keeps local accounting: prompt tokens, cache-eligible tokens,
+  and how many of those should be cache reads vs writes given the provider
+  cache lifetime (`cache_ttl`).
+
+`build()` returns a `CachedPrompt`, which *is* the flat prompt string (any
+`prompt -> answer` callable still works) and also carries the layout that
+`rag.bedrock.BedrockGenerator` turns into Converse content blocks with
+`cachePoint` markers.
+"""
+
+import hashlib
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from rag.context import PackedContext
+from rag.tokenization import get_tokenizer_service
+
+
+DEFAULT_SYSTEM_PROMPT = ("You are a helpful assistant. Answer the question using only the "
+                         "context provided. If the context does not contain the answer, say so.")
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+
+class CachedPrompt(str):
+    """
+    A prompt string that remembers its cacheable layout.
+
+    The string value is `system + prefix + suffix` (flattened for plain
+    generators); `converse()` gives the same text as Converse blocks.
+    """
+
+    system: str
+    prefix: str
+    suffix: str
+    cache_system: bool
+    cache_prefix: bool
+    cacheable_tokens: int
+    prompt_tokens: int
+
+    def __new__(cls, system: str, prefix: str, suffix: str, cache_system: bool = False,
+                cache_prefix: bool = False, cacheable_tokens: int = 0, prompt_tokens: int = 0):
+        prompt = super().__new__(cls, (system + "\n\n" if system else "") + prefix + suffix)
+        prompt.system = system
+        prompt.prefix = prefix
+        prompt.suffix = suffix
+        prompt.cache_system = cache_system
+        prompt.cache_prefix = cache_prefix
+        prompt.cacheable_tokens = cacheable_tokens
+        prompt.prompt_tokens = prompt_tokens
+        return prompt
+
+    def converse(self, cache_points: bool = True) -> dict:
+        """`system` and `messages` for a Converse request."""
+        body = {}
+        if self.system:
+            body["system"] = [{"text": self.system}]
+            if cache_points and self.cache_system:
+                body["system"].append(CACHE_POINT)
+        content = []
+        if self.prefix:
+            content.append({"text": self.prefix})
+            if cache_points and self.cache_prefix:
+                content.append(CACHE_POINT)
+        content.append({"text": self.suffix})
+        body["messages"] = [{"role": "user", "content": content}]
+        return body
+
+
+class PromptLayout:
+    """
+    Builds prompts whose system prompt and popular documents form a stable prefix.
+
+    Args:
+        system_prompt: Instructions sent as the Converse system prompt ("" for none)
+        count_tokens: `text -> int`; defaults to the shared TokenizerService
+        pinned_tokens: Token budget for pinned documents (on top of the
+                       ContextBuilder budget for the rest)
+        min_retrievals: Times a document must have been retrieved (since decay)
+                        before it can be pinned
+        refresh_every: Requests between recomputations of the pinned set
+        min_cache_tokens: Shortest prefix worth a cache point (model dependent;
+                          1024 for Claude 3.x/3.5 models)
+        cache_ttl: Provider cache lifetime in seconds (Bedrock: 5 minutes, reset on use)
+        separator: String placed between documents
+        store: Optional store the documents come from (`version` + `get(id)`);
+               pinned documents are validated against it whenever it changes
+    """
+
+    def __init__(self, system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+                 count_tokens: Optional[Callable[[str], int]] = None,
+                 pinned_tokens: int = 2048, min_retrievals: int = 3, refresh_every: int = 500,
+                 min_cache_tokens: int = 1024, cache_ttl: float = 300.0,
+                 separator: str = "\n\n", store=None):
+        self.system_prompt = system_prompt
+        self.count_tokens = count_tokens or get_tokenizer_service()
+        self.pinned_tokens = pinned_tokens
+        self.min_retrievals = min_retrievals
+        self.refresh_every = refresh_every
+        self.min_cache_tokens = min_cache_tokens
+        self.cache_ttl = cache_ttl
+        self.separator = separator
+        self.store = store
+
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()    # one refresh at a time
+        self._store_version = None
+        self._counts: Counter = Counter()
+        self._latest: Dict[str, dict] = {}
+        self._since_refresh = 0
+        self._pinned: Dict[str, str] = {}      # id -> content, canonical order
+        self._prefix = ""
+        self._prefix_tokens = 0
+        self._system_tokens: Optional[int] = None
+        self._last_used: Dict[bytes, float] = {}
+
+        self.requests = 0
+        self.refreshes = 0
+        self.prompt_tokens = 0
+        self.cache_eligible_tokens = 0
+        self.cache_read_tokens = 0
+        self.cache_write_tokens = 0
+
+    # ------------------------------------------------------------------
+    # Popularity and the pinned set
+    # ------------------------------------------------------------------
+
+    def observe(self, chunks: List[Tuple[dict, float]]):
+        """Count retrieved documents; refreshes the pinned set when due."""
+        with self._lock:
+            stale = False
+            for doc, _ in chunks:
+                doc_id = str(doc["id"])
+                self._counts[doc_id] += 1
+                self._latest[doc_id] = doc
+                if doc_id in self._pinned and self._pinned[doc_id] != doc["content"]:
+                    stale = True  # never serve an outdated copy from the prefix
+            self._since_refresh += 1
+            due = stale or self._since_refresh >= self.refresh_every
+        if due:
+            self.refresh()
+
+    def _check_store(self):
+        """Refresh if the store changed under a pinned document (updated or deleted)."""
+        version = getattr(self.store, "version", None)
+        if self.store is None or version == self._store_version:
+            return
+        with self._lock:
+            pinned = [(self._latest[doc_id]["id"], content)
+                      for doc_id, content in self._pinned.items()]
+        current = [self.store.get(doc_id) for doc_id, _ in pinned]
+        if any(doc is None or doc["content"] != content
+               for doc, (_, content) in zip(current, pinned)):
+            self.refresh()
+        else:
+            self._store_version = version
+
+    def refresh(self) -> bool:
+        """Recompute the pinned set now; returns True if the prefix changed."""
+        with self._refresh_lock:
+            version = getattr(self.store, "version", None)
+            with self._lock:
+                self._since_refresh = 0
+                candidates = [self._latest[doc_id] for doc_id, count in
+                              sorted(self._counts.items(), key=lambda item: (-item[1], item[0]))
+                              if count >= self.min_retrievals]
+
+            # Token counting (possibly a first tokenizer load) runs outside the
+            # lock, so requests building prompts meanwhile are not held up
+            if self.store is not None:
+                candidates = [self.store.get(doc["id"]) for doc in candidates]
+            separator_tokens = self.count_tokens(self.separator)
+            picked: Dict[str, dict] = {}
+            used = 0
+            for doc in candidates:
+                if doc is None:
+                    continue  # deleted from the store
+                cost = self.count_tokens(doc["content"]) + (separator_tokens if picked else 0)
+                if used + cost > self.pinned_tokens:
+                    continue
+                picked[str(doc["id"])] = doc
+                used += cost
+            pinned = {doc_id: picked[doc_id]["content"] for doc_id in sorted(picked)}
+            prefix = ("Context:\n" + self.separator.join(pinned.values()) + self.separator
+                      if pinned else "")
+            prefix_tokens = self.count_tokens(prefix) if pinned else 0
+
+            with self._lock:
+                # Halve the counts so the pinned set follows shifts in popularity
+                self._counts = Counter({doc_id: count // 2
+                                        for doc_id, count in self._counts.items() if count // 2})
+                self._latest = {doc_id: doc for doc_id, doc in self._latest.items()
+                                if doc_id in self._counts}
+                self._latest.update(picked)  # the copies that went into the prefix
+                now = time.monotonic()
+                self._last_used = {key: at for key, at in self._last_used.items()
+                                   if now - at < self.cache_ttl}
+                self._store_version = version
+                if pinned == self._pinned:
+                    return False
+                self._pinned = pinned
+                self._prefix = prefix
+                self._prefix_tokens = prefix_tokens
+                self.refreshes += 1
+                return True
+
+    @property
+    def pinned_ids(self) -> List[str]:
+        return list(self._pinned)
+
+    # ------------------------------------------------------------------
+    # Prompts
+    # ------------------------------------------------------------------
+
+    def build(self, question: str, context: PackedContext) -> CachedPrompt:
+        """
+        Lay out the prompt for one question.
+
+        Args:
+            question: User's question
+            context: Packed retrieval results (`ContextBuilder.build()`)
+
+        Returns:
+            CachedPrompt (a str) with the stable prefix first
+        """
+        self.observe(context.chunks)
+        self._check_store()
+        if self._system_tokens is None:
+            self._system_tokens = self.count_tokens(self.system_prompt) \
+                if self.system_prompt else 0
+        with self._lock:
+            pinned, prefix, prefix_tokens = self._pinned, self._prefix, self._prefix_tokens
+
+        rest = self.separator.join(doc["content"] for doc, _ in context.chunks
+                                   if str(doc["id"]) not in pinned)
+        suffix = ("" if prefix else "Context:\n") + rest + f"\n\nQuestion: {question}\n\nAnswer:"
+        cache_system = self._system_tokens >= self.min_cache_tokens
+        cache_prefix = bool(prefix) and self._system_tokens + prefix_tokens >= self.min_cache_tokens
+        cacheable = (self._system_tokens + prefix_tokens if cache_prefix
+                     else self._system_tokens if cache_system else 0)
+        prompt_tokens = self._system_tokens + prefix_tokens + self.count_tokens(suffix)
+        prompt = CachedPrompt(self.system_prompt, prefix, suffix, cache_system, cache_prefix,
+                              cacheable, prompt_tokens)
+        self._account(prompt)
+        return prompt
+
+    def _account(self, prompt: CachedPrompt):
+        key = hashlib.blake2b((prompt.system + "\0" + prompt.prefix).encode("utf-8"),
+                              digest_size=16).digest()
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt.prompt_tokens
+            if prompt.cacheable_tokens:
+                self.cache_eligible_tokens += prompt.cacheable_tokens
+                last = self._last_used.get(key)
+                if last is not None and now - last < self.cache_ttl:
+                    self.cache_read_tokens += prompt.cacheable_tokens
+                else:
+                    self.cache_write_tokens += prompt.cacheable_tokens
+                self._last_used[key] = now
+
+    def stats(self) -> dict:
+        """Local prompt-cache accounting (compare with the provider's reported usage)."""
+        return {
+            "requests": self.requests,
+            "pinned_documents": len(self._pinned),
+            "prefix_tokens": self._prefix_tokens,
+            "refreshes": self.refreshes,
+            "prompt_tokens": self.prompt_tokens,
+            "cache_eligible_tokens": self.cache_eligible_tokens,
+            "expected_cache_read_tokens": self.cache_read_tokens,
+            "expected_cache_write_tokens": self.cache_write_tokens,
+            "eligible_fraction": (self.cache_eligible_tokens / self.prompt_tokens
+                                  if self.prompt_tokens else 0.0),
+        }
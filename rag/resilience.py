@@ -0,0 +1,191 @@
+"""
+Client-Side Back-Pressure: Adaptive Rate Limiting and Circuit Breaking
+
+Under overload, retrying blindly makes things worse: every throttled request
+comes back, the queue grows, and callers time out one after another. The
+two pieces here let a client slow down and fail fast instead:
+
+    AdaptiveRateLimiter   token bucket whose rate follows AIMD, like TCP:
+                          - throttled (429)  -> rate *= decrease (0.5)
+                          - success          -> rate += increase per second of traffic
+                          A request that would wait more than `max_wait` is
+                          rejected at once instead of queueing.
+
+    CircuitBreaker        closed ──(failure_threshold failures in a row)──> open
+                            ^                                                 |
+                            └── probe ok ── half-open <── reset_timeout ──────┘
+                                            (probe fails -> open again)
+
+Both are plain thread-safe objects with no I/O, so one instance can be
+shared by threads and coroutines, and by several clients that draw on the
+same quota. `rag.bedrock.BedrockHTTPClient` uses them for every call.
+"""
+
+import threading
+import time
+from typing import Optional
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket with an AIMD-controlled refill rate.
+
+    Args:
+        rate: Starting rate in requests/second (default: max_rate, i.e. no
+              limit until the service pushes back)
+        min_rate: Lowest rate after repeated throttling
+        max_rate: Highest rate
+        increase: Requests/second added per second of successful traffic
+        decrease: Factor applied to the rate on throttling
+        burst: Bucket size (requests that may start at once)
+        cooldown: Throttles within this many seconds of the last decrease count once
+                  (one overload episode returns many 429s at the same time)
+    """
+
+    def __init__(self, rate: Optional[float] = None, min_rate: float = 1.0,
+                 max_rate: float = 200.0, increase: float = 1.0, decrease: float = 0.5,
+                 burst: float = 10.0, cooldown: float = 1.0):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate = min(max(rate or max_rate, min_rate), max_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.burst = burst
+        self.cooldown = cooldown
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._last_decrease = float("-inf")
+        self._lock = threading.Lock()
+        self.throttles = 0
+        self.rejected = 0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """
+        Reserve one request slot.
+
+        Returns:
+            Seconds the caller must wait before sending (0.0 = go now), or None
+            if that would be more than `max_wait` (nothing is reserved then)
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, (1.0 - self._tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                self.rejected += 1
+                return None
+            self._tokens -= 1.0  # may go negative: later callers queue behind this one
+            return wait
+
+    def on_success(self):
+        """Additive increase: `increase` requests/s more per second of successful calls."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+    def on_throttle(self):
+        """Multiplicative decrease, at most once per `cooldown`."""
+        with self._lock:
+            self.throttles += 1
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._tokens = min(self._tokens, 0.0)  # the burst allowance is gone too
+
+    def stats(self) -> dict:
+        return {"rate": round(self.rate, 2), "throttles": self.throttles,
+                "rejected": self.rejected}
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency, then probes it before trusting it again.
+
+    Args:
+        failure_threshold: Consecutive failures that open the circuit
+        reset_timeout: Seconds to stay open before letting a probe through
+        half_open_max_calls: Probes allowed at once while half-open
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_at = 0.0
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._update(time.monotonic())
+            return self._state
+
+    def _update(self, now: float):
+        if self._state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probes = 0
+            self._probe_at = now
+
+    def retry_after(self) -> float:
+        """Seconds until the next probe may go out (0 if calls are allowed)."""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (counts as a probe while half-open)."""
+        with self._lock:
+            now = time.monotonic()
+            self._update(now)
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN:
+                if now - self._probe_at >= self.reset_timeout:
+                    self._probes = 0  # probes that never reported back must not block forever
+                if self._probes < self.half_open_max_calls:
+                    self._probes += 1
+                    self._probe_at = now
+                    return True
+            self.rejected += 1
+            return False
+
+    def release(self):
+        """Give back an `allow()` that was not used (the call was never sent)."""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes:
+                self._probes -= 1
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "opened": self.opened, "rejected": self.rejected}
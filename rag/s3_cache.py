@@ -0,0 +1,279 @@
+"""
+Local Disk Cache for S3 Objects
+
+Every node that serves or reindexes pulls the same documents and embedding
+shards from the bucket. `S3Cache` keeps a copy on local disk so repeat reads
+are local I/O:
+
+    data/s3-cache/
+        blobs/3f/3f9a...   # one file per (bucket, key, ETag) - content-addressed
+        keys/a1/a1c0...    # (bucket, key) -> the ETag last seen, as JSON
+
+    cache = S3Cache(client, "data/s3-cache", max_bytes=20 * 1024**3)
+    body = cache.get(bucket, "documents/raw/faq.md")
+
+- **Conditional GETs.** A cached object is revalidated with
+  `If-None-Match: <ETag>`; S3 answers 304 Not Modified without a body.
+  No request is sent at all when the caller already knows the current ETag
+  (`etag=`, e.g. from a listing), for keys marked `immutable=True`, or within
+  `max_age` seconds of the last check.
+- **Bounded LRU on disk.** Every hit touches the blob's mtime; when the
+  cache grows past `max_bytes` the least recently used blobs are deleted
+  (including the old versions of objects that changed).
+- **Shared between processes.** Files are written to a temporary name and
+  `os.replace()`d into place, so readers never see a partial file. Two
+  processes fetching the same object both write identical bytes to the same
+  name; whichever lands last wins. Within a process, threads asking for the
+  same key wait for one download.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Tuple
+
+
+DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def _normalize_etag(etag: str) -> str:
+    return etag.strip().strip('"')
+
+
+def _atomic_write(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class S3Cache:
+    """
+    Size-bounded, ETag-validated local cache in front of an S3 client.
+
+    Args:
+        client: boto3 S3 client
+        directory: Cache directory (safe to share between processes)
+        max_bytes: Disk budget for cached objects
+        max_age: Seconds a cached copy is trusted without revalidating
+                 (0 = always send a conditional GET)
+    """
+
+    def __init__(self, client, directory, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age: float = 0.0):
+        self.client = client
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._blobs = self.directory / "blobs"
+        self._keys = self.directory / "keys"
+        self._blobs.mkdir(parents=True, exist_ok=True)
+        self._keys.mkdir(parents=True, exist_ok=True)
+
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._approx_bytes = self.disk_bytes()
+        self.hits = 0
+        self.not_modified = 0
+        self.misses = 0
+        self.bytes_downloaded = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------------
+    # Layout
+    # ------------------------------------------------------------------
+
+    def _blob_path(self, bucket: str, key: str, etag: str) -> Path:
+        digest = _digest(bucket, key, _normalize_etag(etag))
+        return self._blobs / digest[:2] / digest
+
+    def _key_path(self, bucket: str, key: str) -> Path:
+        digest = _digest(bucket, key)
+        return self._keys / digest[:2] / f"{digest}.json"
+
+    def _read_entry(self, bucket: str, key: str) -> Optional[dict]:
+        try:
+            return json.loads(self._key_path(bucket, key).read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_entry(self, bucket: str, key: str, etag: str):
+        entry = {"bucket": bucket, "key": key, "etag": etag, "validated_at": time.time()}
+        _atomic_write(self._key_path(bucket, key), json.dumps(entry).encode("utf-8"))
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def path(self, bucket: str, key: str, etag: Optional[str] = None,
+             immutable: bool = False) -> Path:
+        """
+        Local path of an up-to-date copy, downloading it if needed.
+
+        Args:
+            etag: The object's current ETag if already known (e.g. from a
+                  listing); a matching cached copy is then used without a request
+            immutable: The key is never overwritten (e.g. a published
+                       embeddings version), so any cached copy is current
+
+        Returns:
+            Path of the cached file (do not modify it)
+        """
+        with self._lock_for(bucket, key):
+            entry = self._read_entry(bucket, key)
+            blob = self._blob_path(bucket, key, entry["etag"]) if entry else None
+            if blob is not None and blob.exists():
+                if etag is not None:
+                    if _normalize_etag(etag) == _normalize_etag(entry["etag"]):
+                        return self._hit(blob)
+                elif immutable or time.time() - entry.get("validated_at", 0) <= self.max_age:
+                    return self._hit(blob)
+                else:
+                    try:
+                        response = self.client.get_object(Bucket=bucket, Key=key,
+                                                          IfNoneMatch=entry["etag"])
+                    except Exception as error:  # botocore ClientError
+                        if _status(error) != 304:
+                            raise
+                        self._write_entry(bucket, key, entry["etag"])
+                        with self._stats_lock:
+                            self.not_modified += 1
+                        return self._touch(blob)
+                    return self._store(bucket, key, response)  # changed since cached
+            return self._store(bucket, key, self.client.get_object(Bucket=bucket, Key=key))
+
+    def get(self, bucket: str, key: str, etag: Optional[str] = None,
+            immutable: bool = False) -> bytes:
+        """Object body, from the cache when it is still current (see `path`)."""
+        with self.open(bucket, key, etag, immutable) as f:
+            return f.read()
+
+    def open(self, bucket: str, key: str, etag: Optional[str] = None,
+             immutable: bool = False) -> BinaryIO:
+        """
+        Open the cached copy for reading (see `path`).
+
+        Unlike `open(cache.path(...))` this cannot race with eviction: a blob
+        deleted between lookup and open is fetched again, and once open, the
+        file stays readable even if it is evicted.
+        """
+        while True:
+            blob = self.path(bucket, key, etag, immutable)
+            try:
+                return open(blob, "rb")
+            except FileNotFoundError:
+                continue  # evicted by another thread or process in between; fetch again
+
+    def _hit(self, blob: Path) -> Path:
+        with self._stats_lock:
+            self.hits += 1
+        return self._touch(blob)
+
+    def _store(self, bucket: str, key: str, response: dict) -> Path:
+        body = response["Body"].read()
+        etag = response["ETag"]
+        blob = self._blob_path(bucket, key, etag)
+        _atomic_write(blob, body)
+        self._write_entry(bucket, key, etag)
+        with self._stats_lock:
+            self.misses += 1
+            self.bytes_downloaded += len(body)
+            self._approx_bytes += len(body)
+            over = self._approx_bytes > self.max_bytes
+        if over:
+            self.enforce_budget(keep=blob)
+        return blob
+
+    @staticmethod
+    def _touch(blob: Path) -> Path:
+        try:
+            os.utime(blob)
+        except FileNotFoundError:
+            pass
+        return blob
+
+    def _lock_for(self, bucket: str, key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault((bucket, key), threading.Lock())
+
+    # ------------------------------------------------------------------
+    # Eviction
+    # ------------------------------------------------------------------
+
+    def _scan_blobs(self):
+        for shard in os.scandir(self._blobs):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.is_file() and not entry.name.startswith(".tmp-"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue  # removed by another process
+                    yield entry.path, stat.st_size, stat.st_mtime
+
+    def disk_bytes(self) -> int:
+        """Bytes of cached objects on disk (all processes)."""
+        return sum(size for _, size, _ in self._scan_blobs())
+
+    def enforce_budget(self, keep: Optional[Path] = None) -> int:
+        """
+        Delete least recently used blobs until the cache fits `max_bytes`.
+
+        Args:
+            keep: A blob that must survive (the one just downloaded)
+
+        Returns:
+            Number of blobs deleted
+        """
+        blobs = sorted(self._scan_blobs(), key=lambda item: item[2])
+        total = sum(size for _, size, _ in blobs)
+        deleted = 0
+        for path, size, _ in blobs:
+            if total <= self.max_bytes:
+                break
+            if keep is not None and path == str(keep):
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass  # another process got there first
+            total -= size
+            deleted += 1
+        with self._stats_lock:
+            self._approx_bytes = total
+            self.evictions += deleted
+        return deleted
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "not_modified": self.not_modified,
+            "misses": self.misses,
+            "bytes_downloaded": self.bytes_downloaded,
+            "evictions": self.evictions,
+            "disk_bytes": self.disk_bytes(),
+            "max_bytes": self.max_bytes,
+        }
+
+
+def _status(error: Exception) -> Optional[int]:
+    response = getattr(error, "response", None) or {}
+    return response.get("ResponseMetadata", {}).get("HTTPStatusCode")
@@ -0,0 +1,221 @@
+"""
+Publish / Load Embeddings via S3
+
+`aws/setup_s3.py` creates an `embeddings/` prefix in the bucket. The index
+builder publishes its embeddings there once, and every serving node
+downloads them instead of re-embedding the whole corpus.
+
+Layout (one immutable version per publish):
+
+    embeddings/<index>/<version>/shard-00000.npy       # float32 rows
+    embeddings/<index>/<version>/documents-00000.json  # matching documents
+    embeddings/<index>/<version>/manifest.json         # written LAST
+    embeddings/<index>/LATEST                          # -> "<version>"
+
+The manifest records each shard's byte range, so a loader can split every
+shard into parts and fetch them with parallel ranged GETs straight into one
+pre-allocated matrix - no pyarrow needed, and no extra copy.
+
+With `cache=S3Cache(...)` (see rag.s3_cache) whole shards are kept on local
+disk instead; versions are immutable, so a node that restarts reads its
+shards from disk without asking S3.
+"""
+
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+EMBEDDINGS_PREFIX = "embeddings/"
+MANIFEST_NAME = "manifest.json"
+LATEST_NAME = "LATEST"
+MANIFEST_FORMAT = "npy-shards/v1"
+
+
+def _index_prefix(index_name: str, prefix: str = EMBEDDINGS_PREFIX) -> str:
+    return f"{prefix.rstrip('/')}/{index_name}/"
+
+
+def publish_embeddings(s3_client, bucket: str, index_name: str, embeddings: np.ndarray,
+                       documents: List[dict], shard_rows: int = 50_000,
+                       version: Optional[str] = None, prefix: str = EMBEDDINGS_PREFIX,
+                       max_workers: int = 8) -> dict:
+    """
+    Upload embeddings and documents as shards plus a manifest.
+
+    Args:
+        s3_client: boto3 S3 client
+        bucket: Bucket name (see aws/config.json)
+        index_name: Logical index name, e.g. "support-docs"
+        embeddings: Matrix of shape (len(documents), dim)
+        documents: Documents in the same order as `embeddings`
+        shard_rows: Rows per shard file
+        version: Version label (defaults to a UTC timestamp)
+        prefix: Top-level prefix (the `embeddings/` folder)
+        max_workers: Parallel shard uploads
+
+    Returns:
+        The manifest that was written
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if embeddings.ndim != 2 or len(embeddings) != len(documents):
+        raise ValueError("embeddings must be a (len(documents), dim) matrix")
+
+    version = version or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    base = f"{_index_prefix(index_name, prefix)}{version}/"
+
+    def upload_shard(number: int) -> dict:
+        start = number * shard_rows
+        rows = embeddings[start:start + shard_rows]
+
+        buffer = io.BytesIO()
+        np.save(buffer, rows)
+        body = buffer.getvalue()
+        data_offset = len(body) - rows.nbytes
+
+        shard_key = f"{base}shard-{number:05d}.npy"
+        docs_key = f"{base}documents-{number:05d}.json"
+        s3_client.put_object(Bucket=bucket, Key=shard_key, Body=body)
+        s3_client.put_object(
+            Bucket=bucket, Key=docs_key,
+            Body=json.dumps(documents[start:start + shard_rows]).encode("utf-8"),
+        )
+        return {
+            "key": shard_key,
+            "documents_key": docs_key,
+            "rows": len(rows),
+            "data_offset": data_offset,
+            "nbytes": rows.nbytes,
+        }
+
+    shard_count = max(1, -(-len(embeddings) // shard_rows))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        shards = list(pool.map(upload_shard, range(shard_count)))
+
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "index": index_name,
+        "version": version,
+        "dtype": "float32",
+        "dim": int(embeddings.shape[1]),
+        "rows": int(len(embeddings)),
+        "shards": shards,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    # The manifest (then LATEST) goes last: readers never see half a version
+    s3_client.put_object(Bucket=bucket, Key=f"{base}{MANIFEST_NAME}",
+                         Body=json.dumps(manifest, indent=2).encode("utf-8"))
+    s3_client.put_object(Bucket=bucket, Key=f"{_index_prefix(index_name, prefix)}{LATEST_NAME}",
+                         Body=version.encode("utf-8"))
+    return manifest
+
+
+def load_manifest(s3_client, bucket: str, index_name: str, version: Optional[str] = None,
+                  prefix: str = EMBEDDINGS_PREFIX) -> dict:
+    """Fetch the manifest of a version (the LATEST one by default)."""
+    index_prefix = _index_prefix(index_name, prefix)
+    if version is None:
+        response = s3_client.get_object(Bucket=bucket, Key=f"{index_prefix}{LATEST_NAME}")
+        version = response["Body"].read().decode("utf-8").strip()
+    response = s3_client.get_object(Bucket=bucket, Key=f"{index_prefix}{version}/{MANIFEST_NAME}")
+    manifest = json.loads(response["Body"].read())
+    if manifest.get("format") != MANIFEST_FORMAT:
+        raise ValueError(f"Unsupported embeddings format: {manifest.get('format')}")
+    return manifest
+
+
+def load_embeddings(s3_client, bucket: str, index_name: str, version: Optional[str] = None,
+                    prefix: str = EMBEDDINGS_PREFIX, max_workers: int = 16,
+                    part_size: int = 8 * 1024 * 1024,
+                    cache=None) -> Tuple[np.ndarray, List[dict], dict]:
+    """
+    Download a published version with parallel ranged GETs.
+
+    Each shard's data region is split into `part_size` byte ranges; every
+    range is written directly into its slice of one pre-allocated matrix.
+    Give the client `max_pool_connections >= max_workers` so connections
+    are reused rather than re-opened.
+
+    With `cache` (an rag.s3_cache.S3Cache for the same bucket) shards and
+    document files are read through the local disk cache instead.
+
+    Returns:
+        (embeddings, documents, manifest)
+    """
+    manifest = load_manifest(s3_client, bucket, index_name, version, prefix)
+    embeddings = np.empty((manifest["rows"], manifest["dim"]), dtype=np.float32)
+    target = memoryview(embeddings).cast("B")
+
+    if cache is not None:
+        return _load_cached(cache, bucket, manifest, embeddings, max_workers)
+
+    tasks = []
+    out_offset = 0
+    for shard in manifest["shards"]:
+        for start in range(0, shard["nbytes"], part_size):
+            length = min(part_size, shard["nbytes"] - start)
+            tasks.append((shard["key"], shard["data_offset"] + start, out_offset + start, length))
+        out_offset += shard["nbytes"]
+
+    def fetch_range(task):
+        key, source, destination, length = task
+        response = s3_client.get_object(
+            Bucket=bucket, Key=key, Range=f"bytes={source}-{source + length - 1}",
+        )
+        data = response["Body"].read()
+        if len(data) != length:
+            raise IOError(f"Short read for {key}: expected {length} bytes, got {len(data)}")
+        target[destination:destination + length] = data
+
+    def fetch_documents(shard) -> List[dict]:
+        response = s3_client.get_object(Bucket=bucket, Key=shard["documents_key"])
+        return json.loads(response["Body"].read())
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        document_futures = [pool.submit(fetch_documents, shard) for shard in manifest["shards"]]
+        list(pool.map(fetch_range, tasks))
+        documents = [doc for future in document_futures for doc in future.result()]
+
+    return embeddings, documents, manifest
+
+
+def _load_cached(cache, bucket: str, manifest: dict, embeddings: np.ndarray,
+                 max_workers: int) -> Tuple[np.ndarray, List[dict], dict]:
+    offsets = np.cumsum([0] + [shard["rows"] for shard in manifest["shards"]])
+
+    def load_shard(number: int) -> List[dict]:
+        shard = manifest["shards"][number]
+        rows = embeddings[offsets[number]:offsets[number + 1]]
+        # cache.open() retries if budget enforcement evicts the blob first
+        with cache.open(bucket, shard["key"], immutable=True) as f:
+            f.seek(shard["data_offset"])
+            if f.readinto(memoryview(rows).cast("B")) != shard["nbytes"]:
+                raise IOError(f"Short read for cached {shard['key']}")
+        return json.loads(cache.get(bucket, shard["documents_key"], immutable=True))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        documents = [doc for shard_docs in pool.map(load_shard, range(len(manifest["shards"])))
+                     for doc in shard_docs]
+    return embeddings, documents, manifest
+
+
+def publish_store(store, s3_client, bucket: str, index_name: str, **kwargs) -> dict:
+    """Publish the live rows of a `VectorStore` (see `publish_embeddings`)."""
+    embeddings, documents = store.export()
+    return publish_embeddings(s3_client, bucket, index_name, embeddings, documents, **kwargs)
+
+
+def bootstrap_store(store, s3_client, bucket: str, index_name: str, **kwargs) -> dict:
+    """
+    Fill a `VectorStore` from published embeddings instead of re-embedding.
+
+    Returns:
+        The manifest that was loaded
+    """
+    embeddings, documents, manifest = load_embeddings(s3_client, bucket, index_name, **kwargs)
+    store.upsert_embedded(documents, embeddings)
+    return manifest
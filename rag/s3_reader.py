@@ -0,0 +1,187 @@
+"""
+Streaming Documents out of S3
+
+`aws/scripts/upload_documents.py` puts raw documents under `documents/raw/`.
+`S3DocumentReader` reads them back for (re)indexing as a stream:
+
+    listing (paginator, lazy) ──> up to `max_in_flight` concurrent GETs ──> yield in order
+                                  up to `read_ahead` objects buffered
+
+    reader = S3DocumentReader(s3_client(max_pool_connections=16), bucket)
+    store.add_documents(reader.documents())
+
+- Listing is paginated and lazy: the next page is requested only when the
+  downloads get close to the end of the current one.
+- Downloads run on a thread pool of `max_in_flight` threads; at most
+  `read_ahead` objects are requested or waiting to be consumed, so memory
+  stays bounded however large the prefix is.
+- With `cache=S3Cache(...)` objects whose listed ETag matches the cached
+  copy are read from local disk instead of S3.
+- One client is shared by all threads. Its connection pool
+  (`max_pool_connections`) should be at least `max_in_flight`, otherwise
+  threads queue for a connection or open throwaway ones; `s3_client()`
+  builds a client sized that way.
+"""
+
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, Tuple
+
+RAW_DOCUMENTS_PREFIX = "documents/raw/"
+DEFAULT_MAX_IN_FLIGHT = 16
+
+
+def s3_client(max_pool_connections: int = DEFAULT_MAX_IN_FLIGHT, region: Optional[str] = None,
+              profile: Optional[str] = None, **client_kwargs):
+    """
+    boto3 S3 client with a connection pool sized for parallel reads.
+
+    Args:
+        max_pool_connections: Keep-alive connections (>= concurrent requests)
+        region: AWS region (default: from the environment/profile)
+        profile: AWS profile name (see aws/config.json)
+        **client_kwargs: Passed to `session.client("s3", ...)` (endpoint_url, ...)
+    """
+    import boto3
+    from botocore.config import Config
+
+    session = boto3.Session(profile_name=profile) if profile else boto3.Session()
+    config = Config(max_pool_connections=max_pool_connections,
+                    retries={"max_attempts": 5, "mode": "adaptive"})
+    return session.client("s3", region_name=region, config=config, **client_kwargs)
+
+
+@dataclass
+class S3Object:
+    """One downloaded object."""
+
+    bucket: str
+    key: str
+    body: bytes
+    etag: str
+    size: int
+
+    def text(self, encoding: str = "utf-8") -> str:
+        return self.body.decode(encoding, errors="replace")
+
+    def to_document(self) -> dict:
+        """The object as a lesson 1 document, keyed by its S3 key."""
+        return {"id": self.key, "content": self.text(),
+                "metadata": {"source": f"s3://{self.bucket}/{self.key}", "etag": self.etag}}
+
+
+def list_objects(client, bucket: str, prefix: str = RAW_DOCUMENTS_PREFIX,
+                 suffixes: Optional[Tuple[str, ...]] = None,
+                 page_size: int = 1000) -> Iterator[dict]:
+    """
+    Lazily list objects under a prefix.
+
+    Args:
+        suffixes: Only keys ending in one of these (e.g. (".md", ".txt"))
+        page_size: Keys per ListObjectsV2 request (S3 caps it at 1000)
+
+    Yields:
+        ListObjectsV2 entries (Key, Size, ETag, ...); "folder" markers are skipped
+    """
+    paginator = client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix,
+                                   PaginationConfig={"PageSize": page_size}):
+        for entry in page.get("Contents", ()):
+            key = entry["Key"]
+            if key.endswith("/") or (suffixes and not key.endswith(suffixes)):
+                continue
+            yield entry
+
+
+class S3DocumentReader:
+    """
+    Concurrent, bounded, in-order reader for every object under a prefix.
+
+    Args:
+        client: boto3 S3 client (default: `s3_client(max_in_flight)`)
+        bucket: Bucket name (see aws/config.json)
+        prefix: Key prefix to read
+        max_in_flight: Concurrent GET requests
+        read_ahead: Objects requested or downloaded but not yet consumed
+                    (>= max_in_flight to keep every thread busy)
+        suffixes: Only read keys ending in one of these
+        ordered: Yield in listing order (False = as soon as each finishes)
+        cache: Optional rag.s3_cache.S3Cache to read through
+    """
+
+    def __init__(self, client=None, bucket: str = "", prefix: str = RAW_DOCUMENTS_PREFIX,
+                 max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, read_ahead: Optional[int] = None,
+                 suffixes: Optional[Iterable[str]] = None, ordered: bool = True,
+                 cache=None):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.client = client or s3_client(max_pool_connections=max_in_flight)
+        self.bucket = bucket
+        self.prefix = prefix
+        self.max_in_flight = max_in_flight
+        self.read_ahead = max(read_ahead or 4 * max_in_flight, 1)
+        self.suffixes = tuple(suffixes) if suffixes else None
+        self.ordered = ordered
+        self.cache = cache
+        self.objects = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def _fetch(self, entry: dict) -> S3Object:
+        if self.cache is not None:
+            etag = entry.get("ETag", "").strip('"')
+            body = self.cache.get(self.bucket, entry["Key"], etag=etag or None)
+            return S3Object(self.bucket, entry["Key"], body, etag, len(body))
+        response = self.client.get_object(Bucket=self.bucket, Key=entry["Key"])
+        body = response["Body"].read()
+        return S3Object(self.bucket, entry["Key"], body,
+                        response.get("ETag", entry.get("ETag", "")).strip('"'), len(body))
+
+    def __iter__(self) -> Iterator[S3Object]:
+        started = time.perf_counter()
+        entries = list_objects(self.client, self.bucket, self.prefix, self.suffixes)
+        pending = deque()
+        pool = ThreadPoolExecutor(max_workers=self.max_in_flight,
+                                  thread_name_prefix="s3-reader")
+        try:
+            for entry in entries:
+                pending.append(pool.submit(self._fetch, entry))
+                if len(pending) >= self.read_ahead:
+                    yield self._record(self._next(pending))
+            while pending:
+                yield self._record(self._next(pending))
+        finally:
+            # Consumer stopped early (or an error): drop what has not started
+            for future in pending:
+                future.cancel()
+            pool.shutdown(wait=True)
+            self.seconds += time.perf_counter() - started
+
+    def _next(self, pending: deque):
+        if not self.ordered:
+            # Whichever request finishes first, not the oldest
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            future = next(f for f in pending if f in done)
+            pending.remove(future)
+            return future.result()
+        return pending.popleft().result()
+
+    def _record(self, obj: S3Object) -> S3Object:
+        self.objects += 1
+        self.bytes += obj.size
+        return obj
+
+    def documents(self) -> Iterator[dict]:
+        """Objects as lesson 1 documents (`{"id": key, "content": text, ...}`)."""
+        for obj in self:
+            yield obj.to_document()
+
+    def stats(self) -> dict:
+        return {
+            "objects": self.objects,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 3),
+            "mb_per_sec": round(self.bytes / self.seconds / 1e6, 2) if self.seconds else None,
+        }
@@ -0,0 +1,223 @@
+"""
+Compact Embedding Storage and Blocked Scoring
+
+Embeddings are unit vectors with small components, so 16 bits per value keep
+nearly all of the ranking signal at half the memory of float32. A brute force
+scan reads every stored byte once per query, so fewer bytes also means less
+memory traffic - as long as widening back to float32 is cheap. Shifting a
+bfloat16 into a float32 is a single integer op; numpy's float16 -> float32
+conversion is much slower (see rag/README.md for measured numbers).
+
+Storage dtypes:
+
+    float32   4 bytes  exact
+    float16   2 bytes  10-bit mantissa, range +-65504 (plenty for unit vectors)
+    bfloat16  2 bytes  8-bit mantissa, float32 range; numpy has no bfloat16,
+                       so it is stored as the upper 16 bits of each float32
+
+Scoring never multiplies in 16 bits. The matrix is walked in row blocks; each
+block is widened into a reusable float32 scratch buffer and scored with one
+BLAS matrix-vector product, so accumulation is float32 end to end.
+
+Top-k selection (`blocked_top_k()`) streams over the same blocks and keeps a
+bounded running top-k: each block's candidates are picked with argpartition
+and merged into the k best so far. Nothing proportional to the corpus size is
+allocated per query - only block-sized scratch (reused per thread) and
+k-sized merge arrays.
+"""
+
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+STORAGE_DTYPES = ("float32", "float16", "bfloat16")
+
+# Rows widened per step: 512 x 384 dims x 4 bytes = 768 KB of scratch, which
+# stays in L2 between being widened and being scored
+DEFAULT_BLOCK_ROWS = 512
+
+# float32 rows need no widening, so top-k scans score larger blocks per BLAS
+# call: 8192 scores = 32 KB, which stays in L1/L2 for the argpartition
+DEFAULT_TOPK_BLOCK_ROWS = 8192
+
+_local = threading.local()
+
+
+def check_dtype(dtype: str) -> str:
+    if dtype not in STORAGE_DTYPES:
+        raise ValueError(f"Unknown storage dtype {dtype!r}; choose one of {STORAGE_DTYPES}")
+    return dtype
+
+
+def numpy_dtype(dtype: str) -> np.dtype:
+    """The numpy dtype a storage matrix is allocated with."""
+    return np.dtype({"float32": np.float32, "float16": np.float16,
+                     "bfloat16": np.uint16}[check_dtype(dtype)])
+
+
+def to_storage(embeddings: np.ndarray, dtype: str) -> np.ndarray:
+    """Convert float32 embeddings to the storage dtype (bfloat16 rounds to nearest even)."""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if dtype == "float32":
+        return embeddings
+    if dtype == "float16":
+        return embeddings.astype(np.float16)
+    bits = np.ascontiguousarray(embeddings).view(np.uint32)
+    rounding = ((bits >> 16) & 1) + np.uint32(0x7FFF)
+    return ((bits + rounding) >> 16).astype(np.uint16)
+
+
+def to_float32(stored: np.ndarray, dtype: str) -> np.ndarray:
+    """Widen stored embeddings back to float32 (a copy unless already float32)."""
+    if dtype == "float32":
+        return np.asarray(stored, dtype=np.float32)
+    if dtype == "float16":
+        return stored.astype(np.float32)
+    return (stored.astype(np.uint32) << 16).view(np.float32)
+
+
+def _scratch(rows: int, dim: int) -> np.ndarray:
+    """Per-thread float32 buffer reused across queries."""
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None or buffer.shape[0] < rows or buffer.shape[1] != dim:
+        buffer = np.empty((rows, dim), dtype=np.float32)
+        _local.buffer = buffer
+    return buffer[:rows]
+
+
+def _score_scratch(rows: int) -> np.ndarray:
+    """Per-thread float32 vector for one block of scores."""
+    buffer = getattr(_local, "scores", None)
+    if buffer is None or buffer.shape[0] < rows:
+        buffer = np.empty(rows, dtype=np.float32)
+        _local.scores = buffer
+    return buffer[:rows]
+
+
+def _widen_into(block: np.ndarray, dtype: str, out: np.ndarray) -> np.ndarray:
+    if dtype == "float16":
+        np.copyto(out, block)
+    else:
+        np.left_shift(block, 16, out=out.view(np.uint32), dtype=np.uint32)
+    return out
+
+
+def blocked_scores(stored: np.ndarray, query: np.ndarray, dtype: str,
+                   rows: Optional[int] = None, block_rows: int = DEFAULT_BLOCK_ROWS,
+                   out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Dot product of every stored row with the query, accumulated in float32.
+
+    Args:
+        stored: Storage matrix (see `to_storage()`)
+        query: float32 query vector
+        dtype: Storage dtype of `stored`
+        rows: Score only the first `rows` rows (default: all)
+        block_rows: Rows widened to float32 per step
+        out: Optional float32 array of length `rows` to write into
+
+    Returns:
+        float32 scores of shape (rows,)
+    """
+    rows = stored.shape[0] if rows is None else rows
+    query = np.asarray(query, dtype=np.float32)
+    if out is None:
+        out = np.empty(rows, dtype=np.float32)
+    if dtype == "float32":
+        np.matmul(stored[:rows], query, out=out[:rows])
+        return out
+
+    scratch = _scratch(min(block_rows, max(rows, 1)), stored.shape[1])
+    for start in range(0, rows, block_rows):
+        stop = min(start + block_rows, rows)
+        _score_block(stored, start, stop, query, dtype, scratch, out[start:stop])
+    return out
+
+
+def _score_block(stored: np.ndarray, start: int, stop: int, query: np.ndarray, dtype: str,
+                 scratch: np.ndarray, out: np.ndarray) -> np.ndarray:
+    block = stored[start:stop]
+    if dtype != "float32":
+        block = _widen_into(block, dtype, scratch[:stop - start])
+    return np.matmul(block, query, out=out)
+
+
+def blocked_top_k(stored: np.ndarray, query: np.ndarray, k: int, dtype: str = "float32",
+                  rows: Optional[int] = None, dead: Optional[np.ndarray] = None,
+                  block_rows: int = DEFAULT_TOPK_BLOCK_ROWS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rows with the k highest dot products with the query.
+
+    Args:
+        stored: Storage matrix (see `to_storage()`)
+        query: float32 query vector
+        k: Number of results
+        dtype: Storage dtype of `stored`
+        rows: Consider only the first `rows` rows (default: all)
+        dead: Optional boolean mask; rows where it is True are skipped
+        block_rows: Rows scored per step
+
+    Returns:
+        (row_indices, scores), best first (equal scores by row). Fewer than
+        k entries if fewer than k rows are live.
+    """
+    rows = stored.shape[0] if rows is None else rows
+    k = min(k, rows)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    query = np.asarray(query, dtype=np.float32)
+    if dtype != "float32":
+        block_rows = min(block_rows, DEFAULT_BLOCK_ROWS)
+
+    block_rows = max(block_rows, k)
+    scratch = _scratch(min(block_rows, rows), stored.shape[1]) if dtype != "float32" else None
+    block_scores = _score_scratch(min(block_rows, rows))
+
+    # Running top-k lives in the first k slots; each block appends up to k
+    # candidates behind it and the pool is cut back to k
+    pool_scores = np.full(2 * k, -np.inf, dtype=np.float32)
+    pool_rows = np.zeros(2 * k, dtype=np.int64)
+    threshold = -np.inf
+    filled = 0
+
+    for start in range(0, rows, block_rows):
+        stop = min(start + block_rows, rows)
+        size = stop - start
+        scores = _score_block(stored, start, stop, query, dtype, scratch, block_scores[:size])
+        if dead is not None:
+            scores[dead[start:stop]] = -np.inf
+        if filled == k and scores.max() <= threshold:
+            continue  # nothing in this block beats the current k-th best
+
+        take = min(k, size)
+        candidates = _block_candidates(scores, take) if take < size else np.arange(size)
+        end = filled + take
+        pool_scores[filled:end] = scores[candidates]
+        pool_rows[filled:end] = candidates + start
+        # Keep the pool sorted (best first, equal scores by row), so the cut
+        # back to k is deterministic; sorting 2k entries is cheap
+        order = np.lexsort((pool_rows[:end], -pool_scores[:end]))
+        filled = min(end, k)
+        pool_scores[:filled] = pool_scores[order[:filled]]
+        pool_rows[:filled] = pool_rows[order[:filled]]
+        if filled == k:
+            threshold = pool_scores[k - 1]
+
+    best_scores, best_rows = pool_scores[:filled], pool_rows[:filled]
+    live = np.isfinite(best_scores)
+    return best_rows[live], best_scores[live]
+
+
+def _block_candidates(scores: np.ndarray, take: int) -> np.ndarray:
+    """Positions of the `take` highest scores; ties at the cut go to the lowest positions."""
+    size = len(scores)
+    candidates = np.argpartition(scores, size - take)[size - take:]
+    chosen = scores[candidates]
+    cut = chosen.min()
+    if np.count_nonzero(scores == cut) == np.count_nonzero(chosen == cut):
+        return candidates  # no tie straddles the cut
+    above = candidates[chosen > cut]
+    ties = np.flatnonzero(scores == cut)[:take - len(above)]
+    return np.concatenate([above, ties])
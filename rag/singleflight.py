@@ -0,0 +1,173 @@
+"""
+Single-Flight Calls and a Short-Lived Result Cache
+
+A burst of identical requests (a popular question, a boilerplate chunk that
+every document shares) should cost one upstream call, not one per request:
+
+    request A ──┐
+    request B ──┼──> one call in flight ──> result fanned out to A, B, C
+    request C ──┘                           and kept in a TTLCache for `ttl` s
+
+- `SingleFlight` coalesces duplicate calls across threads.
+- `AsyncSingleFlight` does the same for coroutines on an event loop. The
+  call runs as its own task, so a caller that is cancelled (or times out)
+  does not cancel it for the others still waiting.
+- `TTLCache` keeps results for a short while, so requests that arrive just
+  after a call finished do not start a new one.
+
+Errors are not cached: every waiter of a failed call gets the exception, and
+the next request tries again.
+
+`rag.bedrock.BedrockEmbedder` uses all three for Titan embeddings.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire `ttl` seconds after being set.
+
+    Args:
+        maxsize: Maximum number of entries (least recently used go first)
+        ttl: Seconds an entry stays valid
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable):
+        """The cached value, or None if missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    At most one call per key in flight; concurrent callers wait for it.
+
+    `calls` counts calls actually made, `coalesced` the callers that shared
+    one instead.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], object]):
+        """
+        Run `fn()` unless a call for `key` is already running, then share its result.
+
+        Returns:
+            The result of the (possibly shared) call; its exception is raised
+            in every waiting thread
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """`SingleFlight` for coroutines: one task per key, awaited by every caller."""
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable]):
+        """
+        Await `factory()` unless a call for `key` is already running, then share its result.
+
+        Args:
+            key: Identifies duplicate calls
+            factory: Returns the coroutine to run (only called by the first caller)
+        """
+        loop = asyncio.get_running_loop()
+        task = self._tasks.get(key)
+        if task is not None and task.get_loop() is loop and not task.done():
+            self.coalesced += 1
+        else:
+            task = loop.create_task(factory())
+            self._tasks[key] = task
+            self.calls += 1
+            task.add_done_callback(lambda t: self._finished(key, t))
+        # shield: a cancelled caller must not cancel the call for everyone else
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # retrieved, even if every caller has gone away
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
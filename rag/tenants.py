@@ -0,0 +1,316 @@
+"""
+Multi-Tenant Collections
+
+One node, many customers. Each tenant gets a named collection - its own
+`DurableVectorStore` in its own directory - while all of them share one
+embedder (one model in memory, however many tenants):
+
+    data/tenants/
+        acme/        snapshot-00000003/  wal-00000004.log
+        globex/      snapshot-00000001/
+        initech/     ...
+
+Collections are opened lazily on first use and kept in an LRU. When the
+resident collections exceed `memory_budget` bytes, the least recently used
+idle ones are snapshotted and closed; the next request for them reloads from
+disk. Collections currently in use are never evicted.
+
+    manager = CollectionManager(embedder, "data/tenants", memory_budget=2 * 1024**3)
+    manager.upsert("acme", docs)
+    manager.search("acme", "refund policy", top_k=5)
+
+    with manager.use("acme") as store:      # direct access, pinned while inside
+        store.delete(42)
+
+With `models=EmbeddingModelRegistry(...)` (rag/model_registry.py) each
+collection picks its embedding model by name when it is created; the choice
+is stored in `collection.json` next to its data, since every vector in a
+collection must come from the same model:
+
+    manager = CollectionManager(None, "data/tenants", models=registry, default_model="minilm")
+    manager.upsert("acme", docs)                    # minilm
+    manager.upsert("legal", docs, model="mpnet")    # the larger, more accurate model
+"""
+
+import json
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from rag.persistence import DurableVectorStore
+
+
+_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,127}$")
+COLLECTION_META = "collection.json"
+
+
+def check_collection_name(name: str) -> str:
+    """Collection names become directory names, so keep them boring."""
+    if not isinstance(name, str) or not _NAME_PATTERN.match(name):
+        raise ValueError(f"Invalid collection name {name!r}: use letters, digits, '_', '.', '-'")
+    return name
+
+
+class CollectionManager:
+    """
+    Named, isolated vector stores with a shared embedder and a memory budget.
+
+    Args:
+        embedder: Shared by every collection without a model of its own
+                  (may be None when `models` is given)
+        directory: Parent directory; each collection lives in a subdirectory
+        memory_budget: Bytes of resident collections (see `VectorStore.memory_bytes`)
+                       before idle ones are evicted
+        columnar: Store documents column-wise (smaller, and cheap to measure)
+        models: Optional EmbeddingModelRegistry for per-collection models
+        default_model: Registry model for new collections created without one
+                       (None = the shared `embedder`)
+        **store_kwargs: Passed to each `DurableVectorStore` (dtype, fsync, ...)
+    """
+
+    def __init__(self, embedder, directory, memory_budget: int = 1024 ** 3,
+                 columnar: bool = True, models=None, default_model: Optional[str] = None,
+                 **store_kwargs):
+        if embedder is None and (models is None or default_model is None):
+            raise ValueError("Give an embedder, or a model registry and a default_model")
+        self.embedder = embedder
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.memory_budget = memory_budget
+        self.models = models
+        self.default_model = default_model
+        self.store_kwargs = dict(store_kwargs, columnar=columnar)
+
+        self._resident: "OrderedDict[str, DurableVectorStore]" = OrderedDict()
+        self._in_use: Dict[str, int] = {}
+        self._sizes: Dict[str, int] = {}     # last measured memory_bytes() per resident store
+        self._usage = 0                      # running total of _sizes
+        self._open_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------------
+    # Access
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def use(self, name: str, create: bool = False,
+            model: Optional[str] = None) -> Iterator[DurableVectorStore]:
+        """
+        Borrow a collection, loading it if needed; it cannot be evicted while borrowed.
+
+        Args:
+            name: Collection name
+            create: Create the collection if it does not exist yet
+            model: Registry model for a new collection (default: `default_model`);
+                   for an existing one it must match the model it was created with
+
+        Raises:
+            KeyError: The collection does not exist and `create` is False
+            ValueError: `model` differs from the collection's model
+        """
+        check_collection_name(name)
+        if model is not None and name in self and self.model_of(name) != model:
+            raise ValueError(f"Collection {name!r} uses model {self.model_of(name)!r}, "
+                             f"not {model!r}")
+        store = self._acquire(name, create, model)
+        try:
+            yield store
+        finally:
+            self._measure(name, store)  # the only collection that can have changed
+            with self._lock:
+                self._in_use[name] -= 1
+                if not self._in_use[name]:
+                    del self._in_use[name]
+            self._enforce_budget()
+
+    def model_of(self, name: str) -> Optional[str]:
+        """Registry model a collection was created with (None = the shared embedder)."""
+        meta = self.directory / check_collection_name(name) / COLLECTION_META
+        if not meta.exists():
+            return None
+        return json.loads(meta.read_text()).get("model")
+
+    def _embedder_for(self, model: Optional[str]):
+        if model is None:
+            return self.embedder
+        if self.models is None:
+            raise ValueError(f"Model {model!r} requested but no model registry was given")
+        return self.models.embedder(model)
+
+    def _acquire(self, name: str, create: bool,
+                 model: Optional[str] = None) -> DurableVectorStore:
+        with self._lock:
+            store = self._pin_resident(name)
+            if store is not None:
+                self.hits += 1
+                return store
+            open_lock = self._open_locks.setdefault(name, threading.Lock())
+
+        # Open outside the manager lock so other tenants are not blocked by a
+        # slow load; the per-name lock stops two threads loading the same one
+        with open_lock:
+            with self._lock:
+                store = self._pin_resident(name)
+                if store is not None:
+                    self.hits += 1
+                    return store
+            path = self.directory / name
+            exists = path.exists()
+            if not exists and not create:
+                raise KeyError(f"No collection named {name!r}")
+            model = self.model_of(name) if exists else model or self.default_model
+            embedder = self._embedder_for(model)
+            if not exists and model is not None:
+                path.mkdir(parents=True)
+                (path / COLLECTION_META).write_text(json.dumps({"model": model}))
+            store = DurableVectorStore(embedder, path, **self.store_kwargs)
+            with self._lock:
+                self._resident[name] = store
+                self._in_use[name] = self._in_use.get(name, 0) + 1
+                self.loads += 1
+        self._measure(name, store)
+        self._enforce_budget()
+        return store
+
+    def _measure(self, name: str, store: DurableVectorStore):
+        """Update the running memory total with one store's current size."""
+        size = store.memory_bytes()
+        with self._lock:
+            if self._resident.get(name) is store:
+                self._usage += size - self._sizes.get(name, 0)
+                self._sizes[name] = size
+
+    def _pin_resident(self, name: str) -> Optional[DurableVectorStore]:
+        """Mark a resident collection as in use and most recent (caller holds the lock)."""
+        store = self._resident.get(name)
+        if store is not None:
+            self._resident.move_to_end(name)
+            self._in_use[name] = self._in_use.get(name, 0) + 1
+        return store
+
+    def upsert(self, name: str, docs: Iterable[dict], model: Optional[str] = None):
+        """Insert or replace documents, creating the collection (with `model`) if needed."""
+        with self.use(name, create=True, model=model) as store:
+            store.upsert_many(docs)
+
+    def delete(self, name: str, doc_id) -> bool:
+        with self.use(name) as store:
+            return store.delete(doc_id)
+
+    def search(self, name: str, query: str, top_k: int = 2) -> List[Tuple[dict, float]]:
+        with self.use(name) as store:
+            return store.search(query, top_k=top_k)
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def names(self) -> List[str]:
+        """Every collection on disk (resident or not)."""
+        return sorted(p.name for p in self.directory.iterdir()
+                      if p.is_dir() and _NAME_PATTERN.match(p.name))
+
+    def __contains__(self, name: str) -> bool:
+        return (self.directory / check_collection_name(name)).is_dir()
+
+    def resident(self) -> List[str]:
+        """Loaded collections, least recently used first."""
+        with self._lock:
+            return list(self._resident)
+
+    def memory_bytes(self) -> int:
+        """Resident bytes, as measured when each collection was last released."""
+        with self._lock:
+            return self._usage
+
+    def evict(self, name: str) -> bool:
+        """
+        Snapshot and close a resident collection.
+
+        Returns:
+            False if it was not resident or is in use
+        """
+        with self._lock:
+            if name not in self._resident or name in self._in_use:
+                return False
+            open_lock = self._open_locks.setdefault(name, threading.Lock())
+        # Hold the per-name open lock until close() returns, so a concurrent
+        # _acquire() cannot open a second store on the directory meanwhile
+        with open_lock:
+            with self._lock:
+                if name not in self._resident or name in self._in_use:
+                    return False
+                store = self._resident.pop(name)
+                self._usage -= self._sizes.pop(name, 0)
+                self.evictions += 1
+            # Snapshot so the next load reads one file instead of replaying the WAL
+            if store.pending_ops:
+                store.snapshot()
+            store.close()
+        return True
+
+    def _enforce_budget(self):
+        """Evict idle collections, least recently used first, until under budget."""
+        while True:
+            with self._lock:
+                if self._usage <= self.memory_budget:
+                    return
+                victim = next((name for name in self._resident if name not in self._in_use),
+                              None)
+            if victim is None or not self.evict(victim):
+                return  # everything left is in use
+
+    def drop(self, name: str) -> bool:
+        """
+        Delete a collection and its files.
+
+        Raises:
+            RuntimeError: The collection is in use
+        """
+        check_collection_name(name)
+        with self._lock:
+            open_lock = self._open_locks.setdefault(name, threading.Lock())
+        with open_lock:
+            with self._lock:
+                if name in self._in_use:
+                    raise RuntimeError(f"Collection {name!r} is in use")
+                store = self._resident.pop(name, None)
+                self._usage -= self._sizes.pop(name, 0)
+            if store is not None:
+                store.close()
+            path = self.directory / name
+            if not path.exists():
+                return False
+            shutil.rmtree(path)
+            return True
+
+    def close(self):
+        """Snapshot and close every resident collection."""
+        for name in self.resident():
+            self.evict(name)
+
+    def __enter__(self) -> "CollectionManager":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            resident = len(self._resident)
+        return {
+            "collections": len(self.names()),
+            "resident": resident,
+            "memory_bytes": self.memory_bytes(),
+            "memory_budget": self.memory_budget,
+            "loads": self.loads,
+            "hits": self.hits,
+            "evictions": self.evictions,
+        }
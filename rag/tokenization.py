@@ -0,0 +1,283 @@
+"""
+Tokenizer Service: Fast Batched Tokenization, Cached per Chunk
+
+`embedding_internals.py` tokenizes with `AutoTokenizer`, and token budgeting
+tokenizes the same chunks again on every request. `TokenizerService` does it
+once per distinct text:
+
+    service = get_tokenizer_service()          # shared, one per tokenizer name
+    service.count_batch(chunks)                # one Rust call, all cores
+    service.count(chunk)                       # now a dictionary lookup
+
+- Backed by the Rust `tokenizers` library directly (no `transformers`);
+  `encode_batch` runs on every core (`TOKENIZERS_PARALLELISM=true` unless
+  the environment already says otherwise).
+- Token ids are cached per text hash (LRU, `cache_size` texts), so chunking,
+  context packing (`ContextBuilder`), prompt accounting (`PromptLayout`) and
+  index stats all share one tokenization per text.
+- `chunk()` splits a document into windows of at most `max_tokens` tokens,
+  cut between words, and seeds the cache with each chunk's ids: the chunks
+  that are later retrieved and packed are never tokenized again.
+- The tokenizer's own truncation and padding are switched off: counts are
+  for budgeting, and a budget needs the full length.
+
+The service is callable (`text -> token count`), so it can be passed
+anywhere a `count_tokens` function is expected.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+
+DEFAULT_TOKENIZER = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def _key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _mid_word(words: list, index: int) -> bool:
+    """True if token `index` continues the word of the token before it."""
+    return 0 < index < len(words) and words[index] is not None and \
+        words[index] == words[index - 1]
+
+
+class TokenizerService:
+    """
+    Batched fast tokenizer with a token-id cache.
+
+    Args:
+        tokenizer: Hugging Face Hub name, path to a tokenizer.json, or a
+                   `tokenizers.Tokenizer`
+        cache_size: Texts whose token ids are kept (LRU)
+        add_special_tokens: Count [CLS]/[SEP]-style tokens too (off: they are
+                            added once per model input, not per chunk)
+        parallelism: Let the Rust tokenizer use every core
+    """
+
+    def __init__(self, tokenizer=DEFAULT_TOKENIZER, cache_size: int = 50_000,
+                 add_special_tokens: bool = False, parallelism: bool = True):
+        self.name = tokenizer if isinstance(tokenizer, (str, Path)) else \
+            type(tokenizer).__name__
+        self._source = tokenizer
+        self._tokenizer = None
+        self.cache_size = cache_size
+        self.add_special_tokens = add_special_tokens
+        if parallelism:
+            os.environ.setdefault("TOKENIZERS_PARALLELISM", "true")
+        self._cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            with self._load_lock:
+                if self._tokenizer is None:
+                    self._tokenizer = self._load(self._source)
+        return self._tokenizer
+
+    @staticmethod
+    def _load(source):
+        from tokenizers import Tokenizer
+
+        if isinstance(source, (str, Path)):
+            tokenizer = (Tokenizer.from_file(str(source)) if Path(source).is_file()
+                         else Tokenizer.from_pretrained(str(source)))
+        else:
+            tokenizer = source
+        tokenizer.no_truncation()
+        tokenizer.no_padding()
+        return tokenizer
+
+    # ------------------------------------------------------------------
+    # Cache
+    # ------------------------------------------------------------------
+
+    def _lookup(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                ids = self._cache.get(key)
+                if ids is not None:
+                    self._cache.move_to_end(key)
+                    found[key] = ids
+        return found
+
+    def _store(self, items: Iterable):
+        with self._lock:
+            for key, ids in items:
+                self._cache[key] = ids
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # Tokenization
+    # ------------------------------------------------------------------
+
+    def encode_batch(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        Token ids for each text; only texts not in the cache are tokenized,
+        in one parallel batch.
+
+        Returns:
+            One uint32 array per text (shared with the cache: do not modify)
+        """
+        keys = [_key(text) for text in texts]
+        found = self._lookup(keys)
+        missing: Dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        with self._lock:
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        if missing:
+            encodings = self.tokenizer.encode_batch(list(missing.values()),
+                                                    add_special_tokens=self.add_special_tokens)
+            fresh = {key: np.asarray(encoding.ids, dtype=np.uint32)
+                     for key, encoding in zip(missing, encodings)}
+            for ids in fresh.values():
+                ids.flags.writeable = False
+            self._store(fresh.items())
+            found.update(fresh)
+            with self._lock:
+                self.batches += 1
+        return [found[key] for key in keys]
+
+    def ids(self, text: str) -> np.ndarray:
+        return self.encode_batch([text])[0]
+
+    def count_batch(self, texts: List[str]) -> List[int]:
+        return [len(ids) for ids in self.encode_batch(texts)]
+
+    def count(self, text: str) -> int:
+        return len(self.ids(text))
+
+    def __call__(self, text: str) -> int:
+        return self.count(text)
+
+    def chunk(self, text: str, max_tokens: int, overlap: int = 0) -> List[str]:
+        """
+        Split a text into chunks of at most `max_tokens` tokens, cut between words.
+
+        A word longer than a whole chunk (a URL, a base64 blob) is cut inside
+        the word at `max_tokens`. Each chunk's token ids (a slice of the
+        document's) go into the cache.
+
+        Args:
+            text: Document text
+            max_tokens: Tokens per chunk
+            overlap: Tokens repeated at the start of the next chunk (roughly,
+                     rounded to a word start)
+
+        Returns:
+            Chunk texts, in order (just `[text]` if it already fits - including
+            empty or whitespace-only text)
+        """
+        return [piece for piece, _ in self._chunk(text, max_tokens, overlap)]
+
+    def _chunk(self, text: str, max_tokens: int, overlap: int) -> List[tuple]:
+        """`chunk()` as (piece, token ids) pairs."""
+        if overlap >= max_tokens:
+            raise ValueError("overlap must be smaller than max_tokens")
+        encoding = self.tokenizer.encode(text, add_special_tokens=False)
+        ids = np.asarray(encoding.ids, dtype=np.uint32)
+        if len(ids) <= max_tokens:
+            ids.flags.writeable = False
+            self._store([(_key(text), ids)])
+            return [(text, ids)]
+
+        words, offsets = encoding.word_ids, encoding.offsets
+
+        def word_start(index: int, floor: int) -> int:
+            """Back `index` up to its word's first token, unless that is at or before `floor`."""
+            cut = index
+            while cut > floor and words[cut] is not None and words[cut] == words[cut - 1]:
+                cut -= 1
+            return cut if cut > floor else index
+
+        chunks, inside_word = [], []
+        start = 0
+        while start < len(ids):
+            end = min(start + max_tokens, len(ids))
+            if end < len(ids):
+                # Move back to the first token of the word being cut; a word
+                # longer than the whole chunk (URL, base64, ...) is cut hard
+                end = word_start(end, start)
+            piece = text[offsets[start][0]:offsets[end - 1][1]]
+            piece_ids = ids[start:end]
+            piece_ids.flags.writeable = False
+            chunks.append((piece, piece_ids))
+            inside_word.append(_mid_word(words, start) or _mid_word(words, end))
+            if end >= len(ids):
+                break
+            start = word_start(max(end - overlap, start + 1), start)
+        self._store((_key(piece), piece_ids) for (piece, piece_ids), cut in
+                    zip(chunks, inside_word) if not cut)
+        # A piece cut inside a word tokenizes differently on its own: use its own ids
+        hard = [number for number, cut in enumerate(inside_word) if cut]
+        for number, piece_ids in zip(hard, self.encode_batch([chunks[n][0] for n in hard])):
+            chunks[number] = (chunks[number][0], piece_ids)
+        return chunks
+
+    def stats(self) -> dict:
+        with self._lock:
+            cached = len(self._cache)
+        return {"tokenizer": str(self.name), "cached": cached, "hits": self.hits,
+                "misses": self.misses, "batches": self.batches}
+
+
+def chunk_documents(docs: Iterable[dict], max_tokens: int,
+                    service: Optional[TokenizerService] = None,
+                    overlap: int = 0, stats: Optional[dict] = None) -> Iterator[dict]:
+    """
+    Split documents longer than `max_tokens` into chunk documents.
+
+    A document that fits keeps its id; a split one becomes `"{id}#{n}"`
+    chunks with `parent` and `chunk` in their metadata.
+
+    Args:
+        stats: Optional dict updated as documents go by: `documents` (in),
+               `chunks` (out) and `tokens` (in the chunks), counted from the
+               ids chunking produced - nothing is tokenized twice
+    """
+    service = service or get_tokenizer_service()
+    if stats is not None:
+        for field in ("documents", "chunks", "tokens"):
+            stats.setdefault(field, 0)
+    for doc in docs:
+        pieces = service._chunk(doc["content"], max_tokens, overlap)
+        if stats is not None:
+            stats["documents"] += 1
+            stats["chunks"] += len(pieces)
+            stats["tokens"] += sum(len(ids) for _, ids in pieces)
+        if len(pieces) == 1:
+            yield doc
+            continue
+        for number, (piece, _) in enumerate(pieces):
+            yield {"id": f"{doc['id']}#{number}", "content": piece,
+                   "metadata": dict(doc.get("metadata") or {}, parent=doc["id"], chunk=number)}
+
+
+_services: Dict[str, TokenizerService] = {}
+_services_lock = threading.Lock()
+
+
+def get_tokenizer_service(name: str = DEFAULT_TOKENIZER) -> TokenizerService:
+    """The process-wide service for a tokenizer, so every component shares its cache."""
+    with _services_lock:
+        service = _services.get(name)
+        if service is None:
+            service = _services[name] = TokenizerService(name)
+        return service
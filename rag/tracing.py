@@ -0,0 +1,452 @@
+"""
+Per-Stage Latency Tracing
+
+Answers "where does the time go?" for each RAG request:
+
+    rag_query                       41.2 ms
+    ├── embed                        8.1 ms
+    ├── search                       2.3 ms
+    ├── filter                       0.1 ms
+    ├── rerank                       0.0 ms
+    ├── context_build                0.6 ms
+    └── generate                    30.1 ms
+
+Usage:
+
+    tracer = Tracer(exporters=[PrometheusExporter()])
+    with tracer.span("rag_query"):
+        with tracer.span("search", top_k=5):
+            ...
+
+- Disabled tracers (the default, see `get_tracer()`) hand out one shared
+  no-op span, so instrumented code costs an attribute check and a call.
+- Spans nest through a ContextVar: asyncio tasks and `asyncio.to_thread()`
+  inherit the current span. A plain `ThreadPoolExecutor.submit()` or
+  `loop.run_in_executor()` does not, so hand work to a pool with
+  `contextvars.copy_context().run` (as `AsyncRAGPipeline` does), or spans
+  opened there start new traces.
+- Exporters receive each finished trace: OpenTelemetry-style JSON
+  (`OTelJsonExporter`) or Prometheus histograms (`PrometheusExporter`).
+- With `slow_threshold_ms` set, one shared sampling profiler per tracer
+  records the stack of any request still running after that long; the
+  collapsed stacks are attached to the trace (and passed to `on_slow`).
+- Durations use the monotonic `perf_counter_ns()` clock; wall-clock (Unix)
+  times are derived from one anchor per trace, only for export.
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_span: ContextVar[Optional[object]] = ContextVar("rag_current_span", default=None)
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+# ============================================================================
+# Spans and Traces
+# ============================================================================
+
+class _NoopSpan:
+    """Returned when tracing is off or the request was not sampled."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _UnsampledRoot:
+    """Marks a request that lost the sampling draw so its children are no-ops too."""
+
+    __slots__ = ("_token",)
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _current_span.reset(self._token)
+
+
+class Trace:
+    """All spans of one request."""
+
+    __slots__ = ("trace_id", "spans", "root", "profile", "epoch_ns", "origin_ns", "_profiled")
+
+    def __init__(self):
+        self.trace_id = _new_id(16)
+        self.spans: List["Span"] = []
+        self.root: Optional["Span"] = None
+        self.profile: Optional[Dict[str, int]] = None
+        # Wall clock and monotonic clock read together: spans are timed with
+        # the monotonic one and mapped to Unix time only when exported
+        self.epoch_ns = time.time_ns()
+        self.origin_ns = time.perf_counter_ns()
+        self._profiled = False
+
+    def unix_ns(self, perf_ns: int) -> int:
+        """Unix time (ns) of a `perf_counter_ns()` reading taken during this trace."""
+        return self.epoch_ns + (perf_ns - self.origin_ns)
+
+    @property
+    def duration_ms(self) -> float:
+        return self.root.duration_ms if self.root else 0.0
+
+    def stage_durations(self) -> Dict[str, float]:
+        """Total milliseconds per span name."""
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration_ms
+        return totals
+
+
+class Span:
+    """One timed stage. Use as a context manager (`start_ns`/`end_ns` are `perf_counter_ns()`)."""
+
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes",
+                 "error", "trace", "_tracer", "_token")
+
+    def __init__(self, tracer: "Tracer", trace: Trace, name: str,
+                 parent: Optional["Span"], attributes: dict):
+        self._tracer = tracer
+        self.trace = trace
+        self.name = name
+        self.span_id = _new_id(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = attributes
+        self.start_ns = 0
+        self.end_ns = 0
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        if self.parent_id is None:
+            self._tracer._trace_started(self.trace)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.perf_counter_ns()
+        if exc_type is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self.trace.spans.append(self)
+        if self.parent_id is None:
+            self._tracer._trace_finished(self.trace)
+        return None
+
+
+# ============================================================================
+# Tracer
+# ============================================================================
+
+class Tracer:
+    """
+    Creates spans and hands finished traces to exporters.
+
+    Args:
+        enabled: False makes every span a shared no-op
+        sample_rate: Fraction of requests (root spans) to trace
+        exporters: Objects with `export(trace)`
+        slow_threshold_ms: Start the sampling profiler for requests running
+                           longer than this (None = never profile)
+        profile_interval_ms: Time between profiler samples
+        on_slow: Called with the trace of every request over the threshold
+    """
+
+    def __init__(self, enabled: bool = True, sample_rate: float = 1.0,
+                 exporters: Iterable = (), slow_threshold_ms: Optional[float] = None,
+                 profile_interval_ms: float = 5.0,
+                 on_slow: Optional[Callable[[Trace], None]] = None):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.exporters = list(exporters)
+        self.slow_threshold_ms = slow_threshold_ms
+        self.profile_interval_ms = profile_interval_ms
+        self.on_slow = on_slow
+        self._profiler: Optional[SamplingProfiler] = None
+        self._profiler_lock = threading.Lock()
+
+    def span(self, name: str, **attributes):
+        """Start a span (a new trace if there is no active span)."""
+        if not self.enabled:
+            return NOOP_SPAN
+        parent = _current_span.get()
+        if parent is None:
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return _UnsampledRoot()
+            return Span(self, Trace(), name, None, attributes)
+        if not isinstance(parent, Span):
+            return NOOP_SPAN
+        return Span(self, parent.trace, name, parent, attributes)
+
+    @property
+    def profiler(self) -> "SamplingProfiler":
+        """The shared sampler for slow requests (started on first use)."""
+        if self._profiler is None:
+            with self._profiler_lock:
+                if self._profiler is None:
+                    self._profiler = SamplingProfiler(interval_ms=self.profile_interval_ms)
+        return self._profiler
+
+    def _trace_started(self, trace: Trace):
+        if self.slow_threshold_ms is not None:
+            self.profiler.track(trace, threading.get_ident(), self.slow_threshold_ms)
+            trace._profiled = True
+
+    def _trace_finished(self, trace: Trace):
+        trace.root = trace.spans[-1]
+        if trace._profiled:
+            samples = self._profiler.untrack(trace)
+            trace._profiled = False
+            if samples:
+                trace.profile = samples
+        if (self.slow_threshold_ms is not None and self.on_slow is not None
+                and trace.duration_ms >= self.slow_threshold_ms):
+            self.on_slow(trace)
+        for exporter in self.exporters:
+            exporter.export(trace)
+
+
+_default_tracer = Tracer(enabled=False)
+
+
+def get_tracer() -> Tracer:
+    """The process-wide tracer (disabled until `set_tracer()` is called)."""
+    return _default_tracer
+
+
+def set_tracer(tracer: Tracer):
+    """Install the process-wide tracer used when none is passed explicitly."""
+    global _default_tracer
+    _default_tracer = tracer
+
+
+# ============================================================================
+# Sampling Profiler (for slow requests)
+# ============================================================================
+
+class SamplingProfiler:
+    """
+    One sampler thread for all in-flight requests.
+
+    `track()` registers a request (its thread and a delay) - a dictionary
+    insert, so fast requests cost next to nothing. Every `interval_ms` the
+    thread samples the stacks of the requests that have been running longer
+    than their delay. Samples are "collapsed stacks" (`outer;inner;leaf ->
+    count`), the input format of flame graph tools. The thread sleeps while
+    nothing is tracked.
+    """
+
+    def __init__(self, interval_ms: float = 5.0):
+        self.interval = interval_ms / 1000
+        self._active: Dict[object, tuple] = {}   # key -> (thread id, due time, Counter)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def track(self, key, thread_id: int, delay_ms: float = 0.0):
+        """Start profiling `thread_id` for `key` once `delay_ms` has passed."""
+        with self._lock:
+            self._active[key] = (thread_id, time.perf_counter() + delay_ms / 1000, Counter())
+            if self._thread is None:
+                self._stop = threading.Event()  # one per thread, so stop() then track() works
+                self._thread = threading.Thread(target=self._run, args=(self._stop,),
+                                                name="rag-sampling-profiler", daemon=True)
+                self._thread.start()
+            self._wake.set()
+
+    def untrack(self, key) -> Dict[str, int]:
+        """Stop profiling `key` and return its collapsed stacks."""
+        with self._lock:
+            entry = self._active.pop(key, None)
+        return dict(entry[2]) if entry else {}
+
+    @property
+    def active(self) -> int:
+        return len(self._active)
+
+    def _run(self, stop: threading.Event):
+        while True:
+            # The wake event is set and cleared under the lock, so a track()
+            # or stop() cannot slip in between the checks and the clear
+            with self._lock:
+                if stop.is_set():
+                    return
+                if not self._active:
+                    self._wake.clear()
+                entries = list(self._active.values())
+            if not entries:
+                self._wake.wait()
+                continue
+            now = time.perf_counter()
+            due = [(thread_id, samples) for thread_id, at, samples in entries if now >= at]
+            if due:
+                frames = sys._current_frames()
+                stacks: Dict[int, str] = {}
+                for thread_id, samples in due:
+                    if thread_id not in stacks:
+                        stacks[thread_id] = self._collapse(frames.get(thread_id))
+                    if stacks[thread_id]:
+                        samples[stacks[thread_id]] += 1
+            stop.wait(self.interval)
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def stop(self):
+        """Stop the sampler thread."""
+        with self._lock:
+            self._stop.set()
+            self._wake.set()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+
+# ============================================================================
+# Exporters
+# ============================================================================
+
+class InMemoryExporter:
+    """Keep finished traces in a list (tests, notebooks)."""
+
+    def __init__(self):
+        self.traces: List[Trace] = []
+
+    def export(self, trace: Trace):
+        self.traces.append(trace)
+
+
+def to_otel(trace: Trace, service_name: str = "rag-learning") -> dict:
+    """Convert a trace to the OpenTelemetry (OTLP/JSON) span layout."""
+    spans = []
+    for span in trace.spans:
+        attributes = [{"key": k, "value": {"stringValue": str(v)}}
+                      for k, v in span.attributes.items()]
+        otel_span = {
+            "traceId": trace.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "startTimeUnixNano": str(trace.unix_ns(span.start_ns)),
+            "endTimeUnixNano": str(trace.unix_ns(span.end_ns)),
+            "attributes": attributes,
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            otel_span["parentSpanId"] = span.parent_id
+        spans.append(otel_span)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name",
+                                         "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{"scope": {"name": "rag.tracing"}, "spans": spans}],
+        }]
+    }
+
+
+class OTelJsonExporter:
+    """
+    Write each trace as one OTLP/JSON line, ready for an OpenTelemetry
+    collector's file receiver (or any JSON log pipeline).
+    """
+
+    def __init__(self, path, service_name: str = "rag-learning"):
+        self.path = path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace):
+        line = json.dumps(to_otel(trace, self.service_name))
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+class PrometheusExporter:
+    """
+    Aggregate span durations into one Prometheus histogram labelled by stage.
+
+    `render()` returns the text exposition format, e.g. to serve on /metrics.
+    """
+
+    def __init__(self, metric_name: str = "rag_stage_duration_seconds",
+                 buckets=DEFAULT_BUCKETS):
+        self.metric_name = metric_name
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counts: Dict[str, List[int]] = {}
+        self._sums: Dict[str, float] = {}
+
+    def export(self, trace: Trace):
+        with self._lock:
+            for span in trace.spans:
+                self._observe(span.name, span.duration_ms / 1000)
+
+    def observe(self, stage: str, seconds: float):
+        """Record one duration for `stage` (e.g. a stage timed outside a trace)."""
+        with self._lock:
+            self._observe(stage, seconds)
+
+    def _observe(self, stage: str, seconds: float):
+        counts = self._counts.setdefault(stage, [0] * (len(self.buckets) + 1))
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        self._sums[stage] = self._sums.get(stage, 0.0) + seconds
+
+    def render(self) -> str:
+        name = self.metric_name
+        lines = [f"# HELP {name} Time spent in each RAG pipeline stage.",
+                 f"# TYPE {name} histogram"]
+        with self._lock:
+            for stage in sorted(self._counts):
+                cumulative = 0
+                for bound, count in zip(self.buckets, self._counts[stage]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                total = cumulative + self._counts[stage][-1]
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {total}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {self._sums[stage]:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {total}')
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,447 @@
+"""
+Mutable In-Memory Vector Store
+
+The production version of `SimpleVectorDB` / `VectorDB` from lesson 1.
+Same `add_document()` / `search()` interface, plus what a changing catalog
+needs:
+
+- upsert(doc)     -> insert or replace a document by its `id`
+- delete(doc_id)  -> remove a document by its `id`
+- compact()       -> reclaim the rows left behind by updates and deletes
+
+How updates work (append-only rows + tombstones):
+
+    rows:       [doc1] [doc2] [doc3] [doc2']
+    tombstones: [ 0  ] [ 1  ] [ 0  ] [ 0   ]     <- doc2 was updated
+    id -> row:  {1: 0, 2: 3, 3: 2}
+
+Rows are never rewritten in place. An update appends a new row and marks the
+old one dead in the tombstone bitmap; search skips dead rows. Compaction
+copies the live rows into a fresh segment and swaps it in with a single
+reference assignment, so readers are never blocked - a search that started
+on the old segment simply finishes on it.
+
+Rows can be stored as float16 or bfloat16 (`dtype=`) to halve memory; scores
+are still accumulated in float32 (see rag.scoring). With `columnar=True` the
+documents themselves are kept column by column (see rag.docstore) and search
+returns lightweight `DocumentView`s instead of the original dicts.
+"""
+
+import sys
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from rag.docstore import DocumentColumns
+from rag.scoring import blocked_top_k, check_dtype, numpy_dtype, to_float32, to_storage
+
+
+# Rough memory of one lesson 1 document dict with a short chunk of text
+# (see benchmarks/docstore_memory.py)
+_DICT_DOCUMENT_BYTES = 768
+
+
+class _Segment:
+    """
+    One generation of rows. Replaced (never mutated in bulk) by compaction.
+
+    The id -> row map lives here too, so a reader that grabs one segment
+    reference always pairs row numbers with the documents they index.
+    """
+
+    __slots__ = ("embeddings", "tombstones", "ids", "documents", "size", "id_to_row")
+
+    def __init__(self, embeddings: np.ndarray, tombstones: np.ndarray,
+                 ids: list, documents, size: int, id_to_row: Optional[dict] = None):
+        self.embeddings = embeddings
+        self.tombstones = tombstones
+        self.ids = ids
+        self.documents = documents
+        self.size = size
+        self.id_to_row: Dict[object, int] = {} if id_to_row is None else id_to_row
+
+    @property
+    def capacity(self) -> int:
+        return self.embeddings.shape[0]
+
+
+class VectorStore:
+    """
+    In-memory vector store with upsert/delete by document id.
+
+    Documents use the lesson 1 format:
+        {"id": 1, "content": "...", "metadata": {...}}
+
+    Args:
+        embedder: Object with `encode(texts) -> np.ndarray` (see rag.embeddings)
+        initial_capacity: Rows to pre-allocate before the first resize
+        compaction_threshold: Dead-row fraction at which `maybe_compact()` runs
+        dtype: Embedding storage - "float32", "float16" or "bfloat16"
+        columnar: Store documents in a DocumentColumns instead of a list of dicts
+    """
+
+    def __init__(self, embedder, initial_capacity: int = 1024,
+                 compaction_threshold: float = 0.25, dtype: str = "float32",
+                 columnar: bool = False):
+        self.embedder = embedder
+        self.initial_capacity = max(1, initial_capacity)
+        self.compaction_threshold = compaction_threshold
+        self.dtype = check_dtype(dtype)
+        self._storage_dtype = numpy_dtype(dtype)
+        self.columnar = columnar
+
+        self._segment: Optional[_Segment] = None
+        self._dead = 0
+        self._write_lock = threading.Lock()
+        self._compaction_lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+        self._compactor_stop = threading.Event()
+
+        # Bumped on every change; caches keyed on search results watch this
+        self.version = 0
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def add_document(self, doc: dict):
+        """Add a document (an existing `id` is replaced, same as upsert)."""
+        self.upsert(doc)
+
+    def add_documents(self, docs: Iterable[dict]):
+        """Add many documents, embedding them in a single batch."""
+        self.upsert_many(docs)
+
+    def upsert(self, doc: dict):
+        """Insert a document, or replace the stored one with the same `id`."""
+        self.upsert_many([doc])
+
+    def upsert_many(self, docs: Iterable[dict]):
+        """
+        Insert or replace a batch of documents.
+
+        Embedding happens before the write lock is taken, so concurrent
+        writers only serialize on the cheap bookkeeping.
+        """
+        docs = list(docs)
+        if not docs:
+            return
+        for doc in docs:
+            if "id" not in doc or "content" not in doc:
+                raise ValueError("Documents need an 'id' and a 'content' field")
+
+        embeddings = np.asarray(self.embedder.encode([d["content"] for d in docs]),
+                                dtype=np.float32)
+        self._apply_upserts(docs, embeddings)
+
+    def upsert_embedded(self, docs: List[dict], embeddings: np.ndarray):
+        """
+        Insert or replace documents whose embeddings are already computed.
+
+        Used when bootstrapping from exported embeddings, so nothing is
+        re-embedded.
+
+        Args:
+            docs: Documents, same order as `embeddings`
+            embeddings: Matrix of shape (len(docs), dim)
+        """
+        docs = list(docs)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if len(docs) != len(embeddings):
+            raise ValueError(f"Got {len(docs)} documents but {len(embeddings)} embeddings")
+        if docs:
+            self._apply_upserts(docs, embeddings)
+
+    def delete(self, doc_id) -> bool:
+        """
+        Delete a document by id.
+
+        Returns:
+            True if the document existed
+        """
+        with self._write_lock:
+            seg = self._segment
+            row = None if seg is None else seg.id_to_row.get(doc_id)
+            if row is None:
+                return False
+            self._log_delete(doc_id)
+            del seg.id_to_row[doc_id]
+            seg.tombstones[row] = True
+            self._dead += 1
+            self.version += 1
+            return True
+
+    def _apply_upserts(self, docs: List[dict], embeddings: np.ndarray):
+        """Append rows for already-embedded documents and tombstone old versions."""
+        with self._write_lock:
+            seg = self._reserve(len(docs), embeddings.shape[1])
+            self._log_upserts(docs, embeddings)
+            for doc, embedding in zip(docs, to_storage(embeddings, self.dtype)):
+                row = seg.size
+                seg.embeddings[row] = embedding
+                seg.tombstones[row] = False
+                seg.ids.append(doc["id"])
+                seg.documents.append(doc)
+                # Publish the row before tombstoning the old version, so a
+                # concurrent reader sees at least one copy of the document
+                seg.size = row + 1
+
+                old_row = seg.id_to_row.get(doc["id"])
+                if old_row is not None:
+                    seg.tombstones[old_row] = True
+                    self._dead += 1
+                seg.id_to_row[doc["id"]] = row
+            self.version += 1
+
+    def _log_upserts(self, docs: List[dict], embeddings: np.ndarray):
+        """Hook run under the write lock before upserts apply (see DurableVectorStore)."""
+
+    def _log_delete(self, doc_id):
+        """Hook run under the write lock before a delete applies."""
+
+    def _reserve(self, extra: int, dim: int) -> _Segment:
+        """Return a segment with room for `extra` more rows (caller holds the lock)."""
+        seg = self._segment
+        if seg is None:
+            capacity = max(self.initial_capacity, extra)
+            documents = DocumentColumns(capacity) if self.columnar else []
+            seg = _Segment(np.zeros((capacity, dim), dtype=self._storage_dtype),
+                           np.zeros(capacity, dtype=bool), [], documents, 0)
+            self._segment = seg
+            return seg
+
+        if seg.embeddings.shape[1] != dim:
+            raise ValueError(
+                f"Embedding dimension {dim} does not match store dimension "
+                f"{seg.embeddings.shape[1]}"
+            )
+        if seg.size + extra <= seg.capacity:
+            return seg
+
+        # Grow geometrically. Rows below seg.size are copied unchanged, so a
+        # reader still holding the old segment sees the same data.
+        capacity = max(seg.capacity * 2, seg.size + extra)
+        embeddings = np.zeros((capacity, dim), dtype=self._storage_dtype)
+        embeddings[:seg.size] = seg.embeddings[:seg.size]
+        tombstones = np.zeros(capacity, dtype=bool)
+        tombstones[:seg.size] = seg.tombstones[:seg.size]
+        grown = _Segment(embeddings, tombstones, seg.ids, seg.documents, seg.size,
+                         seg.id_to_row)
+        self._segment = grown
+        return grown
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def search(self, query: str, top_k: int = 2) -> List[Tuple[dict, float]]:
+        """
+        Search for documents similar to the query.
+
+        Args:
+            query: Search query
+            top_k: Number of results to return
+
+        Returns:
+            List of (document, similarity_score) tuples, best first
+        """
+        query_embedding = np.asarray(self.embedder.encode([query]), dtype=np.float32)[0]
+        return self.search_by_vector(query_embedding, top_k)
+
+    def search_by_vector(self, query_embedding: np.ndarray,
+                         top_k: int = 2) -> List[Tuple[dict, float]]:
+        """Same as `search()` but with an already-computed query embedding."""
+        seg = self._segment
+        if seg is None or top_k <= 0:
+            return []
+        n = seg.size
+        if n == 0:
+            return []
+
+        # Streams over the rows in blocks; only the final k hits become
+        # Python objects
+        rows, scores = blocked_top_k(seg.embeddings, query_embedding, top_k, self.dtype,
+                                     rows=n, dead=seg.tombstones)
+        return [(seg.documents[row], score) for row, score in zip(rows.tolist(), scores.tolist())]
+
+    def export(self) -> Tuple[np.ndarray, List[dict]]:
+        """
+        Copy out the live rows.
+
+        Returns:
+            (embeddings, documents) - one float32 embedding row per document
+        """
+        with self._write_lock:
+            seg, live_rows = self._live_rows()
+        if seg is None:
+            return np.zeros((0, 0), dtype=np.float32), []
+        return self._rows_float32(seg, live_rows), self._plain_documents(seg, live_rows)
+
+    def _rows_float32(self, seg: _Segment, rows: np.ndarray) -> np.ndarray:
+        """Copy of the given rows widened to float32."""
+        return to_float32(seg.embeddings[rows], self.dtype)
+
+    @staticmethod
+    def _plain_documents(seg: _Segment, rows: np.ndarray) -> List[dict]:
+        """The given rows' documents as plain (JSON-serializable) dicts."""
+        if isinstance(seg.documents, DocumentColumns):
+            return seg.documents.to_dicts(rows.tolist())
+        return [seg.documents[i] for i in rows]
+
+    def _live_rows(self) -> Tuple[Optional[_Segment], np.ndarray]:
+        """
+        Current segment and its live row numbers (caller holds the write lock).
+
+        Rows below the captured size never change, so the caller may copy
+        them after releasing the lock.
+        """
+        seg = self._segment
+        if seg is None:
+            return None, np.zeros(0, dtype=np.int64)
+        return seg, np.flatnonzero(~seg.tombstones[:seg.size])
+
+    def get(self, doc_id) -> Optional[dict]:
+        """Return the stored document with this id, or None."""
+        seg = self._segment
+        row = None if seg is None else seg.id_to_row.get(doc_id)
+        if row is None:
+            return None
+        return seg.documents[row]
+
+    def __contains__(self, doc_id) -> bool:
+        seg = self._segment
+        return seg is not None and doc_id in seg.id_to_row
+
+    def __len__(self) -> int:
+        seg = self._segment
+        return 0 if seg is None else len(seg.id_to_row)
+
+    @property
+    def dim(self) -> Optional[int]:
+        return None if self._segment is None else self._segment.embeddings.shape[1]
+
+    @property
+    def dead_ratio(self) -> float:
+        """Fraction of stored rows that are tombstoned."""
+        seg = self._segment
+        if seg is None or seg.size == 0:
+            return 0.0
+        return self._dead / seg.size
+
+    def memory_bytes(self) -> int:
+        """
+        Approximate bytes held by the rows (embeddings, tombstones, documents).
+
+        Exact for the arrays and for columnar documents; for a list of dicts
+        it is a rough per-document estimate (dict + content + metadata).
+        """
+        seg = self._segment
+        if seg is None:
+            return 0
+        total = seg.embeddings.nbytes + seg.tombstones.nbytes
+        if isinstance(seg.documents, DocumentColumns):
+            return total + seg.documents.nbytes
+        return total + sys.getsizeof(seg.documents) + seg.size * _DICT_DOCUMENT_BYTES
+
+    def stats(self) -> dict:
+        """Row counts for monitoring."""
+        seg = self._segment
+        return {
+            "live": len(self),
+            "dead": self._dead,
+            "rows": 0 if seg is None else seg.size,
+            "capacity": 0 if seg is None else seg.capacity,
+            "dtype": self.dtype,
+            "embedding_bytes": 0 if seg is None else seg.embeddings.nbytes,
+            "version": self.version,
+        }
+
+    # ------------------------------------------------------------------
+    # Compaction
+    # ------------------------------------------------------------------
+
+    def compact(self) -> int:
+        """
+        Copy live rows into a fresh segment and drop the dead ones.
+
+        The copy happens outside the write lock; only the final merge of rows
+        written during the copy holds it. Readers never wait.
+
+        Returns:
+            Number of rows reclaimed
+        """
+        with self._compaction_lock:
+            with self._write_lock:
+                seg = self._segment
+                if seg is None or self._dead == 0:
+                    return 0
+                snap_size = seg.size
+                live_rows = np.flatnonzero(~seg.tombstones[:snap_size])
+
+            # The expensive part: rows below snap_size are immutable
+            live_embeddings = seg.embeddings[live_rows]
+            live_ids = [seg.ids[i] for i in live_rows]
+            if isinstance(seg.documents, DocumentColumns):
+                live_docs = seg.documents.take(live_rows)
+            else:
+                live_docs = [seg.documents[i] for i in live_rows]
+
+            with self._write_lock:
+                current = self._segment
+                tail_size = current.size - snap_size
+                size = len(live_rows) + tail_size
+                capacity = max(self.initial_capacity, size * 2)
+                dim = current.embeddings.shape[1]
+
+                embeddings = np.zeros((capacity, dim), dtype=self._storage_dtype)
+                embeddings[:len(live_rows)] = live_embeddings
+                embeddings[len(live_rows):size] = current.embeddings[snap_size:current.size]
+
+                # Rows deleted while we were copying stay tombstoned
+                tombstones = np.zeros(capacity, dtype=bool)
+                tombstones[:len(live_rows)] = current.tombstones[live_rows]
+                tombstones[len(live_rows):size] = current.tombstones[snap_size:current.size]
+
+                ids = live_ids + current.ids[snap_size:current.size]
+                if isinstance(live_docs, DocumentColumns):
+                    live_docs.extend(current.documents.to_dict(row)
+                                     for row in range(snap_size, current.size))
+                    documents = live_docs
+                else:
+                    documents = live_docs + current.documents[snap_size:current.size]
+
+                reclaimed = current.size - size
+                id_to_row = {doc_id: row for row, doc_id in enumerate(ids)
+                             if not tombstones[row]}
+                self._dead = int(tombstones[:size].sum())
+                # One reference swap: readers see the old rows + map or the new ones
+                self._segment = _Segment(embeddings, tombstones, ids, documents, size, id_to_row)
+                return reclaimed
+
+    def maybe_compact(self) -> int:
+        """Compact only if the dead-row fraction has reached the threshold."""
+        if self._dead and self.dead_ratio >= self.compaction_threshold:
+            return self.compact()
+        return 0
+
+    def start_compactor(self, interval: float = 1.0):
+        """Run `maybe_compact()` every `interval` seconds in a daemon thread."""
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor_stop.clear()
+
+        def loop():
+            while not self._compactor_stop.wait(interval):
+                self.maybe_compact()
+
+        self._compactor = threading.Thread(target=loop, name="vector-store-compactor",
+                                           daemon=True)
+        self._compactor.start()
+
+    def stop_compactor(self):
+        """Stop the background compactor started by `start_compactor()`."""
+        self._compactor_stop.set()
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
@@ -0,0 +1,200 @@
+"""
+Warm-Up for Known FAQ Queries
+
+The lesson scripts ask the same questions every run:
+
+    "How do I return a product?"
+    "What payment methods do you accept?"
+    "How can I contact support?"
+
+Real deployments have the same pattern - a fixed FAQ set that makes up a big
+share of traffic. QueryWarmCache precomputes, at startup, the embedding and
+top-k results of every FAQ query and pins them in memory. A request for one
+of those queries becomes a hash lookup: no embedding, no scan.
+
+When the store changes (its `version` moves), a background thread recomputes
+the pinned results from the pinned embeddings - no re-embedding needed. Until
+that finishes, lookups fall back to searching with the pinned embedding, so
+stale results are never served.
+
+Pinned embeddings can be saved to and loaded from a snapshot file, so a
+restart does not re-embed the FAQ set either.
+"""
+
+import hashlib
+import json
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form used as the lookup key."""
+    return " ".join(query.lower().split())
+
+
+def _query_key(query: str) -> bytes:
+    return hashlib.blake2b(normalize_query(query).encode("utf-8"), digest_size=16).digest()
+
+
+class QueryWarmCache:
+    """
+    Pinned embeddings and top-k results for a known query set.
+
+    Exposes `search(query, top_k)`, so it can be used in place of the store
+    (e.g. `rag_query(question, warm_cache, builder)`); unknown queries go to
+    the store as usual.
+
+    Args:
+        store: VectorStore (needs `embedder`, `search_by_vector`, `version`)
+        top_k: Results pinned per query (larger requests go to the store)
+    """
+
+    def __init__(self, store, top_k: int = 5):
+        self.store = store
+        self.top_k = top_k
+        self._queries: List[str] = []
+        self._embeddings: Optional[np.ndarray] = None
+        self._rows: Dict[bytes, int] = {}
+        self._results: List[List[Tuple[dict, float]]] = []
+        self._results_version: Optional[int] = None
+        self._generation = 0  # bumped whenever the pinned query set changes
+        self._lock = threading.Lock()
+        self._refresher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    # Warm-up
+    # ------------------------------------------------------------------
+
+    def warm(self, queries: Iterable[str], embeddings: Optional[np.ndarray] = None):
+        """
+        Pin a query set.
+
+        Args:
+            queries: FAQ queries
+            embeddings: Their embeddings, if already known (e.g. from a
+                        snapshot); otherwise they are computed in one batch
+        """
+        unique: Dict[bytes, str] = {}
+        for query in queries:
+            unique.setdefault(_query_key(query), query)
+        queries = list(unique.values())
+
+        if embeddings is None:
+            embeddings = self.store.embedder.encode(queries) if queries else np.zeros((0, 0))
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if len(embeddings) != len(queries):
+            raise ValueError(f"Got {len(queries)} queries but {len(embeddings)} embeddings")
+
+        with self._lock:
+            self._queries = queries
+            self._embeddings = embeddings
+            self._rows = {_query_key(q): i for i, q in enumerate(queries)}
+            self._results = []
+            self._results_version = None
+            self._generation += 1
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """
+        Recompute pinned results if the store changed since the last refresh.
+
+        Returns:
+            True if results were recomputed
+        """
+        version = self.store.version
+        with self._lock:
+            embeddings, generation = self._embeddings, self._generation
+            if self._results_version == version or embeddings is None:
+                return False
+        results = [self.store.search_by_vector(embedding, self.top_k)
+                   for embedding in embeddings]
+        with self._lock:
+            if generation != self._generation:
+                return False  # warm()/load() replaced the queries meanwhile
+            self._results = results
+            self._results_version = version
+        return True
+
+    def start_refresher(self, interval: float = 0.5):
+        """Poll the store version every `interval` seconds and refresh on change."""
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.refresh()
+
+        self._refresher = threading.Thread(target=loop, name="warm-cache-refresh", daemon=True)
+        self._refresher.start()
+
+    def stop_refresher(self):
+        self._stop.set()
+        if self._refresher is not None:
+            self._refresher.join()
+            self._refresher = None
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def __contains__(self, query: str) -> bool:
+        return _query_key(query) in self._rows
+
+    def __len__(self) -> int:
+        return len(self._queries)
+
+    def embedding(self, query: str) -> Optional[np.ndarray]:
+        """Pinned embedding of a FAQ query, or None."""
+        with self._lock:
+            row = self._rows.get(_query_key(query))
+            return None if row is None else self._embeddings[row]
+
+    def lookup(self, query: str, top_k: Optional[int] = None) -> Optional[List[Tuple[dict, float]]]:
+        """Pinned results if the query is pinned and they match the current store version."""
+        top_k = self.top_k if top_k is None else top_k
+        if top_k > self.top_k:
+            return None
+        key = _query_key(query)
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None or row >= len(self._results) or \
+                    self._results_version != self.store.version:
+                return None
+            return self._results[row][:top_k]
+
+    def search(self, query: str, top_k: int = 2) -> List[Tuple[dict, float]]:
+        """Answer from the pinned results when possible, otherwise search the store."""
+        results = self.lookup(query, top_k)
+        if results is not None:
+            self.hits += 1
+            return results
+        self.misses += 1
+        embedding = self.embedding(query)
+        if embedding is not None:
+            return self.store.search_by_vector(embedding, top_k)
+        return self.store.search(query, top_k=top_k)
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+
+    def save(self, path):
+        """Save the pinned queries and embeddings to an .npz file."""
+        with self._lock:
+            embeddings = self._embeddings if self._embeddings is not None else np.zeros((0, 0))
+            queries = list(self._queries)
+        with open(path, "wb") as f:
+            np.savez(f, embeddings=embeddings, queries=np.array(json.dumps(queries)))
+
+    def load(self, path):
+        """Pin the query set saved by `save()` without re-embedding it."""
+        with np.load(path) as data:
+            queries = json.loads(str(data["queries"]))
+            embeddings = data["embeddings"]
+        self.warm(queries, embeddings=embeddings)
@@ -0,0 +1,33 @@
+"""
+Shared test setup: makes the repo root importable (so tests can `import rag`)
+and provides fixtures used by several test modules.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag.embeddings import HashingEmbedder  # noqa: E402
+
+
+class CountingEmbedder(HashingEmbedder):
+    """HashingEmbedder that counts its `encode()` calls and the texts encoded."""
+
+    def __init__(self, dim: int = 64):
+        super().__init__(dim=dim)
+        self.calls = 0
+        self.texts = 0
+
+    def encode(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        return super().encode(texts)
+
+
+@pytest.fixture
+def counting_embedder():
+    """Factory for fresh CountingEmbedders: `counting_embedder()` or `counting_embedder(dim=32)`."""
+    return CountingEmbedder
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for rag.ann - the IVF index and recall measurement.
+
+Run with: python -m pytest tests/test_ann.py
+"""
+
+import numpy as np
+import pytest
+
+from rag.ann import IVFIndex, exact_top_k, recall_at_k
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    centres = rng.standard_normal((50, 32))
+    points = centres[rng.integers(50, size=3050)] + 0.8 * rng.standard_normal((3050, 32))
+    points = (points / np.linalg.norm(points, axis=1, keepdims=True)).astype(np.float32)
+    return points[:3000], points[3000:]
+
+
+def test_exact_top_k_matches_full_sort(data):
+    vectors, queries = data
+    truth = exact_top_k(vectors, queries, 5)
+    expected = np.argsort(-(queries @ vectors.T), axis=1, kind="stable")[:, :5]
+    np.testing.assert_array_equal(truth, expected)
+    assert recall_at_k(truth, truth) == 1.0
+
+
+def test_recall_grows_with_nprobe_and_full_probe_is_exact(data):
+    vectors, queries = data
+    truth = exact_top_k(vectors, queries, 10)
+    index = IVFIndex(nlist=32, seed=1).build(vectors)
+
+    recalls = [recall_at_k(index.search_many(queries, 10, nprobe), truth)
+               for nprobe in (1, 4, 32)]
+    assert recalls == sorted(recalls)
+    assert recalls[0] < 1.0
+    assert recalls[-1] == 1.0
+    assert len(index) == len(vectors)
+    assert index.memory_bytes() > vectors.nbytes
+
+
+def test_search_returns_scores_best_first(data):
+    vectors, queries = data
+    index = IVFIndex(nlist=16, nprobe=16).build(vectors)
+    rows, scores = index.search(queries[0], k=5)
+    np.testing.assert_allclose(scores, vectors[rows] @ queries[0], rtol=1e-5)
+    assert list(scores) == sorted(scores, reverse=True)
+    with pytest.raises(RuntimeError):
+        IVFIndex().search(queries[0])
+
+
+def test_training_sample_is_never_smaller_than_nlist(data):
+    vectors, queries = data
+    index = IVFIndex(nlist=256, train_size=100).build(vectors[:1000])
+    assert len(index.centroids) == 256 and len(index) == 1000
+    truth = exact_top_k(vectors[:1000], queries, 5)
+    assert recall_at_k(index.search_many(queries, 5, nprobe=256), truth) == 1.0
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Tests for rag.async_pipeline, rag.lexical and the async Bedrock clients.
+
+Bedrock is replaced by a local HTTP server speaking the same JSON.
+Run with: python -m pytest tests/test_async_pipeline.py
+"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+from rag.async_pipeline import AsyncLRUCache, AsyncRAGPipeline
+from rag.bedrock import BedrockEmbedder, BedrockGenerator
+from rag.context import ContextBuilder
+from rag.embeddings import HashingEmbedder
+from rag.lexical import BM25Index
+from rag.tracing import InMemoryExporter, Tracer
+from rag.vector_store import VectorStore
+
+
+DOCS = [
+    {"id": 1, "content": "Refunds are issued within 30 days of purchase"},
+    {"id": 2, "content": "Shipping takes 3-5 business days"},
+    {"id": 3, "content": "Error code E-4711 means the card was declined"},
+]
+
+
+def builder():
+    return ContextBuilder(max_tokens=200, count_tokens=lambda t: len(t.split()))
+
+
+class SlowAsyncEmbedder(HashingEmbedder):
+    """Pretends to be a network embedder: 50 ms per call, no thread held."""
+
+    async def aencode(self, texts):
+        await asyncio.sleep(0.05)
+        return self.encode(texts)
+
+
+class FakeBedrockHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path.endswith("/invoke"):
+            vector = HashingEmbedder(dim=16).encode([body["inputText"]])[0]
+            reply = {"embedding": vector.tolist(), "inputTextTokenCount": 3}
+        else:
+            prompt = body["messages"][0]["content"][0]["text"]
+            reply = {"output": {"message": {"content": [{"text": f"echo:{len(prompt)}"}]}}}
+        data = json.dumps(reply).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_bedrock():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBedrockHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_hundreds_of_concurrent_questions_share_a_small_pool():
+    store = VectorStore(SlowAsyncEmbedder(dim=32))
+    store.add_documents(DOCS)
+    pipeline = AsyncRAGPipeline(store, builder(), max_workers=4)
+
+    async def main():
+        start = time.perf_counter()
+        answers = await asyncio.gather(*(pipeline.query(f"refund question {i}", top_k=2)
+                                         for i in range(300)))
+        return answers, time.perf_counter() - start
+
+    answers, elapsed = asyncio.run(main())
+    assert len(answers) == 300
+    # Sequentially this would take 300 x 50 ms = 15 s
+    assert elapsed < 3
+    assert threading.active_count() < 20
+
+
+def test_dense_and_lexical_results_are_fused():
+    store = VectorStore(HashingEmbedder(dim=8))  # tiny dim: dense search is poor
+    store.add_documents(DOCS)
+    lexical = BM25Index()
+    lexical.add_documents(DOCS)
+    exporter = InMemoryExporter()
+    pipeline = AsyncRAGPipeline(store, builder(), lexical=lexical,
+                                tracer=Tracer(exporters=[exporter]))
+
+    answer = asyncio.run(pipeline.query("what does E-4711 mean", top_k=2))
+
+    assert 3 in [doc["id"] for doc, _ in answer.context.chunks]
+    stages = exporter.traces[0].stage_durations()
+    assert {"embed", "search", "lexical_search", "fuse", "context_build"} <= set(stages)
+
+
+def test_context_building_runs_off_the_event_loop():
+    store = VectorStore(HashingEmbedder(dim=32))
+    store.add_documents(DOCS)
+    threads = []
+
+    def count_tokens(text):
+        threads.append(threading.get_ident())
+        return len(text.split())
+
+    pipeline = AsyncRAGPipeline(store, ContextBuilder(max_tokens=200, count_tokens=count_tokens))
+
+    async def main():
+        await pipeline.query("refund", top_k=2)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(main())
+    assert threads and loop_thread not in threads
+
+
+def test_cache_hit_skips_the_pipeline():
+    store = VectorStore(HashingEmbedder(dim=32))
+    store.add_documents(DOCS)
+    pipeline = AsyncRAGPipeline(store, builder(), cache=AsyncLRUCache())
+
+    async def main():
+        first = await pipeline.query("Shipping time?")
+        second = await pipeline.query("shipping   TIME?")
+        store.delete(2)
+        third = await pipeline.query("shipping time?")
+        return first, second, third
+
+    first, second, third = asyncio.run(main())
+    assert second is first
+    assert third is not first  # the store changed, so its version did too
+
+
+def test_failed_retrieval_cancels_the_other_stage():
+    cancelled = []
+
+    class HangingEmbedder(HashingEmbedder):
+        async def aencode(self, texts):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+    class BrokenLexical:
+        def search(self, question, top_k=5):
+            raise RuntimeError("index unavailable")
+
+    store = VectorStore(HangingEmbedder(dim=32))
+    store.add_documents(DOCS)
+    pipeline = AsyncRAGPipeline(store, builder(), lexical=BrokenLexical())
+
+    async def main():
+        with pytest.raises(RuntimeError, match="index unavailable"):
+            await pipeline.query("refund")
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    started = time.perf_counter()
+    assert asyncio.run(main()) == []
+    assert cancelled == [True]
+    assert time.perf_counter() - started < 5
+
+
+def test_bedrock_clients_against_local_endpoint(fake_bedrock):
+    embedder = BedrockEmbedder(endpoint_url=fake_bedrock, api_key="test")
+    generator = BedrockGenerator(endpoint_url=fake_bedrock, api_key="test")
+    store = VectorStore(embedder)
+    store.add_documents(DOCS)
+    pipeline = AsyncRAGPipeline(store, builder(), generator=generator)
+
+    async def main():
+        vectors = await embedder.aencode(["a", "b", "c"])
+        answer = await pipeline.query("refund")
+        await pipeline.aclose()
+        return vectors, answer
+
+    vectors, answer = asyncio.run(main())
+    assert vectors.shape == (3, 16)
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-5)
+    assert answer.answer.startswith("echo:")
+    embedder.close()
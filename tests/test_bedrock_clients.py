@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Tests for the Bedrock clients' request handling (rag.bedrock, rag.singleflight,
+rag.resilience).
+
+Bedrock is replaced by a local HTTP server that counts requests, answers
+slowly (so concurrent duplicates really overlap) and can inject errors such
+as 429 ThrottlingException.
+Run with: python -m pytest tests/test_bedrock_clients.py
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+from rag.bedrock import BedrockEmbedder, BedrockError, BedrockGenerator
+from rag.embeddings import HashingEmbedder
+from rag.prompt_cache import CachedPrompt
+from rag.resilience import AdaptiveRateLimiter, CircuitBreaker
+from rag.singleflight import AsyncSingleFlight, SingleFlight, TTLCache
+
+THROTTLED = (429, "ThrottlingException", "Too many requests, please wait before trying again.")
+SERVER_ERROR = (500, "InternalServerException", "boom")
+
+
+class FakeBedrock(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeBedrockHandler)
+        self.requests = Counter()
+        self.delay = 0.1
+        self.error = None           # (status, type, message) returned for every request
+        self.injected = deque()     # ... or only for the next few
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def next_error(self):
+        with self.lock:
+            return self.injected.popleft() if self.injected else self.error
+
+
+class FakeBedrockHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        text = body.get("inputText", "converse")
+        with self.server.lock:
+            self.server.requests[text] += 1
+        time.sleep(self.server.delay)
+        error = self.server.next_error()
+        headers = {}
+        if error:
+            status, reply = error[0], {"message": error[2]}
+            headers["x-amzn-ErrorType"] = f"{error[1]}:http://internal.amazon.com/coral/"
+        elif text == "converse":
+            cached = any("cachePoint" in block for block in body["messages"][0]["content"])
+            usage = {"inputTokens": 10, "outputTokens": 1,
+                     "cacheReadInputTokens": 1000 if cached else 0}
+            status, reply = 200, {"output": {"message": {"content": [{"text": "ok"}]}},
+                                  "usage": usage}
+        else:
+            vector = HashingEmbedder(dim=16).encode([text])[0]
+            status, reply = 200, {"embedding": vector.tolist(), "inputTextTokenCount": 3}
+        data = json.dumps(reply).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def bedrock():
+    server = FakeBedrock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+
+# ============================================================================
+# Embedding coalescing
+# ============================================================================
+
+def test_concurrent_duplicate_embeddings_make_one_call(bedrock):
+    embedder = BedrockEmbedder(endpoint_url=bedrock.url, api_key="test")
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        vectors = list(pool.map(embedder.embed_one, ["popular question"] * 16))
+
+    assert bedrock.requests["popular question"] == 1
+    for vector in vectors:
+        np.testing.assert_array_equal(vector, vectors[0])
+    assert embedder.stats()["calls"] == 1
+    assert embedder.stats()["coalesced"] + embedder.stats()["cache_hits"] == 15
+    embedder.close()
+
+
+def test_async_duplicates_and_batch_duplicates_coalesce(bedrock):
+    embedder = BedrockEmbedder(endpoint_url=bedrock.url, api_key="test")
+
+    async def main():
+        batches = await asyncio.gather(*(embedder.aencode(["shared chunk", f"query {i}",
+                                                           "shared chunk"])
+                                         for i in range(10)))
+        await embedder.aclose()
+        return batches
+
+    batches = asyncio.run(main())
+    assert bedrock.requests["shared chunk"] == 1
+    assert all(bedrock.requests[f"query {i}"] == 1 for i in range(10))
+    assert all(b.shape == (3, 16) for b in batches)
+    np.testing.assert_array_equal(batches[0][0], batches[9][2])
+
+    # Sequential repeats are served by the short-term cache
+    embedder.encode(["shared chunk", "query 3"])
+    assert sum(bedrock.requests.values()) == 11
+    embedder.close()
+
+
+def test_expired_entries_are_fetched_again(bedrock):
+    bedrock.delay = 0
+    embedder = BedrockEmbedder(endpoint_url=bedrock.url, api_key="test", cache_ttl=0.05)
+    embedder.embed_one("text")
+    embedder.embed_one("text")
+    time.sleep(0.1)
+    embedder.embed_one("text")
+    assert bedrock.requests["text"] == 2
+    embedder.close()
+
+
+def test_errors_reach_every_waiter_and_are_not_cached(bedrock):
+    bedrock.error = SERVER_ERROR
+    embedder = BedrockEmbedder(endpoint_url=bedrock.url, api_key="test", max_retries=0)
+
+    def attempt(_):
+        with pytest.raises(BedrockError):
+            embedder.embed_one("flaky")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(attempt, range(8)))
+    assert bedrock.requests["flaky"] == 1
+
+    bedrock.error = None
+    assert embedder.embed_one("flaky").shape == (16,)
+    assert bedrock.requests["flaky"] == 2
+    embedder.close()
+
+
+# ============================================================================
+# Throttling and circuit breaking
+# ============================================================================
+
+def test_throttling_is_retried_and_slows_the_client_down(bedrock):
+    bedrock.delay = 0
+    bedrock.injected.extend([THROTTLED, THROTTLED])
+    embedder = BedrockEmbedder(endpoint_url=bedrock.url, api_key="test", backoff=0.01)
+
+    assert embedder.embed_one("text").shape == (16,)
+    assert bedrock.requests["text"] == 3
+    stats = embedder.resilience_stats()
+    assert stats["retries"] == 2
+    assert stats["rate_limiter"]["throttles"] == 2
+    assert stats["rate_limiter"]["rate"] < embedder.rate_limiter.max_rate
+    assert stats["circuit_breaker"]["state"] == "closed"  # throttling is not an outage
+    embedder.close()
+
+
+def test_async_burst_survives_injected_throttling(bedrock):
+    bedrock.delay = 0.01
+    bedrock.injected.extend([THROTTLED] * 5)
+    embedder = BedrockEmbedder(endpoint_url=bedrock.url, api_key="test", backoff=0.01)
+
+    async def main():
+        vectors = await embedder.aencode([f"text {i}" for i in range(20)])
+        await embedder.aclose()
+        return vectors
+
+    assert asyncio.run(main()).shape == (20, 16)
+    assert sum(bedrock.requests.values()) == 25
+    assert embedder.rate_limiter.throttles == 5
+
+
+def test_persistent_throttling_gives_up_after_max_retries(bedrock):
+    bedrock.delay = 0
+    bedrock.error = THROTTLED
+    generator = BedrockGenerator(endpoint_url=bedrock.url, api_key="test",
+                                 max_retries=2, backoff=0.01)
+    with pytest.raises(BedrockError) as error:
+        generator.generate("question")
+    assert error.value.error_type == "ThrottlingException"
+    assert bedrock.requests["converse"] == 3
+    generator.close()
+
+
+def test_circuit_opens_fails_fast_and_recovers_after_probe(bedrock):
+    bedrock.delay = 0
+    bedrock.error = SERVER_ERROR
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.2)
+    generator = BedrockGenerator(endpoint_url=bedrock.url, api_key="test",
+                                 circuit_breaker=breaker, max_retries=0)
+    for _ in range(3):
+        with pytest.raises(BedrockError) as error:
+            generator.generate("question")
+        assert error.value.status_code == 500
+    assert breaker.state == "open"
+
+    started = time.perf_counter()
+    with pytest.raises(BedrockError) as error:
+        generator.generate("question")
+    assert error.value.error_type == "CircuitOpen"
+    assert time.perf_counter() - started < 0.05
+    assert bedrock.requests["converse"] == 3  # never reached the endpoint
+
+    bedrock.error = None
+    time.sleep(0.25)
+    assert breaker.state == "half_open"
+    assert generator.generate("question") == "ok"
+    assert breaker.state == "closed"
+    generator.close()
+
+
+def test_shared_limiter_sheds_load_instead_of_queueing(bedrock):
+    bedrock.delay = 0
+    limiter = AdaptiveRateLimiter(rate=1.0, min_rate=1.0, max_rate=1.0, burst=1)
+    embedder = BedrockEmbedder(endpoint_url=bedrock.url, api_key="test",
+                               rate_limiter=limiter, max_queue_wait=0.1)
+    generator = BedrockGenerator(endpoint_url=bedrock.url, api_key="test",
+                                 rate_limiter=limiter, max_queue_wait=0.1)
+    embedder.embed_one("text")
+
+    started = time.perf_counter()
+    with pytest.raises(BedrockError) as error:
+        generator.generate("question")
+    assert error.value.error_type == "ClientThrottled"
+    assert time.perf_counter() - started < 0.05
+    assert bedrock.requests["converse"] == 0
+    embedder.close()
+    generator.close()
+
+
+def test_open_circuit_rejects_without_spending_rate_limit_tokens(bedrock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.2)
+    breaker.record_failure()
+    limiter = AdaptiveRateLimiter(rate=1.0, min_rate=1.0, max_rate=1.0, burst=1)
+    generator = BedrockGenerator(endpoint_url=bedrock.url, api_key="test", rate_limiter=limiter,
+                                 circuit_breaker=breaker, max_queue_wait=0)
+    for _ in range(5):
+        with pytest.raises(BedrockError) as error:
+            generator.generate("question")
+        assert error.value.error_type == "CircuitOpen"
+    assert limiter.rejected == 0
+
+    # A half-open probe that the limiter sheds gives its slot back
+    time.sleep(0.25)
+    limiter.reserve()
+    with pytest.raises(BedrockError) as error:
+        generator.generate("question")
+    assert error.value.error_type == "ClientThrottled"
+    assert breaker.allow()
+    generator.close()
+
+
+def test_aimd_rate_and_half_open_probe():
+    limiter = AdaptiveRateLimiter(rate=100, min_rate=10, max_rate=100, cooldown=10)
+    limiter.on_throttle()
+    limiter.on_throttle()  # same episode: one decrease
+    assert limiter.rate == 50
+    for _ in range(50):
+        limiter.on_success()
+    assert 50 < limiter.rate <= 51
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()          # the probe
+    assert not breaker.allow()      # only one at a time
+    breaker.record_failure()        # probe failed: open again
+    assert breaker.state == "open"
+
+
+def test_generator_adds_up_reported_cache_usage(bedrock):
+    bedrock.delay = 0
+    prompt = CachedPrompt("system", "Context:\npinned\n\n", "Question: q\n\nAnswer:",
+                          cache_prefix=True)
+    generator = BedrockGenerator(endpoint_url=bedrock.url, api_key="test")
+    generator.generate(prompt)
+    generator.generate("plain prompt")
+    assert generator.usage["cacheReadInputTokens"] == 1000
+    assert generator.usage["inputTokens"] == 20
+    generator.close()
+
+
+# ============================================================================
+# Building blocks
+# ============================================================================
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_single_flight_runs_again_after_completion():
+    flight = SingleFlight()
+    assert flight.do("k", lambda: 1) == 1
+    assert flight.do("k", lambda: 2) == 2
+    assert flight.calls == 2 and flight.in_flight() == 0
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    flight = AsyncSingleFlight()
+    runs = []
+
+    async def work():
+        await asyncio.sleep(0.05)
+        runs.append(1)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("k", work))
+        second = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "done"
+    assert runs == [1] and flight.coalesced == 1
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for the benchmark runner in benchmarks/ (tiny corpora, just the plumbing).
+
+Run with: python -m pytest tests/test_benchmarks.py
+"""
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "benchmarks"))
+
+import run_benchmarks  # noqa: E402
+from common import compare_to_baseline, metric  # noqa: E402
+
+
+def test_runner_writes_json_and_detects_regressions(tmp_path):
+    output = tmp_path / "latest.json"
+    baseline = tmp_path / "baseline.json"
+    args = ["--sizes", "50,100", "--queries", "5", "--rounds", "1", "--embed-docs", "50",
+            "--output", str(output), "--baseline", str(baseline)]
+
+    assert run_benchmarks.main(args + ["--save-baseline"]) == 0
+    names = {m["name"] for m in json.loads(output.read_text())["metrics"]}
+    assert {"embedding_throughput", "ingestion_rate", "store_memory",
+            "search_latency_p95", "rag_query_latency_p50"} <= names
+
+    # Make the baseline look impossibly fast: the next run must fail
+    document = json.loads(baseline.read_text())
+    for m in document["metrics"]:
+        m["value"] = m["value"] * 100 if m["higher_is_better"] else m["value"] / 100
+    baseline.write_text(json.dumps(document))
+    assert run_benchmarks.main(args) == 1
+
+
+def test_compare_respects_direction_and_tolerance():
+    baseline = {"metrics": [metric("latency", 10.0, "ms", size=1),
+                            metric("throughput", 100.0, "docs/s", higher_is_better=True)]}
+    current = [metric("latency", 11.0, "ms", size=1),
+               metric("throughput", 70.0, "docs/s", higher_is_better=True)]
+
+    regressions = compare_to_baseline(current, baseline, tolerance=0.15)
+    assert [r["metric"] for r in regressions] == ["throughput[]"]
+
+
+def test_ann_grid_reports_pareto_and_gates_recall(tmp_path):
+    import ann_grid
+
+    output = tmp_path / "ann.json"
+    baseline = tmp_path / "ann_baseline.json"
+    args = ["--size", "2000", "--queries", "20", "--nlist", "8,32", "--nprobe", "1,8",
+            "--rounds", "1", "--dim", "32", "--output", str(output), "--baseline", str(baseline)]
+
+    assert ann_grid.main(args + ["--save-baseline"]) == 0
+    report = (tmp_path / "ann.md").read_text()
+    assert "| 32 | 8 |" in report and "✅" in report
+    assert ann_grid.main(args) == 0                    # same recall as the baseline
+    assert ann_grid.main(args + ["--gate", "32:1", "--min-recall", "1.01"]) == 1
+
+    points = [{"recall": 0.9, "qps": 100}, {"recall": 0.8, "qps": 50}, {"recall": 1.0, "qps": 10}]
+    assert ann_grid.pareto_front(points) == [points[0], points[2]]
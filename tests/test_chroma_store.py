@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for rag.chroma_store - the Chroma-backed store in embedded mode.
+
+Run with: python -m pytest tests/test_chroma_store.py
+"""
+
+import uuid
+
+import pytest
+
+pytest.importorskip("chromadb")
+
+from rag.chroma_store import ChromaVectorStore, chroma_client  # noqa: E402
+from rag.embeddings import HashingEmbedder  # noqa: E402
+from rag.vector_store import VectorStore  # noqa: E402
+
+
+DOCS = [
+    {"id": 1, "content": "Refunds are issued within 30 days", "metadata": {"category": "refunds"}},
+    {"id": "faq-2", "content": "Shipping takes 3-5 business days"},
+    {"id": 3, "content": "Support is available by phone and email",
+     "metadata": {"category": "support", "priority": 2}},
+]
+
+
+@pytest.fixture
+def store(counting_embedder):
+    name = f"test-{uuid.uuid4().hex[:12]}"
+    store = ChromaVectorStore(counting_embedder(), name, batch_size=100)
+    yield store
+    store.client.delete_collection(name)
+
+
+def test_same_results_as_the_in_process_store(store):
+    local = VectorStore(HashingEmbedder(dim=64))
+    local.add_documents(DOCS)
+    store.add_documents(DOCS)
+
+    for query in ("refund in 30 days", "phone support", "how long is shipping"):
+        remote_hits = store.search(query, top_k=3)
+        local_scores = {d["id"]: score for d, score in local.search(query, top_k=3)}
+        assert remote_hits[0][0]["id"] == local.search(query, top_k=1)[0][0]["id"]
+        for doc, score in remote_hits:
+            assert score == pytest.approx(local_scores[doc["id"]], abs=1e-4)
+    assert store.get("faq-2") == DOCS[1]
+
+
+def test_writes_are_batched_and_flushed_before_reads(store):
+    docs = [{"id": i, "content": f"document {i}"} for i in range(250)]
+    store.add_documents(docs)
+
+    assert store.embedder.calls == 2  # two full batches of 100 sent, 50 queued
+    assert len(store) == 250          # reads flush the rest
+    assert store.embedder.calls == 3
+
+
+def test_upsert_and_delete(store):
+    store.add_documents(DOCS)
+    store.upsert({"id": 1, "content": "Refunds now take 14 days"})
+    store.upsert({"id": 1, "content": "Refunds now take 7 days"})  # same batch: last wins
+
+    assert store.get(1)["content"] == "Refunds now take 7 days"
+    assert store.delete(3)
+    assert not store.delete(3)
+    assert len(store) == 2
+
+
+def test_clients_are_shared_and_metadata_is_checked(store):
+    assert chroma_client() is store.client
+    with pytest.raises(ValueError):
+        store.add_document({"id": 9, "content": "x", "metadata": {"tags": ["a", "b"]}})
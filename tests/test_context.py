@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for rag.context - token budgeting and duplicate removal.
+
+Run with: python -m pytest tests/test_context.py
+"""
+
+from rag.context import ContextBuilder
+from rag.embeddings import HashingEmbedder
+from rag.pipeline import rag_query
+from rag.vector_store import VectorStore
+
+
+def word_count(text):
+    return len(text.split())
+
+
+def doc(doc_id, content):
+    return {"id": doc_id, "content": content, "metadata": {}}
+
+
+REFUND = "Our refund policy allows customers to return products within 30 days of purchase"
+
+
+def test_packs_best_chunks_within_budget():
+    builder = ContextBuilder(max_tokens=12, count_tokens=word_count, separator=" ")
+    results = [
+        (doc(1, "one two three four five six seven eight"), 0.9),
+        (doc(2, "nine ten eleven twelve thirteen"), 0.8),
+        (doc(3, "short chunk"), 0.5),
+    ]
+    packed = builder.build(results)
+
+    assert [d["id"] for d, _ in packed.chunks] == [1, 3]
+    assert packed.tokens <= 12
+    assert packed.dropped_over_budget == 1
+
+
+def test_near_duplicates_are_dropped():
+    builder = ContextBuilder(max_tokens=1000, count_tokens=word_count)
+    results = [
+        (doc(1, REFUND + " for a full refund."), 0.9),
+        (doc(2, REFUND + " for a full refund!"), 0.85),
+        (doc(3, "Shipping takes 3-5 business days for standard delivery."), 0.4),
+    ]
+    packed = builder.build(results)
+
+    assert [d["id"] for d, _ in packed.chunks] == [1, 3]
+    assert packed.dropped_duplicates == 1
+
+
+def test_chunk_token_counts_are_cached():
+    calls = []
+
+    def counting(text):
+        calls.append(text)
+        return word_count(text)
+
+    builder = ContextBuilder(max_tokens=100, count_tokens=counting)
+    results = [(doc(1, "alpha beta"), 0.9), (doc(2, "gamma delta"), 0.8)]
+    builder.build(results)
+    first = len(calls)
+    builder.build(results)
+
+    assert len(calls) == first
+    assert builder.cache_hits == 2
+
+
+def test_rag_query_uses_context_builder():
+    store = VectorStore(HashingEmbedder(dim=64))
+    store.add_documents([doc(1, REFUND), doc(2, REFUND + "."), doc(3, "support hours")])
+    builder = ContextBuilder(max_tokens=50, count_tokens=word_count)
+
+    answer = rag_query("how do I return a product for a refund", store, builder, top_k=3,
+                       generate=lambda prompt: "30 days")
+
+    assert answer.context.text.count("refund policy") == 1
+    assert answer.prompt.startswith("Context:\n")
+    assert answer.answer == "30 days"
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for rag.dedup - LSH banding and ingestion-time duplicate filtering.
+
+Run with: python -m pytest tests/test_dedup.py
+"""
+
+import pytest
+
+from rag.dedup import LSHIndex, MinHasher, NearDuplicateFilter
+from rag.indexing import build_index, make_embedder_factory
+from rag.persistence import DurableVectorStore
+
+
+BOILERPLATE = ("Acme Corp customer handbook. All rights reserved. Contact support for "
+               "questions about this page. ")
+
+
+def page(i, body):
+    return {"id": i, "content": BOILERPLATE + body + " " + BOILERPLATE}
+
+
+def test_lsh_finds_similar_signatures_only():
+    hasher = MinHasher(num_perm=128)
+    index = LSHIndex(num_perm=128, bands=16)
+    base = "the quick brown fox jumps over the lazy dog near the river bank today"
+    index.insert("a", hasher.signature(base))
+    index.insert("b", hasher.signature("completely unrelated text about quarterly tax filings"))
+
+    match = index.query(hasher.signature(base + " again"), threshold=0.7)
+    assert match is not None and match[0] == "a"
+    assert index.query(hasher.signature("shipping takes five days"), threshold=0.7) is None
+    assert 0.7 < index.threshold < 0.75
+
+
+def test_filter_drops_exact_and_near_duplicates_and_keeps_aliases():
+    docs = [
+        page(1, "Refunds are issued within 30 days of purchase to the original card."),
+        page(2, "Shipping takes 3-5 business days within the continental United States."),
+        page(3, "Refunds are issued within 30 days of purchase to the original card."),
+        page(4, "Refunds are issued within 30 days of purchase to the original card!"),
+        {"id": 5, "content": "  " + page(2, "Shipping takes 3-5 business days within the "
+                                            "continental United States.")["content"].upper()},
+    ]
+    dedup = NearDuplicateFilter(threshold=0.8)
+    kept = list(dedup.filter(docs))
+
+    assert [d["id"] for d in kept] == [1, 2]
+    assert dedup.duplicates == {3: 1, 4: 1, 5: 2}
+    assert dedup.canonical(4) == 1 and dedup.canonical(2) == 2
+    stats = dedup.stats
+    assert (stats.documents, stats.kept, stats.exact_duplicates, stats.near_duplicates) == \
+        (5, 2, 2, 1)
+    assert 0.55 < stats.saved_fraction < 0.65
+
+
+def test_distinct_pages_with_shared_boilerplate_are_kept():
+    bodies = ["Refunds are issued within 30 days of purchase to the original card.",
+              "Shipping takes 3-5 business days within the continental United States.",
+              "Our support team is available by phone and email every weekday morning."]
+    dedup = NearDuplicateFilter(threshold=0.9)
+    assert len(list(dedup.filter(page(i, b) for i, b in enumerate(bodies)))) == 3
+
+
+def test_documents_without_words_are_only_compared_exactly():
+    dedup = NearDuplicateFilter()
+    assert dedup.check({"id": 1, "content": "!!! ???"}) is None
+    assert dedup.check({"id": 2, "content": "--- ***"}) is None
+    assert dedup.check({"id": 3, "content": "!!!   ???"}) == 1
+    assert dedup.stats.kept == 2 and dedup.stats.exact_duplicates == 1
+
+
+def test_build_index_skips_duplicates_before_embedding(tmp_path):
+    docs = [{"id": i, "content": f"policy document number {i % 10} about topic {i % 10}"}
+            for i in range(40)]
+    factory = make_embedder_factory("hashing", dim=32)
+    stats = build_index(docs, tmp_path / "index", factory, dedup=NearDuplicateFilter(),
+                        workers=1, batch_size=8)
+
+    assert stats["documents"] == 10
+    assert stats["dedup"]["dropped"] == 30
+    # 30 dropped documents at the encoding rate of the 10 that were embedded
+    assert stats["estimated_seconds_saved"] == pytest.approx(3 * stats["encode_seconds"], abs=0.01)
+    assert stats["encode_seconds"] <= stats["seconds"]
+    store = DurableVectorStore(factory(), tmp_path / "index")
+    assert len(store) == 10
+    store.close()
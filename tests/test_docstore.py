@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for rag.docstore - columnar document storage and DocumentView.
+
+Run with: python -m pytest tests/test_docstore.py
+"""
+
+import json
+
+from rag.context import ContextBuilder
+from rag.docstore import DocumentColumns, DocumentView
+from rag.embeddings import HashingEmbedder
+from rag.persistence import DurableVectorStore
+from rag.pipeline import rag_query
+from rag.vector_store import VectorStore
+
+
+DOCS = [
+    {"id": 1, "content": "Refunds within 30 days – no receipt needed",
+     "metadata": {"category": "refunds", "tags": ["policy", "money"]}},
+    {"id": 2, "content": "Shipping takes 3-5 business days"},
+    {"id": "faq-3", "content": "Support is open 24/7",
+     "metadata": {"category": "support", "priority": 2}, "source": "faq.md"},
+]
+
+
+def test_rows_round_trip_through_views():
+    columns = DocumentColumns(capacity=1)
+    columns.extend(DOCS)
+
+    assert len(columns) == 3
+    for row, doc in enumerate(DOCS):
+        view = columns[row]
+        assert isinstance(view, DocumentView)
+        assert view == doc
+        assert view.to_dict() == doc
+        assert view["content"] == doc["content"]
+    assert columns[1].get("metadata", {}) == {}
+    assert columns[2].id == "faq-3"
+
+
+def test_take_keeps_only_the_given_rows():
+    columns = DocumentColumns()
+    columns.extend(DOCS)
+
+    taken = columns.take([2, 0])
+
+    assert [view.to_dict() for view in taken] == [DOCS[2], DOCS[0]]
+    assert taken.nbytes < columns.nbytes
+
+
+def test_columnar_store_search_compaction_and_snapshots(tmp_path):
+    docs = [{"id": i, "content": f"order {i} shipped by courier",
+             "metadata": {"category": ["shipping", "billing"][i % 2]}} for i in range(40)]
+    with DurableVectorStore(HashingEmbedder(dim=64), tmp_path, columnar=True) as store:
+        store.add_documents(docs)
+        for i in range(0, 40, 4):
+            store.delete(i)
+        store.compact()
+        store.snapshot()
+
+        doc, _ = store.search("order 7 shipped by courier", top_k=1)[0]
+        assert isinstance(doc, DocumentView)
+        assert doc == docs[7]
+        json.dumps(store.export()[1])  # exports plain dicts
+
+    with DurableVectorStore(HashingEmbedder(dim=64), tmp_path, columnar=True) as store:
+        assert len(store) == 30
+        assert store.get(7) == docs[7]
+
+
+def test_views_flow_through_the_pipeline():
+    store = VectorStore(HashingEmbedder(dim=64), columnar=True)
+    store.add_documents(DOCS)
+    builder = ContextBuilder(max_tokens=100, count_tokens=lambda text: len(text.split()))
+
+    answer = rag_query("refund receipt", store, builder, top_k=2,
+                       where=lambda doc: doc.get("metadata", {}).get("category") == "refunds")
+
+    assert [doc["id"] for doc, _ in answer.context.chunks] == [1]
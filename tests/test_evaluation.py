@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for rag.evaluation - ranking metrics, the parallel harness and the embedding cache.
+
+Run with: python -m pytest tests/test_evaluation.py
+"""
+
+import json
+
+import pytest
+
+from rag.embeddings import HashingEmbedder
+from rag.evaluation import (CachedEmbedder, LabeledQuery, evaluate, main, ndcg_at_k,
+                            recall_at_k, reciprocal_rank)
+from rag.lexical import BM25Index
+from rag.vector_store import VectorStore
+
+
+DOCS = [
+    {"id": 1, "content": "Wireless headphones with noise cancellation for music"},
+    {"id": 2, "content": "Running shoes with extra cushioning"},
+    {"id": 3, "content": "Bluetooth speaker for music at parties"},
+    {"id": 4, "content": "Refunds are issued within 30 days"},
+]
+QUERIES = [
+    LabeledQuery.from_dict({"query": "headphones for music", "relevant": {"1": 2, "3": 1}}),
+    LabeledQuery.from_dict({"query": "how do refunds work", "relevant": [4]}),
+    LabeledQuery.from_dict({"query": "shoes for running", "relevant": [2]}),
+]
+
+
+def test_metrics_on_a_known_ranking():
+    relevant = {"a": 2.0, "b": 1.0}
+    ranked = ["x", "b", "a"]
+    assert recall_at_k(ranked, relevant, 2) == 0.5
+    assert reciprocal_rank(ranked, relevant, 3) == 0.5
+    assert reciprocal_rank(ranked, relevant, 1) == 0.0
+    ideal = 2 + 1 / 1.5849625
+    assert ndcg_at_k(ranked, relevant, 3) == pytest.approx((1 / 1.5849625 + 2 / 2) / ideal)
+    assert ndcg_at_k(["a", "b"], relevant, 2) == pytest.approx(1.0)
+
+
+def test_parallel_run_keeps_order_and_reports_latency():
+    store = VectorStore(HashingEmbedder(dim=64))
+    store.add_documents(DOCS)
+    report = evaluate(store, QUERIES * 10, k=3, workers=4)
+
+    assert [r.query for r in report.results] == [q.query for q in QUERIES * 10]
+    summary = report.summary()
+    assert summary["queries"] == 30
+    assert summary["mrr"] == 1.0 and summary["recall@3"] > 0.8
+    assert 0 < summary["latency_p50_ms"] <= summary["latency_p95_ms"]
+
+    bm25 = BM25Index()
+    bm25.add_documents(DOCS)
+    lexical = evaluate(lambda query, top_k: bm25.search(query, top_k), QUERIES, k=1)
+    assert lexical.summary()["mrr"] == 1.0
+
+
+def test_embedding_cache_persists_between_runs(tmp_path, counting_embedder):
+    path = tmp_path / "cache.npz"
+    first = CachedEmbedder(counting_embedder(), path)
+    store = VectorStore(first)
+    store.add_documents(DOCS)
+    evaluate(store, QUERIES, k=2)
+    first.save()
+    assert first.embedder.texts == len(DOCS) + len(QUERIES)
+
+    second = CachedEmbedder(counting_embedder(), path)
+    store = VectorStore(second)
+    store.add_documents(DOCS)
+    evaluate(store, QUERIES, k=2)
+    assert second.embedder.texts == 0 and second.hits == len(DOCS) + len(QUERIES)
+
+    other_model = CachedEmbedder(counting_embedder(), path, namespace="another-model")
+    assert len(other_model) == 0
+
+
+def test_command_line(tmp_path):
+    corpus, queries, output = tmp_path / "docs.jsonl", tmp_path / "q.jsonl", tmp_path / "out.json"
+    corpus.write_text("\n".join(json.dumps(d) for d in DOCS))
+    queries.write_text("\n".join(json.dumps({"query": q.query, "relevant": q.relevant})
+                                 for q in QUERIES))
+    args = ["--queries", str(queries), "--corpus", str(corpus), "--embedder", "hashing",
+            "--cache", str(tmp_path / "cache.npz"), "--top-k", "2", "--output", str(output)]
+
+    assert main(args + ["--retriever", "hybrid"]) == 0
+    assert main(args) == 0
+    summary = json.loads(output.read_text())
+    assert summary["embedding_cache_misses"] == 0 and summary["mrr"] == 1.0
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests for rag.extract - streaming PDF/HTML/Markdown/text extraction.
+
+Run with: python -m pytest tests/test_extract.py
+"""
+
+import io
+
+import pytest
+
+from rag.extract import extract, extract_files, extract_html, extract_text
+
+
+def make_pdf(pages):
+    """A small PDF with one line of Helvetica text per page."""
+    pypdf = pytest.importorskip("pypdf")
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+    writer = pypdf.PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for text in pages:
+        page = writer.add_blank_page(612, 792)
+        page[NameObject("/Resources")] = DictionaryObject(
+            {NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})})
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT /F1 12 Tf 72 712 Td ({text}) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(stream)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def test_pdf_pages_with_page_numbers(tmp_path):
+    path = tmp_path / "manual.pdf"
+    path.write_bytes(make_pdf(["Refunds take 30 days", "", "Shipping takes 5 days"]))
+
+    docs = list(extract(str(path)))
+    assert [d["content"] for d in docs] == ["Refunds take 30 days", "Shipping takes 5 days"]
+    assert docs[1]["metadata"] == {"page": 3, "pages": 3, "source": str(path), "format": "pdf"}
+
+
+def test_markdown_sections_follow_headings_outside_code():
+    text = b"# Guide\nIntro\n\n## Returns\n```bash\n# not a heading\n```\nSend it back\n# FAQ\nAsk"
+    docs = list(extract(("docs/guide.md", text)))
+
+    assert [d["metadata"]["heading"] for d in docs] == ["Guide", "Guide > Returns", "FAQ"]
+    assert "# not a heading" in docs[1]["content"]
+    assert docs[1]["metadata"]["line"] == 4
+    assert docs[0]["id"] == "docs/guide.md#0"
+
+
+def test_html_drops_scripts_and_navigation_across_read_blocks():
+    filler = "<p>" + "word " * 20_000 + "</p>"     # > one 64 KB read block
+    page = (f"<html><head><script>alert(1)</script></head><body><nav>Home | About</nav>"
+            f"<h1>Returns</h1><p>Send <b>it</b> back &amp; get a refund.</p>{filler}"
+            f"<h2>Exceptions</h2><ul><li>Gift cards</li></ul></body></html>")
+    docs = list(extract_html(("page.html", page.encode()), max_chars=50_000))
+
+    assert docs[0]["content"].startswith("Returns\n\nSend it back & get a refund.")
+    assert docs[-1]["content"] == "Exceptions\n\nGift cards"
+    assert docs[-1]["metadata"]["heading"] == "Returns > Exceptions"
+    assert not any("alert" in d["content"] or "Home" in d["content"] for d in docs)
+
+
+def test_long_text_is_split_at_paragraphs():
+    paragraphs = [f"paragraph {i} " + "x" * 80 for i in range(10)]
+    docs = list(extract_text(("notes.txt", "\n\n".join(paragraphs).encode()), max_chars=200))
+
+    assert len(docs) == 4
+    assert all(d["content"].startswith("paragraph") for d in docs)
+    assert [d["metadata"]["line"] for d in docs][:2] == [1, 7]
+
+
+def test_process_pool_extracts_every_file(tmp_path):
+    for i in range(4):
+        (tmp_path / f"doc{i}.md").write_text(f"# Doc {i}\nbody {i}\n# Second\nmore {i}")
+    sources = sorted(str(p) for p in tmp_path.iterdir())
+
+    docs = list(extract_files(sources, workers=2))
+    assert sorted(d["id"] for d in docs) == sorted(f"{s}#{n}" for s in sources for n in (0, 1))
+    assert sorted(d["id"] for d in extract_files(sources, workers=1)) == \
+        sorted(d["id"] for d in docs)
+
+
+def test_process_pool_reads_sources_lazily(tmp_path):
+    for i in range(10):
+        (tmp_path / f"doc{i}.md").write_text(f"# Doc {i}\nbody {i}")
+    pulled = []
+
+    def sources():
+        for path in sorted(tmp_path.iterdir()):
+            pulled.append(path)
+            yield str(path)
+
+    stream = extract_files(sources(), workers=2, max_pending=3)
+    next(stream)
+    assert len(pulled) <= 3  # only the window was submitted
+    assert len(list(stream)) == 9
+    assert len(pulled) == 10
+
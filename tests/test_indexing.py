@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for rag.indexing - process-pool encoding and offline index builds.
+
+Run with: python -m pytest tests/test_indexing.py
+"""
+
+import functools
+import json
+
+import numpy as np
+
+from rag.embeddings import HashingEmbedder
+from rag.indexing import build_index, main, parallel_encode, parallel_encode_batches
+from rag.persistence import DurableVectorStore
+
+
+FACTORY = functools.partial(HashingEmbedder, dim=32)
+
+
+def make_docs(count):
+    return [{"id": i, "content": f"document {i} about refunds shipping and support {i % 7}"}
+            for i in range(count)]
+
+
+def test_parallel_encode_matches_in_process_encoding():
+    texts = [doc["content"] for doc in make_docs(300)]
+
+    matrix = parallel_encode(texts, FACTORY, workers=2, batch_size=64)
+
+    np.testing.assert_allclose(matrix, FACTORY().encode(texts), rtol=1e-6)
+
+
+def test_batches_stream_through_a_bounded_buffer_ring():
+    texts = [doc["content"] for doc in make_docs(400)]
+    pulled = []
+
+    def lazy_texts():
+        for text in texts:
+            pulled.append(text)
+            yield text
+
+    expected = FACTORY().encode(texts)
+    seen = 0
+    for start, batch in parallel_encode_batches(lazy_texts(), FACTORY, workers=1, batch_size=20,
+                                                ring_size=2, pin_cores=False):
+        # Never more than the ring's worth of texts read ahead of what was consumed
+        assert len(pulled) <= seen + len(batch) + 2 * 20
+        np.testing.assert_allclose(batch, expected[start:start + len(batch)], rtol=1e-6)
+        seen += len(batch)
+    assert seen == 400
+
+
+def test_build_index_writes_a_loadable_store(tmp_path):
+    docs = make_docs(200)
+
+    stats = build_index(iter(docs), tmp_path, FACTORY, workers=2, batch_size=50)
+
+    assert stats["documents"] == 200
+    assert len(list(tmp_path.glob("snapshot-*"))) == 1
+    with DurableVectorStore(FACTORY(), tmp_path) as store:
+        assert len(store) == 200
+        assert store.get(17)["content"] == docs[17]["content"]
+        assert store.search(docs[42]["content"], top_k=1)[0][0]["id"] == 42
+
+
+def test_command_line_reads_jsonl(tmp_path):
+    corpus = tmp_path / "corpus.jsonl"
+    corpus.write_text("\n".join(json.dumps(doc) for doc in make_docs(20)) + "\n")
+
+    main(["--input", str(corpus), "--output", str(tmp_path / "index"),
+          "--embedder", "hashing", "--dim", "32", "--workers", "1", "--no-pin"])
+
+    with DurableVectorStore(FACTORY(), tmp_path / "index") as store:
+        assert len(store) == 20
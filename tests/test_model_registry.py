@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Tests for rag.model_registry - resident models under a memory budget, idle
+eviction, shared batching queues and per-collection models in rag.tenants.
+
+Run with: python -m pytest tests/test_model_registry.py
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from rag.embeddings import HashingEmbedder
+from rag.model_registry import EmbeddingModelRegistry, ModelSpec
+from rag.tenants import CollectionManager
+
+
+class FakeModel(HashingEmbedder):
+    """A 'model' with a known size that records the batches it encodes."""
+
+    def __init__(self, dim: int, size: int = 100, delay: float = 0.0):
+        super().__init__(dim=dim)
+        self.size = size
+        self.delay = delay
+        self.batches = []
+
+    def memory_bytes(self) -> int:
+        return self.size
+
+    def encode(self, texts):
+        self.batches.append(len(texts))
+        time.sleep(self.delay)
+        return super().encode(texts)
+
+
+def registry(budget=250, delay=0.0, **kwargs):
+    specs = [ModelSpec(name, lambda dim=dim: FakeModel(dim, delay=delay))
+             for name, dim in (("small", 16), ("medium", 32), ("large", 64))]
+    return EmbeddingModelRegistry(specs, memory_budget=budget, **kwargs)
+
+
+def test_models_load_lazily_and_lru_evicts_over_budget():
+    models = registry(budget=250)
+    handles = {name: models.embedder(name) for name in models.names()}
+    assert models.resident() == []
+
+    for name in ("small", "medium", "large"):
+        handles[name].encode(["warm"])
+    assert models.resident() == ["medium", "large"]
+    assert models.memory_bytes() <= 250
+
+    # The handle survives eviction; the model is simply loaded again
+    vectors = handles["small"].encode(["refund policy"])
+    np.testing.assert_allclose(vectors, HashingEmbedder(dim=16).encode(["refund policy"]))
+    assert models.resident() == ["large", "small"]
+    assert models.stats()["loads"] == 4 and models.stats()["evictions"] == 2
+    assert models.embedder("small") is handles["small"]
+    with pytest.raises(KeyError):
+        models.embedder("missing")
+    models.close()
+
+
+def test_models_in_use_are_never_evicted():
+    models = registry(budget=0, delay=0.2)
+    busy = threading.Thread(target=models.embedder("small").encode, args=(["slow"],))
+    busy.start()
+    time.sleep(0.05)
+    models.embedder("medium").encode(["other"])
+    assert "small" in models.resident()
+    busy.join()
+    models.embedder("large").encode(["other"])
+    assert models.resident() == ["large"]
+    models.close()
+
+
+def test_idle_models_are_evicted():
+    models = registry(budget=10_000, idle_timeout=0.05)
+    models.embedder("small").encode(["a"])
+    time.sleep(0.1)
+    models.embedder("medium").encode(["b"])
+    assert models.resident() == ["medium"]
+    models.close()
+
+
+def test_concurrent_requests_share_batches():
+    models = registry(budget=10_000, delay=0.05)
+    handle = models.embedder("medium")
+    texts = [f"question {i}" for i in range(24)]
+    with ThreadPoolExecutor(max_workers=24) as pool:
+        results = list(pool.map(lambda t: handle.encode([t]), texts))
+
+    for text, vectors in zip(texts, results):
+        np.testing.assert_allclose(vectors, HashingEmbedder(dim=32).encode([text]))
+    model = models._resident["medium"].embedder
+    assert sum(model.batches) == 24
+    assert len(model.batches) < 24 / 2  # requests were merged while a batch ran
+
+    async def main():
+        return await asyncio.gather(*(handle.aencode([t, t]) for t in texts[:5]))
+
+    assert all(v.shape == (2, 32) for v in asyncio.run(main()))
+    assert handle.dim == 32
+    models.close()
+
+
+def test_collections_pick_and_keep_their_model(tmp_path):
+    models = registry(budget=10_000)
+    docs = [{"id": i, "content": f"policy number {i}", "metadata": {}} for i in range(5)]
+    manager = CollectionManager(None, tmp_path, models=models, default_model="small")
+    manager.upsert("fast", docs)
+    manager.upsert("accurate", docs, model="large")
+    with manager.use("accurate") as store:
+        assert store.embedder is models.embedder("large")
+    assert manager.model_of("fast") == "small"
+    with pytest.raises(ValueError):
+        manager.upsert("accurate", docs, model="small")
+    manager.close()
+
+    # The choice is stored with the collection
+    reopened = CollectionManager(None, tmp_path, models=models, default_model="medium")
+    doc, _ = reopened.search("accurate", "policy number 3", top_k=1)[0]
+    assert doc["id"] == 3
+    with reopened.use("fast") as store:
+        assert store.embedder is models.embedder("small")
+    reopened.close()
+    models.close()
+
+
+def test_idle_models_are_swept_without_traffic():
+    models = registry(budget=10_000, idle_timeout=0.05, sweep_interval=0.02)
+    models.embedder("small").encode(["a"])
+    deadline = time.monotonic() + 2
+    while models.resident() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert models.resident() == []
+
+    sweeper = models._sweeper
+    models.close()
+    assert not sweeper.is_alive()
+
+
+def test_replacing_a_model_in_use_frees_it_after_release():
+    models = registry(budget=10_000, idle_timeout=None)
+    old = models.acquire("small")
+    models.register(ModelSpec("small", lambda: FakeModel(16, size=40)))
+    assert models.resident() == [] and models.memory_bytes() == 100
+
+    # New requests get the new model while the old one finishes its work
+    new = models.acquire("small")
+    assert new is not old and new.memory_bytes == 40
+    assert old.batches.submit(["still served"]).result().shape == (1, 16)
+    models.release(new)
+
+    models.release(old)
+    old.batches._thread.join(timeout=1)
+    assert not old.batches._thread.is_alive()
+    assert models.memory_bytes() == 40 and models.resident() == ["small"]
+    models.close()
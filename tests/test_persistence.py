@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for rag.persistence - WAL, snapshots and crash recovery.
+
+Run with: python -m pytest tests/test_persistence.py
+"""
+
+from rag.embeddings import HashingEmbedder
+from rag.persistence import DurableVectorStore, WriteAheadLog
+
+
+def open_store(path, **kwargs):
+    return DurableVectorStore(HashingEmbedder(dim=32), path, fsync="never", **kwargs)
+
+
+def crash(store):
+    """Simulate a crash: drop the store without close() (the OS keeps flushed data)."""
+    store._wal._stop.set()
+
+
+def test_recovers_from_wal_only(tmp_path):
+    store = open_store(tmp_path, snapshot_every=None)
+    store.add_documents({"id": i, "content": f"doc {i}"} for i in range(10))
+    store.upsert({"id": 3, "content": "updated three"})
+    store.delete(7)
+    crash(store)
+
+    recovered = open_store(tmp_path)
+    assert len(recovered) == 9
+    assert recovered.get(3)["content"] == "updated three"
+    assert 7 not in recovered
+    recovered.close()
+
+
+def test_snapshot_plus_wal_replay(tmp_path):
+    store = open_store(tmp_path, snapshot_every=None)
+    store.add_documents({"id": i, "content": f"doc {i}"} for i in range(5))
+    store.snapshot()
+    store.delete(0)
+    store.upsert({"id": "new", "content": "added after the snapshot"})
+    crash(store)
+
+    assert len(list(tmp_path.glob("snapshot-*"))) == 1
+    recovered = open_store(tmp_path)
+    assert sorted(map(str, (doc["id"] for doc, _ in recovered.search("doc", top_k=10)))) == \
+        ["1", "2", "3", "4", "new"]
+    recovered.close()
+
+
+def test_automatic_snapshots_drop_covered_wal_files(tmp_path):
+    with open_store(tmp_path, snapshot_every=10) as store:
+        for i in range(35):
+            store.upsert({"id": i, "content": f"doc {i}"})
+
+    wal_files = sorted(p.name for p in tmp_path.glob("wal-*.log"))
+    snapshot = sorted(tmp_path.glob("snapshot-*"))[-1].name
+    assert all(name[4:12] >= snapshot[9:] for name in wal_files)
+
+    with open_store(tmp_path) as recovered:
+        assert len(recovered) == 35
+
+
+def test_torn_tail_record_is_ignored(tmp_path):
+    store = open_store(tmp_path, snapshot_every=None)
+    store.add_documents([{"id": 1, "content": "kept"}, {"id": 2, "content": "kept too"}])
+    store.delete(2)
+    wal_path = tmp_path / "wal-00000000.log"
+    crash(store)
+
+    # Chop the last record in half, as if the process died mid-write
+    data = wal_path.read_bytes()
+    wal_path.write_bytes(data[:-3])
+    assert len(list(WriteAheadLog.read(wal_path))) == 1
+
+    with open_store(tmp_path) as recovered:
+        assert sorted(doc["id"] for doc, _ in recovered.search("kept", top_k=5)) == [1, 2]
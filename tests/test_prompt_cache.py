@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Tests for rag.prompt_cache (stable, cacheable prompt prefixes).
+
+Run with: python -m pytest tests/test_prompt_cache.py
+"""
+
+from rag.bedrock import BedrockGenerator
+from rag.context import ContextBuilder
+from rag.embeddings import HashingEmbedder
+from rag.pipeline import build_prompt, rag_query
+from rag.prompt_cache import CACHE_POINT, CachedPrompt, PromptLayout
+from rag.vector_store import VectorStore
+
+
+def words(text: str) -> int:
+    return len(text.split())
+
+
+POPULAR = [{"id": "faq-2", "content": "Shipping takes 3-5 business days " * 5},
+           {"id": "faq-1", "content": "Refunds are issued within 30 days " * 5}]
+OTHER = [{"id": f"doc-{i}", "content": f"Rare document number {i}"} for i in range(4)]
+
+
+def context(*docs):
+    chunks = [(doc, 1.0 - i / 10) for i, doc in enumerate(docs)]
+    return ContextBuilder(max_tokens=10_000, count_tokens=words,
+                          dedup_threshold=None).build(chunks)
+
+
+def layout(**kwargs):
+    defaults = dict(system_prompt="Answer from the context.", count_tokens=words,
+                    min_retrievals=2, refresh_every=3, min_cache_tokens=20)
+    return PromptLayout(**dict(defaults, **kwargs))
+
+
+def test_popular_documents_form_a_byte_identical_prefix():
+    prompts = layout()
+    for i in range(3):  # warm-up: popular docs retrieved every time, in varying order
+        prompts.build("warm up", context(*(POPULAR if i % 2 else POPULAR[::-1]), OTHER[i]))
+    assert prompts.pinned_ids == ["faq-1", "faq-2"]  # canonical order, not score order
+
+    first = prompts.build("how long is shipping?", context(POPULAR[0], OTHER[0]))
+    second = prompts.build("refund window?", context(OTHER[1], POPULAR[1], POPULAR[0]))
+    assert first.prefix == second.prefix
+    assert first.prefix.index("Refunds") < first.prefix.index("Shipping")
+    # Pinned documents are not repeated in the per-request part...
+    assert "Shipping" not in second.suffix and "number 1" in second.suffix
+    # ...and unretrieved pinned documents are still in the prefix
+    assert "Refunds" in first.prefix
+    assert str(first) == "Answer from the context.\n\n" + first.prefix + first.suffix
+    assert first.suffix.endswith("Question: how long is shipping?\n\nAnswer:")
+
+
+def test_without_pinned_documents_or_system_prompt_matches_lesson_layout():
+    prompts = layout(system_prompt="", refresh_every=1000)
+    packed = context(OTHER[0], OTHER[1])
+    prompt = prompts.build("question?", packed)
+    assert prompt == build_prompt("question?", packed.text)
+    assert prompt.cacheable_tokens == 0
+    assert prompt.converse() == {"messages": [{"role": "user",
+                                               "content": [{"text": str(prompt)}]}]}
+
+
+def test_cache_points_and_local_accounting():
+    prompts = layout()
+    for _ in range(3):
+        prompts.build("warm up", context(*POPULAR))
+    first = prompts.build("q1", context(OTHER[0]))
+    prompts.build("q2", context(OTHER[1]))
+
+    body = first.converse()
+    assert body["system"] == [{"text": "Answer from the context."}]  # too short to cache alone
+    assert body["messages"][0]["content"][1] == CACHE_POINT
+    assert first.cacheable_tokens == words(first.system) + words(first.prefix)
+
+    # The third warm-up request already used (and wrote) the new prefix
+    stats = prompts.stats()
+    assert stats["expected_cache_write_tokens"] == first.cacheable_tokens
+    assert stats["expected_cache_read_tokens"] == 2 * first.cacheable_tokens
+    assert stats["cache_eligible_tokens"] == 3 * first.cacheable_tokens
+    assert 0 < stats["eligible_fraction"] < 1
+
+
+def test_pinned_document_edit_refreshes_the_prefix():
+    prompts = layout(refresh_every=1000)
+    for _ in range(2):
+        prompts.observe(context(*POPULAR).chunks)
+    prompts.refresh()
+    edited = dict(POPULAR[0], content="Shipping now takes 1-2 days " * 5)
+    prompt = prompts.build("shipping?", context(edited))
+    assert "1-2 days" in prompt.prefix and "3-5" not in prompt
+
+
+def test_generator_sends_cache_points_and_rag_query_uses_the_layout():
+    prompts = layout()
+    for _ in range(3):
+        prompts.build("warm up", context(*POPULAR))
+    prompt = prompts.build("q", context(OTHER[0]))
+
+    body = BedrockGenerator(model_id="m")._body(prompt)
+    assert CACHE_POINT in body["messages"][0]["content"]
+    assert body["inferenceConfig"]["maxTokens"] == 512
+    plain = BedrockGenerator(model_id="m", prompt_caching=False)._body(prompt)
+    assert CACHE_POINT not in plain["messages"][0]["content"]
+
+    store = VectorStore(HashingEmbedder(dim=32))
+    store.add_documents(POPULAR + OTHER)
+    seen = []
+    answer = rag_query("refunds?", store, ContextBuilder(count_tokens=words), top_k=2,
+                       generate=lambda p: seen.append(p) or "ok", prompt_layout=prompts)
+    assert isinstance(seen[0], CachedPrompt) and answer.prompt is seen[0]
+    assert answer.prompt.prefix == prompt.prefix
+
+
+def test_pinned_documents_follow_store_updates_and_deletes():
+    store = VectorStore(HashingEmbedder(dim=16))
+    store.add_documents(POPULAR + OTHER)
+    prompts = layout(store=store, refresh_every=1000)
+    for i in range(4):
+        prompts.build("warm up", context(*POPULAR, OTHER[i]))
+    prompts.refresh()  # counts halve to 2: still popular at the next refresh
+    assert prompts.pinned_ids == ["faq-1", "faq-2"]
+
+    # Neither change is retrieved again, yet the very next prompt reflects both
+    store.delete("faq-2")
+    store.upsert({"id": "faq-1", "content": "Refunds now take 60 days " * 5})
+    prompt = prompts.build("unrelated", context(OTHER[3]))
+    assert prompts.pinned_ids == ["faq-1"]
+    assert "Shipping" not in prompt and "30 days" not in prompt
+    assert "60 days" in prompt.prefix
+
+    refreshes = prompts.refreshes
+    store.upsert({"id": "doc-3", "content": "An unpinned change"})
+    prompts.build("unrelated", context(OTHER[3]))
+    assert prompts.refreshes == refreshes  # unpinned changes keep the prefix
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests for rag.s3_cache - ETag-validated, size-bounded local cache for S3.
+
+Uses moto as a local S3 stand-in, so no AWS account is needed.
+Run with: python -m pytest tests/test_s3_cache.py
+"""
+
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import numpy as np
+import pytest
+from moto import mock_aws
+
+from rag.s3_cache import S3Cache
+from rag.s3_embeddings import load_embeddings, publish_embeddings
+from rag.s3_reader import S3DocumentReader
+
+
+BUCKET = "rag-learning-test"
+
+
+class CountingClient:
+    """Delegates to a real client, counting GETs (conditional ones separately)."""
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def get_object(self, **kwargs):
+        with self._lock:
+            self.calls["conditional" if "IfNoneMatch" in kwargs else "full"] += 1
+        return self.client.get_object(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+@pytest.fixture
+def client():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield CountingClient(client)
+
+
+def test_conditional_get_and_etag_hits(client, tmp_path):
+    client.put_object(Bucket=BUCKET, Key="doc.md", Body=b"version one")
+    cache = S3Cache(client, tmp_path)
+
+    assert cache.get(BUCKET, "doc.md") == b"version one"
+    assert cache.get(BUCKET, "doc.md") == b"version one"          # 304, no body
+    assert client.calls == {"full": 1, "conditional": 1}
+
+    etag = client.head_object(Bucket=BUCKET, Key="doc.md")["ETag"]
+    assert cache.get(BUCKET, "doc.md", etag=etag) == b"version one"
+    assert client.calls == {"full": 1, "conditional": 1}          # no request at all
+
+    client.put_object(Bucket=BUCKET, Key="doc.md", Body=b"version two")
+    assert cache.get(BUCKET, "doc.md") == b"version two"
+    assert (cache.misses, cache.not_modified, cache.hits) == (2, 1, 1)
+
+
+def test_lru_eviction_keeps_recently_used(client, tmp_path):
+    for name in "abcd":
+        client.put_object(Bucket=BUCKET, Key=name, Body=name.encode() * 100)
+    cache = S3Cache(client, tmp_path, max_bytes=300, max_age=60)
+
+    for name in "abc":
+        cache.get(BUCKET, name)
+        time.sleep(0.01)
+    cache.get(BUCKET, "a")           # a is now more recent than b
+    time.sleep(0.01)
+    cache.get(BUCKET, "d")           # over budget: b goes
+
+    assert cache.disk_bytes() == 300
+    assert cache.evictions == 1
+    full = client.calls["full"]
+    cache.get(BUCKET, "a")
+    assert client.calls["full"] == full
+    cache.get(BUCKET, "b")
+    assert client.calls["full"] == full + 1
+
+
+def test_shared_directory_and_single_download_per_key(client, tmp_path):
+    client.put_object(Bucket=BUCKET, Key="big.bin", Body=b"x" * 10_000)
+    first = S3Cache(client, tmp_path)
+    with ThreadPoolExecutor(8) as pool:
+        bodies = list(pool.map(lambda _: first.get(BUCKET, "big.bin"), range(8)))
+    assert bodies == [b"x" * 10_000] * 8
+    assert client.calls["full"] == 1
+
+    # Another process on the same host sees the same files
+    etag = client.head_object(Bucket=BUCKET, Key="big.bin")["ETag"]
+    second = S3Cache(client, tmp_path)
+    assert second.get(BUCKET, "big.bin", etag=etag) == b"x" * 10_000
+    assert client.calls["full"] == 1
+    assert not list(tmp_path.rglob(".tmp-*"))
+
+
+def test_embeddings_and_documents_read_through_the_cache(client, tmp_path):
+    embeddings = np.random.default_rng(0).standard_normal((30, 8)).astype(np.float32)
+    documents = [{"id": i, "content": f"doc {i}"} for i in range(30)]
+    publish_embeddings(client, BUCKET, "support", embeddings, documents, shard_rows=8)
+    for i in range(5):
+        client.put_object(Bucket=BUCKET, Key=f"documents/raw/{i}.md", Body=b"page %d" % i)
+
+    cache = S3Cache(client, tmp_path)
+    for _ in range(2):
+        loaded, loaded_docs, _ = load_embeddings(client, BUCKET, "support", cache=cache)
+        np.testing.assert_array_equal(loaded, embeddings)
+        assert loaded_docs == documents
+        assert [d["content"] for d in S3DocumentReader(client, BUCKET, cache=cache).documents()] \
+            == [f"page {i}" for i in range(5)]
+    # Second round: only LATEST and the manifest were fetched again
+    assert cache.misses == 8 + 5
+    assert client.calls["conditional"] == 0
+
+
+def test_shards_evicted_between_lookup_and_open_are_fetched_again(client, tmp_path):
+    embeddings = np.random.default_rng(1).standard_normal((20, 4)).astype(np.float32)
+    documents = [{"id": i, "content": f"doc {i}"} for i in range(20)]
+    publish_embeddings(client, BUCKET, "support", embeddings, documents, shard_rows=5)
+
+    class EvictOnceCache(S3Cache):
+        """Deletes each blob right after its first lookup, as another thread's eviction would."""
+
+        evicted = set()
+
+        def path(self, bucket, key, etag=None, immutable=False):
+            blob = super().path(bucket, key, etag, immutable)
+            if key not in self.evicted:
+                self.evicted.add(key)
+                blob.unlink()
+            return blob
+
+    cache = EvictOnceCache(client, tmp_path)
+    loaded, loaded_docs, _ = load_embeddings(client, BUCKET, "support", cache=cache)
+    np.testing.assert_array_equal(loaded, embeddings)
+    assert loaded_docs == documents
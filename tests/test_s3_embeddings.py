@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for rag.s3_embeddings - publishing and loading embedding shards.
+
+Uses moto as a local S3 stand-in, so no AWS account is needed.
+Run with: python -m pytest tests/test_s3_embeddings.py
+"""
+
+import boto3
+import numpy as np
+import pytest
+from moto import mock_aws
+
+from rag.embeddings import HashingEmbedder
+from rag.s3_embeddings import (bootstrap_store, load_embeddings, load_manifest,
+                               publish_embeddings, publish_store)
+from rag.vector_store import VectorStore
+
+
+BUCKET = "rag-learning-test"
+
+
+@pytest.fixture
+def s3_client():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def test_round_trip_with_multiple_shards_and_ranges(s3_client):
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((250, 16)).astype(np.float32)
+    documents = [{"id": i, "content": f"doc {i}"} for i in range(250)]
+
+    manifest = publish_embeddings(s3_client, BUCKET, "support", embeddings, documents,
+                                  shard_rows=100, version="v1")
+    assert [s["rows"] for s in manifest["shards"]] == [100, 100, 50]
+
+    # Tiny parts force several ranged GETs per shard
+    loaded, loaded_docs, _ = load_embeddings(s3_client, BUCKET, "support", part_size=1000)
+    np.testing.assert_array_equal(loaded, embeddings)
+    assert loaded_docs == documents
+
+
+def test_latest_points_at_newest_version(s3_client):
+    docs = [{"id": 1, "content": "a"}]
+    publish_embeddings(s3_client, BUCKET, "idx", np.ones((1, 4)), docs, version="v1")
+    publish_embeddings(s3_client, BUCKET, "idx", np.zeros((1, 4)), docs, version="v2")
+
+    assert load_manifest(s3_client, BUCKET, "idx")["version"] == "v2"
+    older, _, _ = load_embeddings(s3_client, BUCKET, "idx", version="v1")
+    assert older.sum() == 4
+
+
+def test_bootstrap_store_skips_re_embedding(s3_client):
+    builder = VectorStore(HashingEmbedder(dim=32))
+    builder.add_documents({"id": i, "content": f"refund policy number {i}"} for i in range(20))
+    builder.delete(5)
+    publish_store(builder, s3_client, BUCKET, "policies")
+
+    class NoEmbedder:
+        def encode(self, texts):
+            raise AssertionError("bootstrap must not re-embed documents")
+
+    node = VectorStore(NoEmbedder())
+    manifest = bootstrap_store(node, s3_client, BUCKET, "policies")
+
+    assert manifest["rows"] == 19 == len(node)
+    query = HashingEmbedder(dim=32).encode(["refund policy number 7"])[0]
+    assert node.search_by_vector(query, top_k=1)[0][0]["id"] == 7
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for rag.s3_reader - paginated listing and bounded concurrent reads.
+
+Uses moto as a local S3 stand-in, so no AWS account is needed.
+Run with: python -m pytest tests/test_s3_reader.py
+"""
+
+import threading
+import time
+
+import pytest
+from moto import mock_aws
+
+from rag.s3_reader import S3DocumentReader, list_objects, s3_client
+
+
+BUCKET = "rag-learning-test"
+
+
+@pytest.fixture
+def client():
+    with mock_aws():
+        client = s3_client(max_pool_connections=8, region="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        for i in range(30):
+            client.put_object(Bucket=BUCKET, Key=f"documents/raw/doc-{i:03d}.md",
+                              Body=f"# Page {i}\nRefund policy {i}".encode())
+        client.put_object(Bucket=BUCKET, Key="documents/raw/images/", Body=b"")
+        client.put_object(Bucket=BUCKET, Key="documents/raw/logo.png", Body=b"\x89PNG")
+        client.put_object(Bucket=BUCKET, Key="embeddings/other.npy", Body=b"x")
+        yield client
+
+
+class SlowClient:
+    """Delegates to a real client, recording how many GETs overlap."""
+
+    def __init__(self, client, delay=0.01):
+        self.client = client
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def get_object(self, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            return self.client.get_object(**kwargs)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def test_lists_every_page_and_skips_folders(client):
+    keys = [e["Key"] for e in list_objects(client, BUCKET, "documents/raw/", page_size=7)]
+    assert len(keys) == 31
+    assert "documents/raw/images/" not in keys
+    assert client.meta.config.max_pool_connections == 8
+
+
+def test_reads_in_listing_order_as_documents(client):
+    reader = S3DocumentReader(client, BUCKET, max_in_flight=4, suffixes=[".md"])
+    docs = list(reader.documents())
+
+    assert [d["id"] for d in docs] == [f"documents/raw/doc-{i:03d}.md" for i in range(30)]
+    assert docs[3]["content"] == "# Page 3\nRefund policy 3"
+    assert docs[3]["metadata"]["source"] == f"s3://{BUCKET}/documents/raw/doc-003.md"
+    assert reader.stats()["objects"] == 30
+
+
+def test_concurrency_and_read_ahead_are_bounded(client):
+    slow = SlowClient(client)
+    reader = S3DocumentReader(slow, BUCKET, max_in_flight=3, read_ahead=6, suffixes=[".md"])
+    assert len(list(reader)) == 30
+    assert 1 < slow.max_active <= 3
+
+    # A consumer that stops early leaves at most `read_ahead` extra requests behind
+    slow.calls = 0
+    stream = iter(S3DocumentReader(slow, BUCKET, max_in_flight=3, read_ahead=6))
+    for _ in range(4):
+        next(stream)
+    stream.close()
+    assert slow.calls <= 4 + 6
+
+
+def test_unordered_mode_yields_everything(client):
+    reader = S3DocumentReader(SlowClient(client, delay=0), BUCKET, max_in_flight=4,
+                              ordered=False)
+    assert sorted(obj.key for obj in reader) == sorted(
+        e["Key"] for e in list_objects(client, BUCKET, "documents/raw/"))
+
+
+def test_unordered_mode_does_not_wait_for_the_oldest_request(client):
+    class SlowFirstObject(SlowClient):
+        def get_object(self, **kwargs):
+            self.delay = 0.3 if kwargs["Key"].endswith("doc-000.md") else 0
+            return super().get_object(**kwargs)
+
+    reader = S3DocumentReader(SlowFirstObject(client), BUCKET, max_in_flight=4, read_ahead=4,
+                              suffixes=[".md"], ordered=False)
+    keys = [obj.key for obj in reader]
+    assert len(keys) == 30
+    assert keys[0] != "documents/raw/doc-000.md"
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tests for rag.scoring - 16-bit embedding storage with float32 scoring, and
+the blocked top-k engine behind VectorStore.search.
+
+Run with: python -m pytest tests/test_scoring.py
+"""
+
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from rag.embeddings import HashingEmbedder
+from rag.persistence import DurableVectorStore
+from rag.scoring import blocked_scores, blocked_top_k, to_float32, to_storage
+from rag.vector_store import VectorStore
+
+
+def unit_vectors(count, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("dtype,tolerance", [("float16", 1e-3), ("bfloat16", 1e-2)])
+def test_blocked_scores_track_float32(dtype, tolerance):
+    matrix, query = unit_vectors(1000), unit_vectors(1, seed=1)[0]
+    stored = to_storage(matrix, dtype)
+
+    assert stored.nbytes == matrix.nbytes // 2
+    np.testing.assert_allclose(to_float32(stored, dtype), matrix, atol=tolerance)
+    # Odd block size: the last block is partial
+    scores = blocked_scores(stored, query, dtype, rows=999, block_rows=97)
+    assert scores.dtype == np.float32
+    np.testing.assert_allclose(scores, matrix[:999] @ query, atol=tolerance)
+
+
+@pytest.mark.parametrize("dtype", ["float16", "bfloat16"])
+def test_store_rankings_agree_with_float32(dtype):
+    docs = [{"id": i, "content": str(i)} for i in range(2000)]
+    embeddings, queries = unit_vectors(2000), unit_vectors(50, seed=2)
+    exact = VectorStore(HashingEmbedder(dim=64))
+    compact = VectorStore(HashingEmbedder(dim=64), dtype=dtype)
+    exact.upsert_embedded(docs, embeddings)
+    compact.upsert_embedded(docs, embeddings)
+
+    overlap = np.mean([
+        len({d["id"] for d, _ in exact.search_by_vector(q, 10)}
+            & {d["id"] for d, _ in compact.search_by_vector(q, 10)}) / 10
+        for q in queries
+    ])
+
+    assert overlap >= 0.95
+    assert compact.stats()["embedding_bytes"] == exact.stats()["embedding_bytes"] // 2
+    assert compact.export()[0].dtype == np.float32
+
+
+def test_dtype_survives_compaction_and_snapshots(tmp_path):
+    docs = [{"id": i, "content": f"document number {i}"} for i in range(50)]
+    with DurableVectorStore(HashingEmbedder(dim=32), tmp_path, dtype="bfloat16") as store:
+        store.add_documents(docs)
+        for i in range(0, 50, 2):
+            store.delete(i)
+        store.compact()
+        store.snapshot()
+        assert store.search("document number 7", top_k=1)[0][0]["id"] == 7
+
+    with DurableVectorStore(HashingEmbedder(dim=32), tmp_path, dtype="bfloat16") as store:
+        assert len(store) == 25
+        assert store.search("document number 7", top_k=1)[0][0]["id"] == 7
+
+
+def test_unknown_dtype_is_rejected():
+    with pytest.raises(ValueError):
+        VectorStore(HashingEmbedder(), dtype="int8")
+
+
+def test_blocked_top_k_matches_a_full_sort():
+    rng = np.random.default_rng(3)
+    for _ in range(50):
+        rows, k = int(rng.integers(1, 2000)), int(rng.integers(1, 30))
+        matrix = rng.integers(-2, 3, (rows, 8)).astype(np.float32)  # lots of exact ties
+        query = rng.integers(-2, 3, 8).astype(np.float32)
+        dead = rng.random(rows) < 0.3
+
+        scores = matrix @ query
+        scores[dead] = -np.inf
+        expected = [i for i in np.lexsort((np.arange(rows), -scores))[:k] if not dead[i]]
+        got, got_scores = blocked_top_k(matrix, query, k, dead=dead,
+                                        block_rows=int(rng.integers(1, 300)))
+
+        assert got.tolist() == expected
+        np.testing.assert_array_equal(got_scores, scores[expected])
+
+
+def test_search_allocations_do_not_grow_with_the_corpus():
+    def peak_for(rows):
+        store = VectorStore(HashingEmbedder(dim=16), initial_capacity=rows)
+        store.upsert_embedded([{"id": i, "content": ""} for i in range(rows)],
+                              unit_vectors(rows, dim=16))
+        query = unit_vectors(1, dim=16, seed=9)[0]
+        store.search_by_vector(query, 5)  # size the per-thread scratch buffers
+        tracemalloc.start()
+        store.search_by_vector(query, 5)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    small, large = peak_for(20_000), peak_for(200_000)
+    # A full score vector alone would be 800 KB at 200k rows
+    assert large < 400_000
+    assert large < 2 * small
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for rag.tenants - named collections, lazy loading and LRU eviction.
+
+Run with: python -m pytest tests/test_tenants.py
+"""
+
+import threading
+import time
+
+import pytest
+
+import rag.tenants
+from rag.embeddings import HashingEmbedder
+from rag.persistence import DurableVectorStore
+from rag.tenants import CollectionManager
+
+
+def tenant_docs(tenant, count=20):
+    return [{"id": i, "content": f"{tenant} policy number {i}",
+             "metadata": {"tenant": tenant}} for i in range(count)]
+
+
+def test_collections_are_isolated_and_share_the_embedder(tmp_path):
+    embedder = HashingEmbedder(dim=64)
+    with CollectionManager(embedder, tmp_path) as manager:
+        manager.upsert("acme", tenant_docs("acme"))
+        manager.upsert("globex", tenant_docs("globex"))
+
+        results = manager.search("acme", "globex policy number 3", top_k=20)
+        assert {doc["metadata"]["tenant"] for doc, _ in results} == {"acme"}
+        with manager.use("globex") as store:
+            assert store.embedder is embedder
+        assert manager.names() == ["acme", "globex"]
+
+
+def test_lru_eviction_under_budget_and_lazy_reload(tmp_path):
+    manager = CollectionManager(HashingEmbedder(dim=64), tmp_path, initial_capacity=32)
+    manager.upsert("t0", tenant_docs("t0"))
+    one_collection = manager.memory_bytes()
+    manager.memory_budget = int(one_collection * 2.5)
+
+    for i in range(1, 6):
+        manager.upsert(f"t{i}", tenant_docs(f"t{i}"))
+    manager.search("t4", "t4 policy", top_k=1)  # t4 becomes most recent
+
+    assert manager.resident() == ["t5", "t4"]
+    assert manager.memory_bytes() <= manager.memory_budget
+    assert manager.stats()["evictions"] == 4
+
+    # Evicted collections come back from disk with their data
+    loads = manager.loads
+    doc, _ = manager.search("t0", "t0 policy number 7", top_k=1)[0]
+    assert doc == tenant_docs("t0")[7]
+    assert manager.loads == loads + 1
+    manager.close()
+
+
+def test_collections_in_use_are_never_evicted(tmp_path):
+    manager = CollectionManager(HashingEmbedder(dim=64), tmp_path, memory_budget=0)
+    with manager.use("busy", create=True) as busy:
+        busy.add_documents(tenant_docs("busy"))
+        manager.upsert("other", tenant_docs("other"))
+        assert "busy" in manager.resident()
+        assert "other" not in manager.resident()
+    assert manager.resident() == []  # released, so now over budget
+    assert len(manager.search("busy", "busy policy", top_k=3)) == 3
+
+
+def test_names_missing_collections_and_drop(tmp_path):
+    manager = CollectionManager(HashingEmbedder(dim=64), tmp_path)
+    with pytest.raises(ValueError):
+        manager.upsert("../escape", tenant_docs("x"))
+    with pytest.raises(KeyError):
+        manager.search("nobody", "anything")
+
+    manager.upsert("temp", tenant_docs("temp"))
+    assert manager.drop("temp")
+    assert "temp" not in manager
+    assert manager.names() == []
+
+
+def test_reopen_waits_for_eviction_to_finish_closing(tmp_path, monkeypatch):
+    events = []
+
+    class SlowClosingStore(DurableVectorStore):
+        def __init__(self, *args, **kwargs):
+            events.append("open")
+            super().__init__(*args, **kwargs)
+
+        def close(self):
+            events.append("close-start")
+            time.sleep(0.2)
+            super().close()
+            events.append("close-end")
+
+    monkeypatch.setattr(rag.tenants, "DurableVectorStore", SlowClosingStore)
+    manager = CollectionManager(HashingEmbedder(dim=64), tmp_path)
+    manager.upsert("acme", tenant_docs("acme"))
+    assert manager.memory_bytes() > 0
+
+    evicting = threading.Thread(target=manager.evict, args=("acme",))
+    evicting.start()
+    while "close-start" not in events:
+        time.sleep(0.001)
+    assert manager.memory_bytes() == 0
+    doc, _ = manager.search("acme", "acme policy number 5", top_k=1)[0]
+    evicting.join()
+
+    assert doc["id"] == 5
+    assert events[:4] == ["open", "close-start", "close-end", "open"]
+    manager.close()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Tests for rag.tokenization - the cached fast-tokenizer service.
+
+Uses a small WordPiece tokenizer built in the test (Rust `tokenizers`
+backend, no download needed).
+Run with: python -m pytest tests/test_tokenization.py
+"""
+
+import numpy as np
+import pytest
+
+tokenizers = pytest.importorskip("tokenizers")
+
+from rag.context import ContextBuilder  # noqa: E402
+from rag.dedup import NearDuplicateFilter  # noqa: E402
+from rag.indexing import build_index  # noqa: E402
+from rag.embeddings import HashingEmbedder  # noqa: E402
+from rag.tokenization import TokenizerService, chunk_documents, get_tokenizer_service  # noqa: E402
+
+
+WORDS = ["refund", "policy", "shipping", "takes", "three", "days", "the", "is", "within",
+         "thirty", "of", "purchase", "card", "declined", "error", "code", "token"]
+
+
+@pytest.fixture
+def tokenizer_file(tmp_path):
+    from tokenizers import Tokenizer, models, pre_tokenizers
+
+    vocab = {"[UNK]": 0}
+    for word in WORDS + ["##s", "##ization", "##ed", "##ing"]:
+        vocab.setdefault(word, len(vocab))
+    tokenizer = Tokenizer(models.WordPiece(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    tokenizer.enable_truncation(8)  # the service must ignore this
+    path = tmp_path / "tokenizer.json"
+    tokenizer.save(str(path))
+    return path
+
+
+def long_text(words: int) -> str:
+    return " ".join(WORDS[i % len(WORDS)] + ("ization" if i % 5 == 0 else "")
+                    for i in range(words))
+
+
+def test_counts_match_the_tokenizer_and_are_cached(tokenizer_file):
+    service = TokenizerService(tokenizer_file)
+    reference = tokenizers.Tokenizer.from_file(str(tokenizer_file))
+    reference.no_truncation()
+    texts = ["the refund policy", long_text(40), "the refund policy"]
+
+    counts = service.count_batch(texts)
+    assert counts == [len(reference.encode(t, add_special_tokens=False).ids) for t in texts]
+    assert counts[1] > 8  # not truncated
+    assert service.stats()["misses"] == 2 and service.batches == 1  # duplicate tokenized once
+
+    assert service("the refund policy") == counts[0]
+    np.testing.assert_array_equal(service.ids(texts[1]),
+                                  reference.encode(texts[1], add_special_tokens=False).ids)
+    assert service.stats()["misses"] == 2 and service.hits == 3
+
+
+def test_chunks_fit_cut_between_words_and_are_pre_cached(tokenizer_file):
+    service = TokenizerService(tokenizer_file)
+    text = long_text(100)
+    chunks = service.chunk(text, max_tokens=16, overlap=4)
+    assert len(chunks) > 1
+    misses = service.misses
+    counts = service.count_batch(chunks)
+    assert service.misses == misses  # chunking already cached every chunk
+    assert max(counts) <= 16
+    for chunk in chunks:
+        assert not chunk.startswith("ization")  # never cut inside a word
+        assert chunk in text
+    # Cached ids agree with tokenizing the chunk on its own
+    fresh = TokenizerService(tokenizer_file)
+    assert fresh.count_batch(chunks) == counts
+
+    with pytest.raises(ValueError):
+        service.chunk(text, max_tokens=4, overlap=4)
+
+
+def test_context_packing_reuses_chunking_tokenization(tokenizer_file):
+    service = TokenizerService(tokenizer_file)
+    docs = [{"id": 1, "content": long_text(60), "metadata": {"source": "a"}},
+            {"id": 2, "content": "the card is declined", "metadata": {}}]
+    chunks = list(chunk_documents(docs, 20, service))
+    assert chunks[-1] == docs[1]
+    assert chunks[0]["id"] == "1#0" and chunks[0]["metadata"] == {"source": "a", "parent": 1,
+                                                                   "chunk": 0}
+    builder = ContextBuilder(max_tokens=40, count_tokens=service, dedup_threshold=None)
+    service(builder.separator)
+    misses, batches = service.misses, service.batches
+
+    packed = builder.build([(doc, 1.0 / (i + 1)) for i, doc in enumerate(chunks)])
+    assert packed.tokens <= 40
+    assert (service.misses, service.batches) == (misses, batches)
+
+    # New chunks are tokenized together, in one batch
+    builder.build([({"id": i, "content": f"error code {i}"}, 1.0) for i in range(5)])
+    assert service.batches == batches + 1 and service.misses == misses + 5
+
+
+def test_build_index_splits_long_documents(tmp_path, tokenizer_file):
+    service = TokenizerService(tokenizer_file)
+    docs = [{"id": i, "content": long_text(50 + i), "metadata": {}} for i in range(3)]
+    stats = build_index(docs, tmp_path / "index", HashingEmbedder, chunk_tokens=32,
+                        tokenizer=service, workers=1)
+    assert stats["chunks"] > 0
+    assert stats["documents"] == 3 + stats["chunks"]
+    assert stats["tokens"] >= sum(service.count_batch([d["content"] for d in docs]))
+
+
+def test_chunk_stats_are_counted_before_dedup_and_blank_documents_are_kept(tmp_path,
+                                                                           tokenizer_file):
+    service = TokenizerService(tokenizer_file)
+    text = long_text(80)
+    docs = [{"id": i, "content": text, "metadata": {}} for i in range(3)]  # 2 exact duplicates
+    docs.append({"id": "blank", "content": "   ", "metadata": {}})
+    assert [d["id"] for d in chunk_documents(docs[3:], 32, service)] == ["blank"]
+
+    chunking = {}
+    chunks = list(chunk_documents(docs, 32, service, stats=chunking))
+    per_doc = (len(chunks) - 1) // 3
+    tokens = 3 * sum(service.count_batch([c["content"] for c in chunks[:per_doc]]))
+    assert chunking == {"documents": 4, "chunks": len(chunks), "tokens": tokens}
+
+    misses = service.misses
+    stats = build_index(docs, tmp_path / "index", HashingEmbedder, chunk_tokens=32,
+                        tokenizer=service, dedup=NearDuplicateFilter(threshold=0.9), workers=1)
+    assert service.misses == misses  # token stats came from chunking
+    assert stats["chunks"] == 3 * (per_doc - 1)
+    assert stats["tokens"] == chunking["tokens"]
+    assert stats["documents"] == per_doc + 1
+
+
+def test_words_longer_than_a_chunk_are_cut_hard(tmp_path):
+    from tokenizers import Tokenizer, models, pre_tokenizers
+
+    tokenizer = Tokenizer(models.WordPiece({"[UNK]": 0, "b": 1, "a": 2, "##a": 3},
+                                           unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    tokenizer.save(str(tmp_path / "tokenizer.json"))
+    service = TokenizerService(tmp_path / "tokenizer.json")
+
+    text = "b " + "a" * 20 + " b b"
+    chunks = service.chunk(text, max_tokens=4)
+    assert "".join(chunks).replace(" ", "") == text.replace(" ", "")
+    counts = service.count_batch(chunks)
+    assert max(counts) <= 4
+    assert chunks[0] == "b"  # the word boundary before the long word is still used
+    assert counts[1:-1] == [4] * (len(chunks) - 2)  # then full chunks, not one-token ones
+
+    overlapping = service.chunk(text, max_tokens=4, overlap=1)
+    assert max(service.count_batch(overlapping)) <= 4 and len(overlapping) <= 12
+
+
+def test_shared_service_per_name():
+    assert get_tokenizer_service("some/tokenizer") is get_tokenizer_service("some/tokenizer")
+    assert get_tokenizer_service("some/tokenizer") is not get_tokenizer_service("other")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Tests for rag.tracing - spans, exporters and the slow-request profiler.
+
+Run with: python -m pytest tests/test_tracing.py
+"""
+
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from rag.async_pipeline import AsyncRAGPipeline
+from rag.context import ContextBuilder
+from rag.embeddings import HashingEmbedder
+from rag.pipeline import rag_query
+from rag.tracing import (NOOP_SPAN, InMemoryExporter, OTelJsonExporter, PrometheusExporter,
+                         Tracer)
+from rag.vector_store import VectorStore
+
+
+def make_store():
+    store = VectorStore(HashingEmbedder(dim=32))
+    store.add_documents({"id": i, "content": f"refund policy {i}", "metadata": {"n": i}}
+                        for i in range(10))
+    return store
+
+
+def test_rag_query_records_every_stage():
+    exporter = InMemoryExporter()
+    tracer = Tracer(exporters=[exporter])
+    builder = ContextBuilder(max_tokens=100, count_tokens=lambda t: len(t.split()))
+
+    rag_query("refund", make_store(), builder, top_k=3, tracer=tracer,
+              where=lambda d: d["metadata"]["n"] % 2 == 0,
+              rerank=lambda q, results: results[::-1],
+              generate=lambda prompt: "ok")
+
+    (trace,) = exporter.traces
+    assert trace.root.name == "rag_query"
+    assert set(trace.stage_durations()) == {"rag_query", "embed", "search", "filter",
+                                            "rerank", "context_build", "generate"}
+    assert all(s.parent_id == trace.root.span_id for s in trace.spans if s is not trace.root)
+
+
+def test_disabled_tracer_returns_shared_noop():
+    tracer = Tracer(enabled=False)
+    assert tracer.span("anything") is NOOP_SPAN
+
+
+def test_unsampled_requests_have_no_child_spans():
+    exporter = InMemoryExporter()
+    tracer = Tracer(sample_rate=0.0, exporters=[exporter])
+    with tracer.span("rag_query"):
+        assert tracer.span("search") is NOOP_SPAN
+    assert exporter.traces == []
+
+
+def test_prometheus_and_otel_exports(tmp_path):
+    prometheus = PrometheusExporter(buckets=(0.001, 1.0))
+    otel_path = tmp_path / "traces.jsonl"
+    tracer = Tracer(exporters=[prometheus, OTelJsonExporter(otel_path)])
+    with tracer.span("rag_query"):
+        with tracer.span("search", top_k=5):
+            pass
+
+    text = prometheus.render()
+    assert 'rag_stage_duration_seconds_count{stage="search"} 1' in text
+    assert 'rag_stage_duration_seconds_bucket{stage="search",le="+Inf"} 1' in text
+
+    spans = json.loads(otel_path.read_text())["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    search = next(s for s in spans if s["name"] == "search")
+    assert search["attributes"] == [{"key": "top_k", "value": {"stringValue": "5"}}]
+    assert "parentSpanId" in search
+
+
+def test_slow_requests_are_profiled():
+    slow = []
+    tracer = Tracer(slow_threshold_ms=5, profile_interval_ms=1, on_slow=slow.append)
+
+    with tracer.span("fast"):
+        pass
+    with tracer.span("slow"):
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+
+    assert [t.root.name for t in slow] == ["slow"]
+    assert any("test_slow_requests_are_profiled" in stack for stack in slow[0].profile)
+
+
+def test_one_shared_profiler_thread_and_monotonic_durations():
+    import threading
+
+    exporter = InMemoryExporter()
+    tracer = Tracer(slow_threshold_ms=1000, exporters=[exporter])
+    before = threading.active_count()
+    for _ in range(50):
+        with tracer.span("rag_query"):
+            with tracer.span("search"):
+                pass
+    assert threading.active_count() <= before + 1
+    assert tracer.profiler.active == 0
+
+    trace = exporter.traces[-1]
+    assert all(span.end_ns >= span.start_ns for span in trace.spans)
+    search = next(span for span in trace.spans if span.name == "search")
+    assert abs(trace.unix_ns(search.start_ns) - time.time_ns()) < 10 ** 9
+    tracer.profiler.stop()
+
+
+def test_spans_opened_in_pool_threads_keep_their_parent():
+    exporter = InMemoryExporter()
+    tracer = Tracer(exporters=[exporter])
+    store = make_store()
+
+    class TracedStore:
+        def search(self, question, top_k=5):
+            with tracer.span("store_search"):
+                return store.search(question, top_k=top_k)
+
+    builder = ContextBuilder(max_tokens=100, count_tokens=lambda t: len(t.split()))
+    pipeline = AsyncRAGPipeline(TracedStore(), builder, tracer=tracer, max_workers=2)
+    asyncio.run(pipeline.query("refund", top_k=3))
+    pipeline.executor.shutdown()
+
+    (trace,) = exporter.traces
+    spans = {span.name: span for span in trace.spans}
+    assert spans["store_search"].parent_id == spans["search"].span_id
+
+
+def test_observe_is_safe_to_call_concurrently():
+    prometheus = PrometheusExporter(buckets=(1.0,))
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: prometheus.observe("embed", 0.5), range(4000)))
+    assert 'rag_stage_duration_seconds_count{stage="embed"} 4000' in prometheus.render()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for rag.vector_store - upsert, delete, tombstones and compaction.
+
+Run with: python -m pytest tests/test_vector_store.py
+"""
+
+import threading
+
+from rag.embeddings import HashingEmbedder
+from rag.vector_store import VectorStore
+
+
+DOCUMENTS = [
+    {"id": 1, "content": "refund policy return products within 30 days"},
+    {"id": 2, "content": "shipping takes 3-5 business days for delivery"},
+    {"id": 3, "content": "customer support by phone email or live chat"},
+    {"id": 4, "content": "we accept credit cards paypal and apple pay"},
+]
+
+
+def make_store(**kwargs):
+    store = VectorStore(HashingEmbedder(dim=64), **kwargs)
+    store.add_documents(DOCUMENTS)
+    return store
+
+
+def test_search_returns_best_match_first():
+    store = make_store()
+    results = store.search("how do I get a refund", top_k=2)
+    assert results[0][0]["id"] == 1
+    assert results[0][1] >= results[1][1]
+
+
+def test_upsert_replaces_document():
+    store = make_store()
+    store.upsert({"id": 2, "content": "express shipping now takes one day"})
+
+    assert len(store) == 4
+    assert store.get(2)["content"].startswith("express")
+    ids = [doc["id"] for doc, _ in store.search("shipping", top_k=4)]
+    assert ids.count(2) == 1
+
+
+def test_delete_is_honoured_in_search():
+    store = make_store()
+    assert store.delete(1) is True
+    assert store.delete(1) is False
+    assert 1 not in store
+    assert all(doc["id"] != 1 for doc, _ in store.search("refund", top_k=4))
+
+
+def test_compaction_reclaims_dead_rows_and_keeps_results():
+    store = make_store(compaction_threshold=0.1)
+    store.upsert({"id": 3, "content": "support team available all week"})
+    store.delete(4)
+    before = [(d["id"], round(s, 6)) for d, s in store.search("support", top_k=3)]
+
+    assert store.maybe_compact() == 2
+    assert store.stats()["dead"] == 0
+    assert store.stats()["rows"] == 3
+    after = [(d["id"], round(s, 6)) for d, s in store.search("support", top_k=3)]
+    assert before == after
+
+
+def test_background_compaction_with_concurrent_readers():
+    store = VectorStore(HashingEmbedder(dim=32), initial_capacity=8,
+                        compaction_threshold=0.2)
+    store.add_documents({"id": i, "content": f"document number {i}"} for i in range(200))
+    store.start_compactor(interval=0.001)
+
+    errors = []
+
+    def reader():
+        try:
+            for _ in range(200):
+                store.search("document number", top_k=5)
+        except Exception as e:  # pragma: no cover - surfaced below
+            errors.append(e)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for i in range(0, 200, 2):
+        store.delete(i)
+    for t in threads:
+        t.join()
+    store.stop_compactor()
+    store.compact()
+
+    assert not errors
+    assert len(store) == 100
+    assert store.stats()["rows"] == 100
+    assert all(doc["id"] % 2 == 1 for doc, _ in store.search("document", top_k=50))
+
+
+def test_get_during_compaction_never_mixes_generations():
+    store = VectorStore(HashingEmbedder(dim=16), initial_capacity=8)
+    store.add_documents({"id": i, "content": f"document number {i}"} for i in range(300))
+    mismatches = []
+    done = threading.Event()
+
+    def reader():
+        while not done.is_set():
+            for doc_id in range(1, 300, 2):
+                doc = store.get(doc_id)
+                if doc is not None and doc["id"] != doc_id:
+                    mismatches.append((doc_id, doc["id"]))
+
+    threads = [threading.Thread(target=reader) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for i in range(0, 300, 2):
+        store.delete(i)
+        if i % 20 == 0:
+            store.compact()
+    store.compact()
+    done.set()
+    for t in threads:
+        t.join()
+
+    assert not mismatches
+    assert all(store.get(i)["id"] == i for i in range(1, 300, 2))
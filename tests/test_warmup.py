@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests for rag.warmup - pinned FAQ embeddings and results.
+
+Run with: python -m pytest tests/test_warmup.py
+"""
+
+import threading
+import time
+
+from rag.vector_store import VectorStore
+from rag.warmup import QueryWarmCache
+
+
+FAQ = [
+    "How do I return a product?",
+    "What payment methods do you accept?",
+    "How can I contact support?",
+]
+
+DOCS = [
+    {"id": 1, "content": "return a product within 30 days for a refund"},
+    {"id": 2, "content": "we accept payment methods like cards and paypal"},
+    {"id": 3, "content": "contact support by phone or email"},
+]
+
+
+def make_cache(embedder):
+    store = VectorStore(embedder)
+    store.add_documents(DOCS)
+    cache = QueryWarmCache(store, top_k=3)
+    cache.warm(FAQ)
+    return store, embedder, cache
+
+
+def test_faq_queries_are_answered_without_embedding(counting_embedder):
+    store, embedder, cache = make_cache(counting_embedder())
+    calls = embedder.calls
+
+    results = cache.search("  how do I RETURN a product? ", top_k=1)
+
+    assert results[0][0]["id"] == 1
+    assert embedder.calls == calls
+    assert cache.hits == 1
+    assert cache.search("something else entirely", top_k=1)
+    assert cache.misses == 1
+
+
+def test_results_refresh_when_index_version_changes(counting_embedder):
+    store, embedder, cache = make_cache(counting_embedder())
+    cache.start_refresher(interval=0.01)
+    try:
+        store.delete(1)
+        # Never stale: before the refresh lands the lookup misses...
+        assert all(doc["id"] != 1 for doc, _ in cache.search(FAQ[0], top_k=3))
+        deadline = time.time() + 2
+        while cache.lookup(FAQ[0]) is None and time.time() < deadline:
+            time.sleep(0.01)
+        # ...and afterwards it is a hit again, without re-embedding
+        assert all(doc["id"] != 1 for doc, _ in cache.lookup(FAQ[0]))
+    finally:
+        cache.stop_refresher()
+
+
+def test_snapshot_round_trip_skips_embedding(tmp_path, counting_embedder):
+    store, embedder, cache = make_cache(counting_embedder())
+    path = tmp_path / "faq.npz"
+    cache.save(path)
+
+    calls = embedder.calls
+    restored = QueryWarmCache(store, top_k=3)
+    restored.load(path)
+
+    assert embedder.calls == calls
+    assert len(restored) == 3
+    assert restored.lookup(FAQ[2])[0][0]["id"] == 3
+
+
+def test_refresh_overlapping_warm_discards_old_query_results(counting_embedder):
+    store, embedder, cache = make_cache(counting_embedder())
+    entered, release = threading.Event(), threading.Event()
+    search = store.search_by_vector
+
+    def slow_first_search(embedding, top_k):
+        if not entered.is_set():
+            entered.set()
+            release.wait()
+        return search(embedding, top_k)
+
+    store.search_by_vector = slow_first_search
+    store.delete(3)  # version moves: the next refresh recomputes
+    refresher = threading.Thread(target=cache.refresh)
+    refresher.start()
+    entered.wait()
+
+    cache.warm(list(reversed(FAQ)))  # new rows while the old refresh is mid-search
+    release.set()
+    refresher.join()
+
+    assert cache.lookup(FAQ[0])[0][0]["id"] == 1
+    assert cache.lookup(FAQ[1])[0][0]["id"] == 2
+